@@ -1,6 +1,5 @@
 import streamlit as st
 from client.utils.auth import init_auth_state, login, render_sidebar
-from client.tabs import choir_attendance, live_monitor, access_logs, choir_management
 
 
 def main():
@@ -19,17 +18,28 @@ def main():
 
     # --- Main App Logic ---
     if not st.session_state.authenticated:
+        # The login page only needs Streamlit; pandas, supabase and the tabs load after sign in
         login()
     else:
+        from client.tabs import choir_attendance, live_monitor, access_logs, gate_analytics, attendance_summary, choir_management
+        from client.utils.frame_store import render_memory_report
+        from client.warmup import start_warmup, render_cache_status
+
+        # Background refresh of shared caches (started once per server process)
+        start_warmup()
+
         # Sidebar for logout
         render_sidebar()
+        with st.sidebar:
+            render_memory_report()
+            render_cache_status()
         
         # Refresh button
         if st.button('Refresh Data'):
             st.rerun()
 
         # Main tabs
-        tab1, tab2, tab3, tab4 = st.tabs(["🎵 Choir Attendance", "⚠️ Live Monitor", "🔒 Access Logs", "⚙️ Management"])
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🎵 Choir Attendance", "⚠️ Live Monitor", "🔒 Access Logs", "📊 Gate Analytics", "📈 Summary", "⚙️ Management"])
 
         with tab1:
             choir_attendance.render()
@@ -41,6 +51,12 @@ def main():
             access_logs.render()
         
         with tab4:
+            gate_analytics.render()
+        
+        with tab5:
+            attendance_summary.render()
+
+        with tab6:
             choir_management.render()
 
 if __name__ == "__main__":
@@ -1,6 +1,16 @@
+import time
 import streamlit as st
 import pandas as pd
-from client.utils.supabase_client import get_supabase
+from datetime import datetime, timedelta, timezone
+from client.utils.supabase_client import current_date, get_supabase
+from client.tabs.activity_data import ACTIVITIES, LOCAL_TZ, get_activity, get_all_persons_df
+from client.tabs.choir_management import search_person
+from client.utils.scan_log import decode_scans, to_display_frame
+
+# Scans per page of the person timeline
+TIMELINE_PAGE_SIZE = 100
+# Default span of the person timeline
+TIMELINE_DEFAULT_DAYS = 365
 
 def get_access_logs():
     """Fetch recent access logs"""
@@ -8,69 +18,223 @@ def get_access_logs():
         supabase = get_supabase()
         # Increased limit to better capture daily flows for In/Out logic
         response = supabase.table("access_logs").select("*").order("created_at", desc=True).limit(200).execute()
-        return response.data
+        return decode_scans(response.data)
     except Exception as e:
         st.error(f"Error fetching access logs: {e}")
-        return []
+        return decode_scans([])
 
 def get_persons():
-    """Fetch all persons with their card UIDs"""
-    try:
-        supabase = get_supabase()
-        response = supabase.table("persons").select("card_uid, name, surname").execute()
-        return response.data
-    except Exception as e:
+    """Fetch all persons with their card UIDs (from the shared persons cache)"""
+    df_persons = get_all_persons_df()
+    if df_persons.empty or "card_uid" not in df_persons.columns:
         return []
+    return df_persons[["card_uid", "name", "surname"]].to_dict("records")
 
 def color_status(val):
     """Color code status values"""
     color = "#d4edda" if val else "#f8d7da" 
     return f'background-color: {color}; color: black'
 
+def build_access_history(logs_data, persons_data):
+    """Join decoded access logs with person names and work out the In/Out direction of each scan"""
+    df_logs = to_display_frame(logs_data)
+    
+    uid_col = "card_uid" if "card_uid" in df_logs.columns else "student_uid"
+    
+    if persons_data:
+        df_persons = pd.DataFrame(persons_data)
+        if uid_col in df_logs.columns and "card_uid" in df_persons.columns:
+            df_logs = df_logs.merge(df_persons, left_on=uid_col, right_on="card_uid", how="left")
+    
+    # --- Logic for In/Out Calculation ---
+    df_logs = df_logs.sort_values("created_at")
+    
+    df_logs['direction'] = "" 
+    
+    if 'status' in df_logs.columns:
+        mask_success = df_logs['status'] == True
+        df_logs.loc[mask_success, 'temp_date'] = df_logs.loc[mask_success, 'created_at'].dt.date
+        df_logs.loc[mask_success, 'seq'] = df_logs[mask_success].groupby([uid_col, 'temp_date'], observed=True).cumcount()
+        
+        def get_direction(seq):
+            if pd.isna(seq): return ""
+            return "IN" if seq % 2 == 0 else "OUT"
+        
+        df_logs.loc[mask_success, 'direction'] = df_logs.loc[mask_success, 'seq'].apply(get_direction)
+        df_logs.drop(columns=['temp_date', 'seq'], errors='ignore', inplace=True)
+
+    df_logs = df_logs.sort_values("created_at", ascending=False)
+
+    desired_cols = ["created_at", "direction", "name", "surname", uid_col, "status", "lock"]
+    final_cols = [c for c in desired_cols if c in df_logs.columns]
+    return df_logs[final_cols]
+
+def _utc_midnight(day):
+    """ISO timestamp (UTC) of the start of a school day"""
+    return datetime.combine(day, datetime.min.time(), tzinfo=LOCAL_TZ).astimezone(timezone.utc).isoformat()
+
+
+def get_card_scans_page(card_uid, start_date, end_date, cursor=None, page_size=TIMELINE_PAGE_SIZE):
+    """
+    One page of a card's scans between two dates (inclusive), newest first; returns (rows, next cursor).
+
+    Keyset paging on the access_logs (card_uid, created_at) index: each page
+    reads the index down from its cursor, so a page costs the same however far
+    back it is. The cursor is the oldest timestamp shown plus the ids shown at
+    that timestamp, so scans sharing a timestamp are neither skipped nor
+    repeated. The next cursor is None on the last page.
+    """
+    try:
+        supabase = get_supabase()
+        query = supabase.table("access_logs").select("*").eq("card_uid", card_uid) \
+            .gte("created_at", _utc_midnight(start_date))
+        if cursor:
+            query = query.lte("created_at", cursor["created_at"])
+        else:
+            query = query.lt("created_at", _utc_midnight(end_date + timedelta(days=1)))
+        shown = set(cursor["ids"]) if cursor else set()
+        rows = query.order("created_at", desc=True).limit(page_size + len(shown) + 1).execute().data
+    except Exception as e:
+        st.error(f"Error fetching scans: {e}")
+        return [], None
+
+    rows = [row for row in rows if row["id"] not in shown]
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    oldest = rows[-1]["created_at"]
+    ids = [row["id"] for row in rows if row["created_at"] == oldest]
+    if cursor and cursor["created_at"] == oldest:
+        ids += cursor["ids"]
+    return rows, {"created_at": oldest, "ids": ids}
+
+
+def count_granted_before(card_uid, rows):
+    """
+    Granted scans of a card on the school day of a page's oldest scan that are not on the page.
+
+    These are the scans before the page in the day's In/Out sequence; a
+    person has a handful a day, so their ids are fetched and the ones on the
+    page (sharing the oldest timestamp) left out.
+    """
+    oldest = rows[-1]["created_at"]
+    day = pd.Timestamp(oldest).tz_convert(LOCAL_TZ).date()
+    try:
+        supabase = get_supabase()
+        response = supabase.table("access_logs").select("id").eq("card_uid", card_uid).eq("status", True) \
+            .gte("created_at", _utc_midnight(day)).lte("created_at", oldest).execute()
+    except Exception as e:
+        st.error(f"Error fetching scans: {e}")
+        return 0
+    shown = {row["id"] for row in rows}
+    return sum(1 for row in response.data if row["id"] not in shown)
+
+
+def get_manual_overrides(person_id, start_date, end_date):
+    """Manual attendance records of a person in every activity between two dates (inclusive)"""
+    records = []
+    for activity in ACTIVITIES:
+        config = get_activity(activity)
+        try:
+            supabase = get_supabase()
+            response = supabase.table(config["manual_table"]).select("*").eq("person_id", person_id) \
+                .gte("practice_date", start_date.strftime("%Y-%m-%d")) \
+                .lte("practice_date", end_date.strftime("%Y-%m-%d")).execute()
+        except Exception as e:
+            st.error(f"Error fetching manual attendance: {e}")
+            continue
+        records.extend({**row, "activity": config["label"]} for row in response.data)
+    return sorted(records, key=lambda row: str(row.get("practice_date")), reverse=True)
+
+
+def build_timeline(rows, earlier_granted=0):
+    """
+    Display frame of one page of a card's scans, newest first, with the In/Out direction of each.
+
+    Directions follow build_access_history: granted scans alternate IN/OUT
+    per school day. The page is complete for every day but its oldest, whose
+    `earlier_granted` scans are on later pages.
+    """
+    df = to_display_frame(decode_scans(rows)).sort_values("created_at", kind="stable")
+    df["direction"] = ""
+    if "status" in df.columns:
+        granted = df["status"] == True
+        day = df["created_at"].dt.date
+        seq = df[granted].groupby(day[granted]).cumcount()
+        seq[day[granted] == day.min()] += earlier_granted
+        df.loc[granted, "direction"] = seq.map(lambda n: "IN" if n % 2 == 0 else "OUT")
+    df = df.sort_values("created_at", ascending=False, kind="stable")
+    return df[[c for c in ("created_at", "direction", "lock", "status") if c in df.columns]]
+
+
+def render_person_timeline():
+    """Every scan and manual attendance record of one person, paged"""
+    st.markdown("### Person Timeline")
+    person = search_person("Find a person", key="timeline")
+    if person is None:
+        return
+
+    today = current_date()
+    period = st.date_input("Between", value=(today - timedelta(days=TIMELINE_DEFAULT_DAYS), today), key="timeline_period")
+    if not isinstance(period, (tuple, list)) or len(period) < 2:
+        st.caption("Pick an end date.")
+        return
+    start, end = period[0], period[-1]
+
+    card_uid = person.get("card_uid")
+    if card_uid:
+        # The cursors of the pages seen, reset when the person or the period changes
+        selection = (card_uid, start.isoformat(), end.isoformat())
+        state = st.session_state.get("timeline_pages")
+        if state is None or state["selection"] != selection:
+            state = st.session_state["timeline_pages"] = {"selection": selection, "cursors": [None]}
+
+        started = time.perf_counter()
+        rows, next_cursor = get_card_scans_page(card_uid, start, end, cursor=state["cursors"][-1])
+        earlier = count_granted_before(card_uid, rows) if rows else 0
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if rows:
+            df = build_timeline(rows, earlier)
+            st.dataframe(
+                df.style.map(color_status, subset=["status"] if "status" in df.columns else None),
+                column_config={"created_at": "Time", "direction": "In/Out", "lock": "Gate", "status": "Success"},
+                width='stretch', hide_index=True,
+            )
+        else:
+            st.info(f"No scans of card {card_uid} in this period.")
+
+        page = len(state["cursors"])
+        col1, col2, col3 = st.columns([3, 1, 1])
+        col1.caption(f"Page {page}, {len(rows)} scans, loaded in {elapsed_ms:.0f} ms.")
+        if col2.button("Newer", key="timeline_newer", disabled=page == 1):
+            state["cursors"].pop()
+            st.rerun()
+        if col3.button("Older", key="timeline_older", disabled=next_cursor is None):
+            state["cursors"].append(next_cursor)
+            st.rerun()
+    else:
+        st.info("This person has no card; only manual attendance is shown.")
+
+    overrides = get_manual_overrides(person["id"], start, end)
+    st.markdown("#### Manual Attendance")
+    if not overrides:
+        st.caption("No manual attendance records in this period.")
+        return
+    df = pd.DataFrame(overrides)
+    columns = {"practice_date": "Date", "activity": "Activity", "attended": "Present", "excuse": "Excused", "updated_at": "Updated"}
+    st.dataframe(df[[c for c in columns if c in df.columns]].rename(columns=columns), width='stretch', hide_index=True)
+
+
 def render():
     """Main render function for Access Logs tab"""
     st.markdown("### Access History")
     logs_data = get_access_logs()
     
-    if logs_data:
-        df_logs = pd.DataFrame(logs_data)
-        
+    if logs_data.num_rows:
+        df_logs = build_access_history(logs_data, get_persons())
         uid_col = "card_uid" if "card_uid" in df_logs.columns else "student_uid"
         
-        persons_data = get_persons()
-        if persons_data:
-            df_persons = pd.DataFrame(persons_data)
-            if uid_col in df_logs.columns and "card_uid" in df_persons.columns:
-                df_logs = df_logs.merge(df_persons, left_on=uid_col, right_on="card_uid", how="left")
-        
-        if "created_at" in df_logs.columns:
-            df_logs["created_at"] = pd.to_datetime(df_logs["created_at"])
-            if df_logs["created_at"].dt.tz is None:
-                 df_logs["created_at"] = df_logs["created_at"].dt.tz_localize("UTC")
-            df_logs["created_at"] = df_logs["created_at"].dt.tz_convert("Africa/Johannesburg")
-
-        # --- Logic for In/Out Calculation ---
-        df_logs = df_logs.sort_values("created_at")
-        
-        df_logs['direction'] = "" 
-        
-        if 'status' in df_logs.columns:
-            mask_success = df_logs['status'] == True
-            df_logs.loc[mask_success, 'temp_date'] = df_logs.loc[mask_success, 'created_at'].dt.date
-            df_logs.loc[mask_success, 'seq'] = df_logs[mask_success].groupby([uid_col, 'temp_date']).cumcount()
-            
-            def get_direction(seq):
-                if pd.isna(seq): return ""
-                return "IN" if seq % 2 == 0 else "OUT"
-            
-            df_logs.loc[mask_success, 'direction'] = df_logs.loc[mask_success, 'seq'].apply(get_direction)
-            df_logs.drop(columns=['temp_date', 'seq'], errors='ignore', inplace=True)
-
-        df_logs = df_logs.sort_values("created_at", ascending=False)
-
-        desired_cols = ["created_at", "direction", "name", "surname", uid_col, "status", "lock"]
-        final_cols = [c for c in desired_cols if c in df_logs.columns]
-        
         column_config = {
             "name": "Name",
             "surname": "Surname",
@@ -82,10 +246,13 @@ def render():
         }
         
         st.dataframe(
-            df_logs[final_cols].style.map(color_status, subset=['status'] if 'status' in df_logs.columns else None),
+            df_logs.style.map(color_status, subset=['status'] if 'status' in df_logs.columns else None),
             column_config=column_config,
             width='stretch'
         )
         
     else:
         st.info("No access logs found.")
+
+    st.divider()
+    render_person_timeline()
@@ -0,0 +1,566 @@
+import threading
+import streamlit as st
+import pandas as pd
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from client.utils.supabase_client import fetch_pages, get_supabase, get_secret, get_user_client, run_as
+from client.utils.scan_index import ScanIndex
+from client.utils.scan_log import concat_scans, decode_scans
+from client.utils.search_index import SearchIndex
+from client.utils.cache import cached
+from client.utils.late_scans import DEFAULT_GRACE_SECONDS, LateScanDetector
+from client.utils.write_queue import DEFAULT_QUEUE_PATH, WriteQueue
+
+LOCAL_TZ = ZoneInfo("Africa/Johannesburg")
+
+# Fields of the persons directory matched by the person search
+PERSON_SEARCH_FIELDS = ("name", "surname", "grade", "card_uid")
+
+# Columns needed to decide presence; keeps window fetches small
+SCAN_COLUMNS = "card_uid, lock, created_at"
+# Columns the late-scan detector reads (ingested_at is from db/migrations/005_access_logs_ingested_at.sql)
+INGEST_COLUMNS = "id, card_uid, lock, created_at, ingested_at"
+
+# Activities that share the gate readers. Table names default to the choir
+# convention: {key}_register, {key}_practice_dates and manual_{key}_attendance.
+ACTIVITIES = {
+    "choir": {"label": "Choir"},
+}
+
+
+def register_activity(key, label=None, register_table=None, dates_table=None, manual_table=None):
+    """Register an activity (sports, clubs, detention, ...) with the attendance engine"""
+    config = {"label": label or key.replace("_", " ").title()}
+    if register_table:
+        config["register_table"] = register_table
+    if dates_table:
+        config["dates_table"] = dates_table
+    if manual_table:
+        config["manual_table"] = manual_table
+    ACTIVITIES[key] = config
+    return get_activity(key)
+
+
+def get_activity(key):
+    """Return the table configuration for an activity, filling in conventional defaults"""
+    if key not in ACTIVITIES:
+        raise KeyError(f"Unknown activity: {key}")
+    config = dict(ACTIVITIES[key])
+    config["key"] = key
+    config.setdefault("label", key.title())
+    config.setdefault("register_table", f"{key}_register")
+    config.setdefault("dates_table", f"{key}_practice_dates")
+    config.setdefault("manual_table", f"manual_{key}_attendance")
+    return config
+
+
+@cached("persons", ttl=3600)
+def get_all_persons_df():
+    """Fetch the persons directory once so it can be shared between activities and sessions"""
+    try:
+        supabase = get_supabase()
+        rows = fetch_pages(lambda: supabase.table("persons").select("*").order("id"))
+        return pd.DataFrame(rows) if rows else pd.DataFrame()
+    except Exception as e:
+        st.error(f"Error fetching persons: {e}")
+        return pd.DataFrame()
+
+
+_person_index = {"frame": None, "index": None}
+_person_index_lock = threading.Lock()
+
+
+def get_person_index():
+    """Search index over the persons directory, rebuilt only when the directory is reloaded"""
+    persons_df = get_all_persons_df()
+    with _person_index_lock:
+        # The cached frame object is the directory version: a refresh or invalidation replaces it
+        if _person_index["frame"] is not persons_df:
+            records = persons_df.astype(object).where(persons_df.notna(), None).to_dict("records") if not persons_df.empty else []
+            _person_index["index"] = SearchIndex(records, PERSON_SEARCH_FIELDS)
+            _person_index["frame"] = persons_df
+        return _person_index["index"]
+
+
+def get_activity_members(activity, year, persons_df=None):
+    """Fetch the members of an activity for a specific year"""
+    config = get_activity(activity)
+    try:
+        supabase = get_supabase()
+        register_response = supabase.table(config["register_table"]).select("*").eq("year", year).execute()
+        register_data = register_response.data
+
+        if not register_data:
+            return pd.DataFrame()
+
+        if persons_df is None:
+            persons_df = get_all_persons_df()
+
+        if persons_df.empty:
+            return pd.DataFrame()
+
+        df_register = pd.DataFrame(register_data)
+
+        # Filter out removed members
+        if "removed" in df_register.columns:
+            df_register = df_register[df_register["removed"] != True]
+
+        # Merge to get names and card_uids
+        pid_col = "person_id" if "person_id" in df_register.columns else "personId"
+
+        if pid_col in df_register.columns and "id" in persons_df.columns:
+            return df_register.merge(persons_df, left_on=pid_col, right_on="id", how="inner")
+        else:
+            st.error(f"Column mismatch: Found {df_register.columns} in register and {persons_df.columns} in persons")
+            return pd.DataFrame()
+
+    except Exception as e:
+        st.error(f"Error fetching {config['label'].lower()} members: {e}")
+        return pd.DataFrame()
+
+
+def get_rosters(activities, year):
+    """Fetch the members of several activities, downloading the persons directory only once"""
+    persons_df = get_all_persons_df()
+    return {activity: get_activity_members(activity, year, persons_df=persons_df) for activity in activities}
+
+
+def get_activity_sessions(activity, year):
+    """Fetch the session dates of an activity for a specific year"""
+    config = get_activity(activity)
+    try:
+        supabase = get_supabase()
+        response = supabase.table(config["dates_table"]).select("*") \
+            .gte("date", f"{year}-01-01") \
+            .lte("date", f"{year}-12-31") \
+            .execute()
+        if response.data:
+            df = pd.DataFrame(response.data)
+            if "date" in df.columns:
+                df["date"] = pd.to_datetime(df["date"])
+                return df.sort_values("date")
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"Error fetching {config['label'].lower()} dates: {e}")
+        return pd.DataFrame()
+
+
+def create_activity_session(activity, session_date, start_time=None, end_time=None, lock=None):
+    """Create a new session date for an activity, optionally limited to a time window and gate"""
+    config = get_activity(activity)
+    try:
+        supabase = get_supabase()
+        date_str = session_date.strftime("%Y-%m-%d")
+        # Check if exists
+        existing = supabase.table(config["dates_table"]).select("*").eq("date", date_str).execute()
+        if not existing.data:
+            supabase.table(config["dates_table"]).insert(
+                session_record(session_date, start_time, end_time, lock)
+            ).execute()
+            return True, "Practice date created."
+        return False, "Date already exists."
+    except Exception as e:
+        return False, f"Error creating date: {e}"
+
+
+def recurring_dates(weekdays, ranges, exclude=()):
+    """Every date inside the (start, end) ranges that falls on one of the weekdays (0 = Monday), minus exclusions"""
+    weekdays = set(weekdays)
+    exclude = set(exclude)
+    dates = set()
+    for start, end in ranges:
+        day = start
+        while day <= end:
+            if day.weekday() in weekdays and day not in exclude:
+                dates.add(day)
+            day += timedelta(days=1)
+    return sorted(dates)
+
+
+def create_activity_sessions(activity, session_dates, start_time=None, end_time=None, lock=None):
+    """Create many session dates at once: one query for the existing dates, one batch insert for the rest"""
+    config = get_activity(activity)
+    session_dates = sorted(set(session_dates))
+    if not session_dates:
+        return False, "No dates to create."
+    try:
+        supabase = get_supabase()
+        existing = supabase.table(config["dates_table"]).select("date") \
+            .gte("date", session_dates[0].strftime("%Y-%m-%d")) \
+            .lte("date", session_dates[-1].strftime("%Y-%m-%d")) \
+            .execute()
+        existing_dates = {str(row["date"])[:10] for row in existing.data or []}
+        missing = [d for d in session_dates if d.strftime("%Y-%m-%d") not in existing_dates]
+        if not missing:
+            return False, "All dates already exist."
+        supabase.table(config["dates_table"]).insert(
+            [session_record(d, start_time, end_time, lock) for d in missing]
+        ).execute()
+        skipped = len(session_dates) - len(missing)
+        return True, f"Created {len(missing)} dates." + (f" {skipped} already existed." if skipped else "")
+    except Exception as e:
+        return False, f"Error creating dates: {e}"
+
+
+def session_record(session_date, start_time=None, end_time=None, lock=None):
+    """Build the row stored for a session; times and gate are optional"""
+    record = {
+        "date": session_date.strftime("%Y-%m-%d"),
+        "updated_at": datetime.now().isoformat()
+    }
+    if start_time is not None:
+        record["start_time"] = start_time.strftime("%H:%M:%S")
+    if end_time is not None:
+        record["end_time"] = end_time.strftime("%H:%M:%S")
+    if lock:
+        record["lock"] = lock
+    return record
+
+
+def _parse_time(value, default):
+    if value is None or (not isinstance(value, time) and pd.isna(value)) or value == "":
+        return default
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value))
+
+
+def session_window(session):
+    """
+    Return (start, end, lock) for a session row or a bare date.
+
+    Start and end are timezone-aware local datetimes. Sessions without
+    start/end times cover the whole local day, and sessions without a
+    gate match scans at any gate.
+    """
+    if isinstance(session, dict):
+        day = pd.to_datetime(session["date"]).date()
+        start = _parse_time(session.get("start_time"), time.min)
+        end = _parse_time(session.get("end_time"), time.max)
+        lock = session.get("lock")
+        lock = lock if isinstance(lock, str) and lock else None
+    else:
+        day = pd.to_datetime(session).date()
+        start, end, lock = time.min, time.max, None
+    return (
+        datetime.combine(day, start, tzinfo=LOCAL_TZ),
+        datetime.combine(day, end, tzinfo=LOCAL_TZ),
+        lock,
+    )
+
+
+def merge_windows(windows):
+    """Merge overlapping (start, end, lock) windows; the gate is kept only if all merged windows share it"""
+    merged = []
+    for start, end, lock in sorted(windows, key=lambda w: w[0]):
+        if merged and start <= merged[-1][1]:
+            prev_start, prev_end, prev_lock = merged[-1]
+            merged[-1] = (prev_start, max(prev_end, end), prev_lock if prev_lock == lock else None)
+        else:
+            merged.append((start, end, lock))
+    return merged
+
+
+def get_logs_for_date_range(start_date, end_date, lock=None, columns="*"):
+    """Fetch access logs for a date range (decoded, see client.utils.scan_log), optionally for one gate and a subset of columns"""
+    try:
+        supabase = get_supabase()
+
+        def query():
+            query = supabase.table("access_logs").select(columns) \
+                .gte("created_at", start_date.isoformat()) \
+                .lte("created_at", end_date.isoformat())
+            if lock:
+                query = query.eq("lock", lock)
+            return query.order("created_at").order("id")
+
+        return decode_scans(fetch_pages(query))
+    except Exception as e:
+        st.error(f"Error fetching historical logs: {e}")
+        return decode_scans([])
+
+
+def get_manual_attendance(activity, start_date, end_date):
+    """Fetch manual attendance records of an activity between two dates (inclusive)"""
+    config = get_activity(activity)
+    try:
+        supabase = get_supabase()
+
+        def query():
+            query = supabase.table(config["manual_table"]).select("*")
+            if start_date == end_date:
+                query = query.eq("practice_date", start_date.strftime("%Y-%m-%d"))
+            else:
+                query = query.gte("practice_date", start_date.strftime("%Y-%m-%d")) \
+                    .lte("practice_date", end_date.strftime("%Y-%m-%d"))
+            return query.order("practice_date").order("id")
+
+        return fetch_pages(query)
+    except Exception as e:
+        st.error(f"Error fetching manual attendance: {e}")
+        return []
+
+
+def _latest(query, column):
+    rows = query.order(column, desc=True, nullsfirst=False).limit(1).execute().data
+    return str(rows[0][column]) if rows and rows[0].get(column) is not None else None
+
+
+def probe_session_changes(activity, session):
+    """
+    Watermarks of one session, from three single-row queries.
+
+    Returns {"scans": newest scan in the session window, "manual": newest
+    manual attendance change of the date, "session": the session row's
+    updated_at}. Comparing two probes tells whether the session changed.
+    """
+    config = get_activity(activity)
+    supabase = get_supabase()
+    start, end, lock = session_window(session)
+    scans = supabase.table("access_logs").select("created_at") \
+        .gte("created_at", start.astimezone(timezone.utc).isoformat()) \
+        .lte("created_at", end.astimezone(timezone.utc).isoformat())
+    if lock:
+        scans = scans.eq("lock", lock)
+    day = start.date()
+    manual = supabase.table(config["manual_table"]).select("updated_at").eq("practice_date", day.strftime("%Y-%m-%d"))
+    dates = supabase.table(config["dates_table"]).select("updated_at").eq("date", day.strftime("%Y-%m-%d"))
+    return {
+        "scans": _latest(scans, "created_at"),
+        "manual": _latest(manual, "updated_at"),
+        "session": _latest(dates, "updated_at"),
+    }
+
+
+def probe_period_changes(activity, start_date, end_date):
+    """
+    Watermarks of an activity over a date range, like probe_session_changes.
+
+    Returns {"scans": newest scan, "manual": newest manual attendance change,
+    "session": newest session change} of the dates start_date..end_date.
+    """
+    config = get_activity(activity)
+    supabase = get_supabase()
+    start = datetime.combine(start_date, time.min, tzinfo=LOCAL_TZ).astimezone(timezone.utc)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=LOCAL_TZ).astimezone(timezone.utc)
+    first, last = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    scans = supabase.table("access_logs").select("created_at").gte("created_at", start.isoformat()).lt("created_at", end.isoformat())
+    manual = supabase.table(config["manual_table"]).select("updated_at").gte("practice_date", first).lte("practice_date", last)
+    dates = supabase.table(config["dates_table"]).select("updated_at").gte("date", first).lte("date", last)
+    return {
+        "scans": _latest(scans, "created_at"),
+        "manual": _latest(manual, "updated_at"),
+        "session": _latest(dates, "updated_at"),
+    }
+
+
+def fetch_session_changes(activity, session, since):
+    """
+    Scans and manual attendance of one session that are newer than the `since` watermarks.
+
+    Returns (first_scans, manual_records): each newly scanned card's first scan
+    in epoch microseconds, and the changed manual records per person.
+    """
+    config = get_activity(activity)
+    supabase = get_supabase()
+    start, end, lock = session_window(session)
+
+    def scans():
+        query = supabase.table("access_logs").select(SCAN_COLUMNS) \
+            .lte("created_at", end.astimezone(timezone.utc).isoformat())
+        if since.get("scans"):
+            query = query.gt("created_at", since["scans"])
+        else:
+            query = query.gte("created_at", start.astimezone(timezone.utc).isoformat())
+        if lock:
+            query = query.eq("lock", lock)
+        return query.order("created_at")
+
+    first_scans = ScanIndex(decode_scans(fetch_pages(scans))).first_scans_between(start, end, lock)
+
+    manual = supabase.table(config["manual_table"]).select("*").eq("practice_date", start.date().strftime("%Y-%m-%d"))
+    if since.get("manual"):
+        manual = manual.gt("updated_at", since["manual"])
+    manual_records = {r["person_id"]: r for r in manual.execute().data or [] if r.get("person_id")}
+    return first_scans, manual_records
+
+
+def write_attendance_batch(activity, target_date, edits):
+    """
+    Write manual attendance edits of one date as upserts on (person_id, practice_date).
+
+    `edits` maps person_id to {"attended": bool|None, "excuse": bool|None};
+    None leaves the stored value unchanged. Edits setting the same fields go in
+    one upsert, so a batch is at most three statements and concurrent writers
+    cannot create duplicate rows. Errors are raised to the caller.
+    """
+    if not edits:
+        return
+    config = get_activity(activity)
+    supabase = get_supabase()
+    practice_date = target_date.strftime("%Y-%m-%d")
+    now = datetime.now().isoformat()
+
+    # Bulk upserts need the same keys in every row; fields left out keep their stored (or default) value
+    groups = {}
+    for person_id, change in edits.items():
+        fields = {k: bool(change[k]) for k in ("attended", "excuse") if change.get(k) is not None}
+        if fields:
+            groups.setdefault(tuple(fields), []).append(
+                {"person_id": person_id, "practice_date": practice_date, **fields, "updated_at": now}
+            )
+    for rows in groups.values():
+        supabase.table(config["manual_table"]).upsert(rows, on_conflict="person_id,practice_date").execute()
+
+
+def get_scans_ingested_since(since):
+    """Scans that reached the database at or after `since` (ISO), in ingestion order"""
+    supabase = get_supabase()
+    return fetch_pages(
+        lambda: supabase.table("access_logs").select(INGEST_COLUMNS)
+        .gte("ingested_at", since).order("ingested_at").order("id")
+    )
+
+
+def get_latest_ingestion():
+    """ingested_at of the newest scan, or None"""
+    supabase = get_supabase()
+    return _latest(supabase.table("access_logs").select("ingested_at"), "ingested_at")
+
+
+@st.cache_resource
+def get_late_scan_detector():
+    """Process-wide detector of scans replayed late by offline readers"""
+    grace = get_secret("LATE_SCAN_GRACE_SECONDS")
+    return LateScanDetector(
+        get_scans_ingested_since,
+        get_latest_ingestion,
+        grace=float(grace) if grace else DEFAULT_GRACE_SECONDS,
+    )
+
+
+# Called as fn(activity, target_date, person_ids) after queued attendance edits were written
+_saved_listeners = []
+
+
+def on_attendance_saved(fn):
+    """Register a callback for written attendance edits, e.g. to drop frames built before them"""
+    if fn not in _saved_listeners:
+        _saved_listeners.append(fn)
+
+
+def _attendance_saved(activity, target_date, person_ids):
+    for fn in _saved_listeners:
+        fn(activity, target_date, person_ids)
+
+
+def write_queued_attendance(activity, target_date, edits, user_id):
+    """Write a batch from the write queue as the user who made the edits (the service account once they signed out)"""
+    client = get_user_client(user_id)
+    if client is None:
+        raise RuntimeError("The editor's session has ended and no service account is configured")
+    with run_as(client):
+        write_attendance_batch(activity, target_date, edits)
+
+
+@st.cache_resource
+def get_attendance_queue():
+    """Get the process-wide write-behind queue for manual attendance, with its worker running"""
+    path = get_secret("WRITE_QUEUE_PATH") or DEFAULT_QUEUE_PATH
+    return WriteQueue(write_queued_attendance, path=path, on_confirmed=_attendance_saved).start()
+
+
+def update_activity_attendance(activity, person_id, target_date=None, attended=None, excuse=None):
+    """Update or insert a manual attendance record of an activity (defaults to today)"""
+    try:
+        if target_date is None:
+            target_date = date.today()
+        write_attendance_batch(activity, target_date, {person_id: {"attended": attended, "excuse": excuse}})
+        return True
+    except Exception as e:
+        st.error(f"Error updating manual attendance: {e}")
+        return False
+
+
+def _empty_day():
+    return {
+        "card_uids": set(),
+        "first_scans": {},
+        "first_gates": {},
+        "manual_ids": set(),
+        "excused_ids": set(),
+        "manual_records": {},
+    }
+
+
+def compute_attendance(activity_sessions, progress=None):
+    """
+    Compute presence for many activities in one pass over the scans.
+
+    `activity_sessions` maps an activity key to its sessions, given either as
+    dates or as session rows with optional `start_time`, `end_time` and
+    `lock`. Only the scans inside the (merged) session windows are fetched,
+    once per date for all activities, and indexed by time so each session
+    picks its own window and gate. Manual attendance is fetched once per
+    activity for the whole date span.
+
+    Returns {activity: {"YYYY-MM-DD": day}} where a day holds the scanned
+    `card_uids`, each card's `first_scans` time in epoch microseconds and the
+    gate of that scan (`first_gates`), the `manual_ids` and `excused_ids`
+    person sets and the raw `manual_records` per person. Several sessions of
+    one activity on a date are merged into its day, keeping each card's
+    earliest scan (manual attendance is recorded per date anyway).
+    `progress(fraction, message)`, if given, is called per date.
+    """
+    windows = {
+        activity: [session_window(s) for s in sessions]
+        for activity, sessions in activity_sessions.items()
+    }
+
+    # 1. Card scans inside the session windows, grouped per date
+    windows_by_date = {}
+    for activity_windows in windows.values():
+        for window in activity_windows:
+            windows_by_date.setdefault(window[0].date(), []).append(window)
+
+    index_by_date = {}
+    for i, (day, day_windows) in enumerate(sorted(windows_by_date.items())):
+        if progress:
+            progress(0.9 * i / len(windows_by_date), f"Scans of {day}")
+        scans = [
+            get_logs_for_date_range(start.astimezone(timezone.utc), end.astimezone(timezone.utc), lock=lock, columns=SCAN_COLUMNS)
+            for start, end, lock in merge_windows(day_windows)
+        ]
+        index_by_date[day] = ScanIndex(concat_scans(scans))
+
+    # 2. Presence per session, and manual attendance, one fetch per activity
+    if progress:
+        progress(0.9, "Manual attendance")
+    result = {}
+    for activity, activity_windows in windows.items():
+        attendance = {}
+        for start, end, lock in sorted(activity_windows, key=lambda w: w[0]):
+            entry = attendance.setdefault(start.strftime("%Y-%m-%d"), _empty_day())
+            first_scans = index_by_date[start.date()].first_scans_between(start, end, lock)
+            first_gates = index_by_date[start.date()].first_gates_between(start, end, lock)
+            for uid, scanned_at in first_scans.items():
+                if uid not in entry["first_scans"] or scanned_at < entry["first_scans"][uid]:
+                    entry["first_scans"][uid] = scanned_at
+                    entry["first_gates"][uid] = first_gates.get(uid)
+            entry["card_uids"].update(first_scans)
+
+        if activity_windows:
+            days = sorted(w[0].date() for w in activity_windows)
+            for record in get_manual_attendance(activity, days[0], days[-1]) or []:
+                entry = attendance.get(str(record.get("practice_date", ""))[:10])
+                pid = record.get("person_id")
+                if entry is None or not pid:
+                    continue
+                entry["manual_records"][pid] = record
+                if record.get("attended"):
+                    entry["manual_ids"].add(pid)
+                if record.get("excuse"):
+                    entry["excused_ids"].add(pid)
+
+        result[activity] = attendance
+    return result
@@ -0,0 +1,214 @@
+import streamlit as st
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from client.utils.supabase_client import get_secret, get_supabase
+from client.utils.attendance_cube import (
+    DEFAULT_CUBE_PATH, DIMENSIONS, MANUAL_GATE, NO_GATE, UNKNOWN, AttendanceCube,
+)
+from client.utils.job_runner import CANCELLED, FAILED, get_job_runner, render_job_progress
+from client.tabs.activity_data import (
+    ACTIVITIES, compute_attendance, get_activity_members, get_activity_sessions, get_all_persons_df,
+)
+
+# Sessions this recent are recomputed on every update, for late manual edits
+REFRESH_DAYS = 14
+# School years kept in the cube
+DEFAULT_CUBE_YEARS = 2
+CUBE_JOB = "attendance_cube"
+
+# One update at a time, whether scheduled or started from the view
+_update_lock = threading.Lock()
+
+DIMENSION_LABELS = {"activity": "Activity", "grade": "Grade", "week": "ISO Week", "month": "Month", "gate": "Gate"}
+
+
+@st.cache_resource
+def get_attendance_cube():
+    """Get the process-wide attendance cube, loaded from its file"""
+    return AttendanceCube(get_secret("ATTENDANCE_CUBE_PATH") or DEFAULT_CUBE_PATH)
+
+
+def session_facts(members_df, entry):
+    """Cube rows of one session: members present, excused and absent per grade and gate"""
+    if members_df.empty:
+        return []
+    pid_col = next((c for c in ("id_y", "id", "person_id") if c in members_df.columns), None)
+    uids = members_df["card_uid"].to_numpy(dtype=object) if "card_uid" in members_df.columns else np.full(len(members_df), None)
+    pids = members_df[pid_col].to_numpy(dtype=object) if pid_col else np.full(len(members_df), None)
+    grades = members_df["grade"].fillna(UNKNOWN).astype(str).str.strip().replace("", UNKNOWN) \
+        if "grade" in members_df.columns else pd.Series(UNKNOWN, index=members_df.index)
+
+    by_card = np.isin(uids, list(entry["card_uids"]))
+    manual = np.isin(pids, list(entry["manual_ids"]))
+    excused = np.isin(pids, list(entry["excused_ids"])) & ~by_card & ~manual
+    present = by_card | manual
+    gates = [
+        (entry["first_gates"].get(uid) or UNKNOWN) if card else (MANUAL_GATE if by_hand else NO_GATE)
+        for uid, card, by_hand in zip(uids, by_card, manual)
+    ]
+
+    facts = pd.DataFrame({
+        "grade": grades.to_numpy(),
+        "gate": gates,
+        "present": present.astype(int),
+        "excused": excused.astype(int),
+        "absent": (~present & ~excused).astype(int),
+    })
+    return facts.groupby(["grade", "gate"], as_index=False).sum().to_dict("records")
+
+
+def update_attendance_cube(rebuild=False, progress=None):
+    """
+    Compute the sessions the cube is missing, and the recent ones again; returns the sessions computed.
+
+    Sessions are taken from the last DEFAULT_CUBE_YEARS school years up to
+    today. Each activity and year needs one roster fetch and one attendance
+    pass over just the sessions being computed. Returns 0 without doing
+    anything while another update runs.
+    """
+    if not _update_lock.acquire(blocking=False):
+        return 0
+    try:
+        return _update_cube(rebuild, progress)
+    finally:
+        _update_lock.release()
+
+
+def _update_cube(rebuild, progress):
+    cube = get_attendance_cube()
+    today = date.today()
+    recent = today - timedelta(days=REFRESH_DAYS)
+    years = range(today.year - DEFAULT_CUBE_YEARS + 1, today.year + 1)
+    persons_df = get_all_persons_df()
+
+    partitions = {}
+    steps = [(year, activity) for year in years for activity in ACTIVITIES]
+    for i, (year, activity) in enumerate(steps):
+        if progress:
+            progress(i / len(steps), f"{ACTIVITIES[activity]['label']} {year}")
+        sessions_df = get_activity_sessions(activity, year)
+        if sessions_df.empty:
+            continue
+        sessions = [
+            s for s in sessions_df.to_dict("records")
+            if s["date"].date() <= today and (rebuild or s["date"].date() >= recent or cube.needs(activity, s["date"].strftime("%Y-%m-%d")))
+        ]
+        if not sessions:
+            continue
+        members_df = get_activity_members(activity, year, persons_df=persons_df)
+        attendance = compute_attendance({activity: sessions})[activity]
+        for day, entry in attendance.items():
+            partitions[(activity, day)] = session_facts(members_df, entry)
+
+    if rebuild:
+        # Cleared only now, so the old figures stay visible while the new ones are computed
+        cube.clear()
+    if partitions:
+        cube.replace(partitions)
+        cube.save()
+    return len(partitions)
+
+
+def submit_cube_update(rebuild=False):
+    """The background job updating the cube (one at a time)"""
+    return get_job_runner().submit(
+        CUBE_JOB, {"rebuild": rebuild},
+        lambda progress: update_attendance_cube(rebuild=rebuild, progress=progress),
+        label="Rebuild attendance summary" if rebuild else "Update attendance summary",
+        client=get_supabase(),
+    )
+
+
+def render_cube_controls(cube):
+    """Cube freshness, update buttons and the progress of a running update; returns False while there is nothing to show"""
+    runner = get_job_runner()
+    stats = cube.stats()
+    for rebuild in (False, True):
+        job = runner.get(CUBE_JOB, {"rebuild": rebuild})
+        if job is None:
+            continue
+        if not job.finished:
+            render_job_progress(job, f"cube_job_{rebuild}")
+            return stats["sessions"] > 0
+        # A finished update is forgotten so the next click starts a new one
+        runner.forget(CUBE_JOB, {"rebuild": rebuild})
+        if job.status in (FAILED, CANCELLED):
+            st.error(f"Error updating the attendance summary: {job.error or 'cancelled'}")
+
+    col1, col2, col3 = st.columns([3, 1, 1])
+    if stats["sessions"]:
+        col1.caption(
+            f"{stats['sessions']} sessions aggregated into {stats['rows']:,} cells "
+            f"({stats['bytes'] / 1024:.0f} KiB), last updated {stats['updated'].replace('T', ' ')}."
+        )
+    if col2.button("Update", key="cube_update"):
+        submit_cube_update()
+        st.rerun()
+    if col3.button("Rebuild", key="cube_rebuild", help="Recompute every session, e.g. after roster or grade changes"):
+        submit_cube_update(rebuild=True)
+        st.rerun()
+    if not stats["sessions"]:
+        st.info("The attendance summary has not been built yet. Click Update to build it; it also updates in the background.")
+        return False
+    return True
+
+
+def render():
+    """Main render function for the Attendance Summary tab"""
+    st.markdown("### Attendance Summary")
+    cube = get_attendance_cube()
+    if not render_cube_controls(cube):
+        return
+
+    first, last = cube.date_range()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        period = st.date_input("Sessions between", value=(max(first, last - timedelta(days=90)), last),
+                               min_value=first, max_value=last, key="summary_period")
+    with col2:
+        rows_by = st.selectbox("Rows", DIMENSIONS, index=DIMENSIONS.index("grade"),
+                               format_func=DIMENSION_LABELS.get, key="summary_rows")
+    with col3:
+        columns = ["none"] + [d for d in DIMENSIONS if d != rows_by]
+        columns_by = st.selectbox("Columns", columns, format_func=lambda d: DIMENSION_LABELS.get(d, "—"), key="summary_columns")
+
+    col1, col2, col3 = st.columns(3)
+    activity_labels = {key: config["label"] for key, config in ACTIVITIES.items()}
+    activities = col1.multiselect("Activities", cube.values("activity"), format_func=lambda a: activity_labels.get(a, a), key="summary_activities")
+    grades = col2.multiselect("Grades", cube.values("grade"), key="summary_grades")
+    gates = col3.multiselect("Gates", cube.values("gate"), key="summary_gates")
+
+    start, end = (period[0], period[-1]) if isinstance(period, (tuple, list)) and period else (first, last)
+    by = [rows_by] if columns_by == "none" else [rows_by, columns_by]
+    started = time.perf_counter()
+    df = cube.slice(by, start=start, end=end, activity=activities, grade=grades, gate=gates)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if df.empty:
+        st.info("No sessions match the filters.")
+        return
+
+    present, excused, absent = (int(df[m].sum()) for m in ("present", "excused", "absent"))
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Attendance", f"{present / (present + absent):.1%}" if present + absent else "N/A")
+    col2.metric("Present", f"{present:,}")
+    col3.metric("Excused", f"{excused:,}")
+    col4.metric("Absent", f"{absent:,}")
+
+    if columns_by == "none":
+        display = df.rename(columns={rows_by: DIMENSION_LABELS[rows_by], "present": "Present", "excused": "Excused",
+                                     "absent": "Absent", "rate": "Attendance"})
+        st.dataframe(display, width='stretch', hide_index=True,
+                     column_config={"Attendance": st.column_config.ProgressColumn("Attendance", format="percent", min_value=0, max_value=1)})
+        st.bar_chart(df.set_index(rows_by)["rate"], height=240)
+    else:
+        pivot = df.pivot(index=rows_by, columns=columns_by, values="rate")
+        pivot = pivot.reindex(df[rows_by].drop_duplicates()).rename_axis(index=DIMENSION_LABELS[rows_by], columns=DIMENSION_LABELS[columns_by])
+        st.dataframe(pivot.style.format("{:.1%}", na_rep=""), width='stretch')
+    st.caption(
+        f"Sliced in {elapsed_ms:.1f} ms. Attendance leaves excused members out. "
+        f"Gate is the gate of a member's first scan, '{MANUAL_GATE}' for manual attendance and '{NO_GATE}' for members not present."
+    )
@@ -1,18 +1,293 @@
 import streamlit as st
 import pandas as pd
 import time
-from datetime import datetime, date
-from client.utils.supabase_client import get_supabase
-
+from datetime import datetime
+from client.tabs.activity_data import (
+    compute_attendance,
+    fetch_session_changes,
+    get_attendance_queue,
+    on_attendance_saved,
+    probe_session_changes,
+    session_window
+)
 from client.tabs.choir_data import (
+    ACTIVITY,
     get_choir_members,
     get_practice_dates,
-    create_practice_date,
-    get_logs_for_date_range,
-    get_manual_attendance_for_date,
-    update_manual_attendance
+    create_practice_date
 )
-from client.tabs.choir_yearly_report import render_yearly_report
+from client.tabs.choir_yearly_report import YEARLY_DATASET, render_yearly_report
+from client.utils.frame_store import drop_lease, get_frame_store, lease_frame
+from client.utils.scan_log import local_time
+from client.utils.supabase_client import current_date
+from client.utils.write_queue import CONFIRMED, PENDING
+
+SESSION_DATASET = "choir_session"
+
+
+def _manual_time_in(manual_record):
+    manual_updated_at = manual_record.get('updated_at')
+    if manual_updated_at:
+        try:
+            updated_time = pd.to_datetime(manual_updated_at)
+            if updated_time.tzinfo:
+                updated_time = updated_time.tz_convert("Africa/Johannesburg")
+            return updated_time.strftime("%H:%M")
+        except:
+            return "Manual"
+    return "Manual"
+
+
+def _presence_cells(is_present_via_card, first_scan, manual_record):
+    """Attendance cells of one member from card presence, first scan time and manual record"""
+    is_manually_attended = manual_record.get('attended', False)
+    has_excuse = manual_record.get('excuse', False)
+    is_present = is_present_via_card or is_manually_attended
+
+    time_in = "-"
+    if is_present_via_card:
+        if first_scan is not None:
+            time_in = local_time(first_scan).strftime("%H:%M")
+    elif is_manually_attended:
+        time_in = _manual_time_in(manual_record)
+
+    return {
+        "Present": "✅" if is_present else ("📝" if has_excuse else ""),
+        "Time In": time_in,
+        "Manual Attendance": bool(is_manually_attended),
+        "Excuse": bool(has_excuse),
+        "is_present_via_card": is_present_via_card # Hidden column for logic
+    }
+
+
+def build_session_frame(choir_df, session_row, selected_date):
+    """Build the shared base attendance frame for one practice session"""
+    # Probe before fetching so changes made during the build are picked up by the next refresh
+    built_at = datetime.now().isoformat()
+    try:
+        watermarks = probe_session_changes(ACTIVITY, session_row)
+    except Exception:
+        watermarks = None
+    day = compute_attendance({ACTIVITY: [session_row]})[ACTIVITY][selected_date.strftime("%Y-%m-%d")]
+
+    # Normalize UID columns
+    uid_col_persons = "card_uid"
+
+    table_data = []
+
+    for index, row in choir_df.iterrows():
+        uid = row.get(uid_col_persons)
+        person_id = row.get('id_y') or row.get('id') or row.get('person_id')
+
+        grade_val = row.get('grade', '')
+        if grade_val and str(grade_val).replace('.','',1).isdigit():
+            grade_val = int(float(grade_val))
+
+        table_data.append({
+            "person_id": person_id,
+            "Name and Surname": f"{row.get('name', '')} {row.get('surname', '')}",
+            "Grade": grade_val,
+            **_presence_cells(
+                uid in day["card_uids"],
+                day["first_scans"].get(uid),
+                day["manual_records"].get(person_id, {})
+            ),
+        })
+
+    df_display = pd.DataFrame(table_data)
+    if not df_display.empty:
+        df_display.set_index("person_id", inplace=True)
+    if watermarks is not None:
+        df_display.attrs["watermarks"] = watermarks
+    # Queued edits confirmed after this are not in the frame yet
+    df_display.attrs["built_at"] = built_at
+    return df_display
+
+
+def merge_session_changes(base_df, choir_df, first_scans, manual_records):
+    """
+    Copy of a session frame with newly scanned cards and changed manual records applied.
+
+    Returns (frame, changed rows).
+    """
+    df = base_df.copy()
+    person_by_uid = {}
+    for _, row in choir_df.iterrows():
+        person_id = row.get('id_y') or row.get('id') or row.get('person_id')
+        if row.get("card_uid"):
+            person_by_uid[row.get("card_uid")] = person_id
+
+    new_scans = {}
+    for uid, first_scan in first_scans.items():
+        person_id = person_by_uid.get(uid)
+        if person_id in df.index and not df.at[person_id, "is_present_via_card"]:
+            new_scans[person_id] = first_scan
+
+    changed = set(new_scans) | {pid for pid in manual_records if pid in df.index}
+    for person_id in changed:
+        was_scanned = bool(df.at[person_id, "is_present_via_card"])
+        manual_record = manual_records.get(person_id) or {
+            "attended": df.at[person_id, "Manual Attendance"],
+            "excuse": df.at[person_id, "Excuse"],
+        }
+        cells = _presence_cells(was_scanned or person_id in new_scans, new_scans.get(person_id), manual_record)
+        if was_scanned:
+            # The first scan was already known
+            cells["Time In"] = df.at[person_id, "Time In"]
+        for column, value in cells.items():
+            df.at[person_id, column] = value
+    return df, len(changed)
+
+
+def apply_late_scans(base_df, first_scans):
+    """
+    Copy of a session frame with late-arriving card scans applied.
+
+    `first_scans` maps person_id to the earliest late scan in the session
+    window (epoch microseconds). Returns (frame, changed rows); members who
+    were already scanned earlier are left as they are.
+    """
+    df = base_df.copy()
+    changed = 0
+    for person_id, first_scan in first_scans.items():
+        if person_id not in df.index:
+            continue
+        time_in = local_time(first_scan).strftime("%H:%M")
+        if df.at[person_id, "is_present_via_card"] and df.at[person_id, "Time In"] <= time_in:
+            continue
+        manual_record = {"attended": df.at[person_id, "Manual Attendance"], "excuse": df.at[person_id, "Excuse"]}
+        for column, value in _presence_cells(True, first_scan, manual_record).items():
+            df.at[person_id, column] = value
+        changed += 1
+    return df, changed
+
+
+def refresh_session_frame(choir_df, session_row, selected_date):
+    """
+    Bring the session's shared frame up to date and return a status message.
+
+    A probe of three single-row queries decides whether anything changed. New
+    scans and manual attendance changes are fetched above the frame's
+    watermarks and merged into a copy that replaces the frame in the store.
+    A changed session window or roster rebuilds the frame instead.
+    """
+    period = selected_date.strftime("%Y-%m-%d")
+    store = get_frame_store()
+    lease = st.session_state.get("attendance_lease")
+    base_df = lease.frame if lease is not None and lease.active and lease.key[:2] == (SESSION_DATASET, period) else None
+    marks = base_df.attrs.get("watermarks") if base_df is not None else None
+
+    def rebuild(message):
+        store.invalidate(SESSION_DATASET, period)
+        drop_lease("attendance_lease")
+        return message
+
+    if marks is None:
+        return rebuild("Session data reloaded.")
+    if lease.key[2] != store.version(SESSION_DATASET, period):
+        # Another session saved edits, or late offline scans were reconciled: move to the newest frame
+        drop_lease("attendance_lease")
+        return "Loaded the latest session data."
+    roster = {row.get('id_y') or row.get('id') or row.get('person_id') for _, row in choir_df.iterrows()}
+    if roster != set(base_df.index):
+        # Rows move, so pending editor changes would land on the wrong members
+        st.session_state.pop("attendance_editor", None)
+        return rebuild("The roster changed; session data reloaded.")
+
+    fetched_at = datetime.now().isoformat()
+    probe = probe_session_changes(ACTIVITY, session_row)
+    if probe == marks:
+        return "No changes since the last refresh."
+    if probe["session"] != marks["session"]:
+        return rebuild("The session times changed; session data reloaded.")
+
+    first_scans, manual_records = fetch_session_changes(ACTIVITY, session_row, marks)
+    merged, changed = merge_session_changes(base_df, choir_df, first_scans, manual_records)
+    merged.attrs["watermarks"] = probe
+    merged.attrs["built_at"] = fetched_at
+    # Publish the merged frame as the new version; sessions on the old one keep it until they refresh
+    store.invalidate(SESSION_DATASET, period)
+    new_lease = store.acquire(SESSION_DATASET, period, lambda: merged)
+    lease.release()
+    st.session_state["attendance_lease"] = new_lease
+    return f"Updated {changed} member(s) from new scans and attendance changes."
+
+
+def invalidate_saved_attendance(activity, target_date, person_ids):
+    """Once queued edits are in the database, sessions opening the date (on any replica) build fresh frames"""
+    if activity != ACTIVITY:
+        return
+    store = get_frame_store()
+    store.invalidate(SESSION_DATASET, target_date.strftime("%Y-%m-%d"))
+    store.invalidate(YEARLY_DATASET, target_date.year)
+
+
+on_attendance_saved(invalidate_saved_attendance)
+
+
+def apply_attendance_edit(df, person_id, attended=None, excuse=None, time_str=None):
+    """
+    Apply a manual attendance/excuse edit to the attendance frame in place.
+
+    Attendance and excuse are mutually exclusive. Returns the (attended, excuse)
+    values to store, with None for fields that stay unchanged.
+    """
+    is_card_present = df.at[person_id, "is_present_via_card"]
+
+    db_attended = None
+    db_excuse = None
+
+    if attended is not None:
+        if attended:
+            df.at[person_id, "Manual Attendance"] = True
+            df.at[person_id, "Excuse"] = False # Mutual Exclusivity
+            df.at[person_id, "Present"] = "✅"
+            if not is_card_present:
+                df.at[person_id, "Time In"] = time_str
+            db_attended = True
+            db_excuse = False
+        else:
+            df.at[person_id, "Manual Attendance"] = False
+            # Recalculate State
+            if is_card_present:
+                df.at[person_id, "Present"] = "✅"
+            elif df.at[person_id, "Excuse"]: 
+                df.at[person_id, "Present"] = "📝"
+                df.at[person_id, "Time In"] = "-"
+            else:
+                df.at[person_id, "Present"] = ""
+                df.at[person_id, "Time In"] = "-"
+            db_attended = False
+            # We need to check if excuse should be preserved in DB call
+            # If excuse wasn't touched in this edit, it retains its value.
+            # But update_manual_attendance updates *args*.
+            # If we pass None, the function ignores it?
+            # Let's check update_manual_attendance.
+            # Yes, it has defaults=None.
+
+    if excuse is not None:
+        if excuse:
+            df.at[person_id, "Excuse"] = True
+            df.at[person_id, "Manual Attendance"] = False # Mutual Exclusivity
+            if is_card_present:
+                df.at[person_id, "Present"] = "✅"
+            else:
+                df.at[person_id, "Present"] = "📝"
+                df.at[person_id, "Time In"] = "-"
+            db_excuse = True
+            db_attended = False
+        else:
+            df.at[person_id, "Excuse"] = False
+            if is_card_present:
+                 df.at[person_id, "Present"] = "✅"
+            elif df.at[person_id, "Manual Attendance"]:
+                 df.at[person_id, "Present"] = "✅"
+            else:
+                 df.at[person_id, "Present"] = ""
+            db_excuse = False
+
+    return db_attended, db_excuse
+
 
 @st.fragment
 
@@ -22,7 +297,7 @@ def render_session_attendance(choir_df, selected_year):
     """Render session attendance subtab with local caching and batched updates"""
     st.subheader("Session Attendance")
     
-    today = date.today()
+    today = current_date()
     
     # Fetch all practice dates for the selected year
     practice_dates_df = get_practice_dates(selected_year)
@@ -54,11 +329,13 @@ def render_session_attendance(choir_df, selected_year):
     with col2:
         # Create session button only makes sense for the specifically selected date
         # Check if the selected date already exists in DB
-        date_exists_in_db = False
+        session_row = None
         if not practice_dates_df.empty:
-            date_exists_in_db = selected_date in [pd.to_datetime(d).date() for d in practice_dates_df['date'].tolist()]
+            matches = practice_dates_df[practice_dates_df['date'].dt.date == selected_date]
+            if not matches.empty:
+                session_row = matches.iloc[0].to_dict()
             
-        if not date_exists_in_db:
+        if session_row is None:
             if st.button("Create Session for Selected Date"):
                 success, msg = create_practice_date(selected_date)
                 if success:
@@ -70,6 +347,8 @@ def render_session_attendance(choir_df, selected_year):
         else:
             st.write("") # placeholder
             st.success("Session exists")
+            start, end, lock = session_window(session_row)
+            st.caption(f"Scans counted {start.strftime('%H:%M')}–{end.strftime('%H:%M')}" + (f" at {lock}" if lock else " at any gate"))
     col1, col2 = st.columns([2, 1])
     with col1:
         st.write(f"Date: **{today.strftime('%A, %d %B %Y')}**")
@@ -80,157 +359,74 @@ def render_session_attendance(choir_df, selected_year):
                 st.success(msg)
             else:
                 st.info(msg)
+    period = selected_date.strftime("%Y-%m-%d")
+
     # Clear session state if the date changed
     if "current_view_date" not in st.session_state or st.session_state.current_view_date != selected_date:
         st.session_state.current_view_date = selected_date
-        st.session_state.attendance_df = None
-        st.session_state.pending_attendance_changes = {}
-        st.session_state.choir_session_exists = False
+        drop_lease("attendance_lease")
         if "attendance_editor" in st.session_state:
              del st.session_state.attendance_editor
              
-    # Initialize session state variables
-    if "attendance_df" not in st.session_state:
-        st.session_state.attendance_df = None
-    if "pending_attendance_changes" not in st.session_state:
-        st.session_state.pending_attendance_changes = {}
-    if "last_sync_time" not in st.session_state:
-        st.session_state.last_sync_time = time.time()
-    if "choir_session_exists" not in st.session_state:
-        st.session_state.choir_session_exists = False
-    
-    # Refresh button
-    if st.button('Refresh Session Data'):
-        st.session_state.attendance_df = None
-        st.session_state.pending_attendance_changes = {}
-        st.session_state.choir_session_exists = False # Force check
-        if "attendance_editor" in st.session_state:
-             del st.session_state.attendance_editor
-        st.rerun()
+    # Refresh button: merges what changed, keeping edits that are not submitted yet
+    if st.button('Refresh Session Data') and session_row is not None and not choir_df.empty:
+        try:
+            st.info(refresh_session_frame(choir_df, session_row, selected_date))
+        except Exception as e:
+            st.error(f"Error refreshing session data: {e}")
 
-    # Function to sync pending changes to DB
-    def sync_changes():
-        pending = st.session_state.pending_attendance_changes
-        if not pending:
-            return
-        
-        count = 0
-        for person_id, changes in pending.items():
-            update_manual_attendance(
-                person_id,
-                target_date=selected_date,
-                attended=changes.get('attended'), 
-                excuse=changes.get('excuse')
-            )
-            count += 1
-        
-        st.session_state.pending_attendance_changes = {}
-        st.session_state.last_sync_time = time.time()
-        # st.toast(f"Synced {count} changes.") # Optional noise
-
-    if st.session_state.attendance_df is None:
-        # Check for session
-        supabase = get_supabase()
-        check_date_str = selected_date.strftime("%Y-%m-%d")
-        session_check = supabase.table("choir_practice_dates").select("*").eq("date", check_date_str).execute()
-        
-        if session_check.data:
-            st.session_state.choir_session_exists = True
-            
-            if not choir_df.empty:
-                start_today = datetime.combine(selected_date, datetime.min.time())
-                end_today = datetime.combine(selected_date, datetime.max.time())
-                
-                todays_logs = get_logs_for_date_range(start_today, end_today)
-                df_todays_logs = pd.DataFrame(todays_logs)
-                
-                # Get manual attendance records
-                manual_attendance = get_manual_attendance_for_date(selected_date)
-                manual_attendance_dict = {}
-                if manual_attendance:
-                    for record in manual_attendance:
-                        manual_attendance_dict[record['person_id']] = {
-                            'attended': record.get('attended', False),
-                            'excuse': record.get('excuse', False),
-                            'updated_at': record.get('updated_at')
-                        }
-
-                # Normalize UID columns
-                uid_col_persons = "card_uid"
-                uid_col_logs = "card_uid" if not df_todays_logs.empty and "card_uid" in df_todays_logs.columns else "student_uid"
-                
-                present_uids = set()
-                if not df_todays_logs.empty and uid_col_logs in df_todays_logs.columns:
-                        present_uids = set(df_todays_logs[uid_col_logs].unique())
-                
-                table_data = []
-                
-                for index, row in choir_df.iterrows():
-                    uid = row.get(uid_col_persons)
-                    person_id = row.get('id_y') or row.get('id') or row.get('person_id')
-                    
-                    is_present_via_card = uid in present_uids
-                    
-                    manual_record = manual_attendance_dict.get(person_id, {})
-                    is_manually_attended = manual_record.get('attended', False)
-                    has_excuse = manual_record.get('excuse', False)
-                    
-                    is_present = is_present_via_card or is_manually_attended
-                    
-                    time_in = "-"
-                    if is_present_via_card:
-                        person_logs = df_todays_logs[df_todays_logs[uid_col_logs] == uid]
-                        if not person_logs.empty:
-                            if "created_at" in person_logs.columns:
-                                first_log = pd.to_datetime(person_logs['created_at']).min()
-                                first_log = first_log.tz_convert("Africa/Johannesburg") if first_log.tzinfo else first_log
-                                time_in = first_log.strftime("%H:%M")
-                    elif is_manually_attended:
-                        manual_updated_at = manual_record.get('updated_at')
-                        if manual_updated_at:
-                            try:
-                                updated_time = pd.to_datetime(manual_updated_at)
-                                if updated_time.tzinfo:
-                                    updated_time = updated_time.tz_convert("Africa/Johannesburg")
-                                time_in = updated_time.strftime("%H:%M")
-                            except:
-                                time_in = "Manual"
-                        else:
-                            time_in = "Manual"
-                    
-                    grade_val = row.get('grade', '')
-                    if grade_val and str(grade_val).replace('.','',1).isdigit():
-                        grade_val = int(float(grade_val))
-
-                    table_data.append({
-                        "person_id": person_id,
-                        "Name and Surname": f"{row.get('name', '')} {row.get('surname', '')}",
-                        "Grade": grade_val,
-                        "Present": "✅" if is_present else ("📝" if has_excuse else ""),
-                        "Time In": time_in,
-                        "Manual Attendance": bool(is_manually_attended),
-                        "Excuse": bool(has_excuse),
-                        "is_present_via_card": is_present_via_card # Hidden column for logic
-                    })
-                
-                df_display = pd.DataFrame(table_data)
-                if not df_display.empty:
-                    df_display.set_index("person_id", inplace=True)
-                
-                st.session_state.attendance_df = df_display
-        else:
-             st.session_state.choir_session_exists = False
-             st.session_state.attendance_df = pd.DataFrame() # Empty placeholder
+    queue = get_attendance_queue()
+    attendance_df = None
+    if session_row is not None and not choir_df.empty:
+        base_df = lease_frame(
+            "attendance_lease", SESSION_DATASET, period,
+            lambda: build_session_frame(choir_df, session_row, selected_date)
+        )
+        # Pending edits, and confirmed ones the base was built without, are the overlay on the shared base;
+        # confirmed edits already in the base only get their marker, so later changes from elsewhere show
+        attendance_df = base_df.copy()
+        attendance_df["Sync"] = ""
+        built_at = base_df.attrs.get("built_at")
+        person_ids = {str(pid): pid for pid in attendance_df.index}
+        for edit in queue.edits_for(ACTIVITY, selected_date):
+            person_id = person_ids.get(edit["person_id"])
+            if person_id is None:
+                continue
+            if edit["status"] != CONFIRMED or built_at is None or edit["confirmed_at"] > built_at:
+                apply_attendance_edit(
+                    attendance_df, person_id,
+                    attended=edit["attended"],
+                    excuse=edit["excuse"],
+                    time_str=datetime.fromisoformat(edit["queued_at"]).strftime("%H:%M")
+                )
+            if edit["status"] == CONFIRMED:
+                attendance_df.at[person_id, "Sync"] = "✔️"
+            elif edit["last_error"]:
+                attendance_df.at[person_id, "Sync"] = "⚠️ retrying"
+            else:
+                attendance_df.at[person_id, "Sync"] = "⏳"
 
-    # Using Cached Session Existence State
-    if st.session_state.choir_session_exists and st.session_state.attendance_df is not None and not st.session_state.attendance_df.empty:
+    if attendance_df is not None and not attendance_df.empty:
         
         st.write("**Manual Attendance & Excuses**")
         st.caption("Batch select attendees below. Click 'Update Attendance' to save changes and calculate totals.")
+
+        counts = queue.status_counts(ACTIVITY, selected_date)
+        if counts.get(PENDING):
+            sync_col1, sync_col2 = st.columns([3, 1])
+            with sync_col1:
+                st.info(f"⏳ {counts[PENDING]} change(s) saved locally and waiting to be written to the database. {counts.get(CONFIRMED, 0)} confirmed.")
+                if queue.last_error:
+                    st.warning(f"Saving to the database failed: {queue.last_error}")
+            with sync_col2:
+                if st.button("Sync Now"):
+                    queue.wake()
+                    time.sleep(1) # Give the worker a moment before rerun
+                    st.rerun()
         
         with st.form("attendance_form"):
             edited_df = st.data_editor(
-                st.session_state.attendance_df,
+                attendance_df,
                 column_config={
                     "Name and Surname": st.column_config.TextColumn("Name and Surname", disabled=True),
                     "Grade": st.column_config.NumberColumn("Grade", disabled=True, format="%d"),
@@ -239,6 +435,7 @@ def render_session_attendance(choir_df, selected_year):
                     "Manual Attendance": st.column_config.CheckboxColumn("Manual Attendance"),
                     "Excuse": st.column_config.CheckboxColumn("Excuse"),
                     "is_present_via_card": None, # Hide this column
+                    "Sync": st.column_config.TextColumn("Sync", disabled=True, help="⏳ saved locally, ✔️ written to the database"),
                 },
                 width='stretch',
                 key="attendance_editor",
@@ -260,7 +457,7 @@ def render_session_attendance(choir_df, selected_year):
                 
                 # Check if we have changes
                 if changes:
-                    df = st.session_state.attendance_df
+                    df = attendance_df
                     current_time_str = datetime.now().strftime("%H:%M")
                     updates_made = 0
                     
@@ -272,71 +469,22 @@ def render_session_attendance(choir_df, selected_year):
                         except (ValueError, IndexError):
                             continue
                             
-                        attended = diff.get("Manual Attendance")
-                        excuse = diff.get("Excuse")
-                        
-                        # Logic: Update Local DF & DB
-                        is_card_present = df.at[person_id, "is_present_via_card"]
-                        
-                        db_attended = None
-                        db_excuse = None
-
-                        if attended is not None:
-                            if attended:
-                                df.at[person_id, "Manual Attendance"] = True
-                                df.at[person_id, "Excuse"] = False # Mutual Exclusivity
-                                df.at[person_id, "Present"] = "✅"
-                                if not is_card_present:
-                                    df.at[person_id, "Time In"] = current_time_str
-                                db_attended = True
-                                db_excuse = False
-                            else:
-                                df.at[person_id, "Manual Attendance"] = False
-                                # Recalculate State
-                                if is_card_present:
-                                    df.at[person_id, "Present"] = "✅"
-                                elif df.at[person_id, "Excuse"]: 
-                                    df.at[person_id, "Present"] = "📝"
-                                    df.at[person_id, "Time In"] = "-"
-                                else:
-                                    df.at[person_id, "Present"] = ""
-                                    df.at[person_id, "Time In"] = "-"
-                                db_attended = False
-                                # We need to check if excuse should be preserved in DB call
-                                # If excuse wasn't touched in this edit, it retains its value.
-                                # But update_manual_attendance updates *args*.
-                                # If we pass None, the function ignores it?
-                                # Let's check update_manual_attendance.
-                                # Yes, it has defaults=None.
-
-                        if excuse is not None:
-                            if excuse:
-                                df.at[person_id, "Excuse"] = True
-                                df.at[person_id, "Manual Attendance"] = False # Mutual Exclusivity
-                                if is_card_present:
-                                    df.at[person_id, "Present"] = "✅"
-                                else:
-                                    df.at[person_id, "Present"] = "📝"
-                                    df.at[person_id, "Time In"] = "-"
-                                db_excuse = True
-                                db_attended = False
-                            else:
-                                df.at[person_id, "Excuse"] = False
-                                if is_card_present:
-                                     df.at[person_id, "Present"] = "✅"
-                                elif df.at[person_id, "Manual Attendance"]:
-                                     df.at[person_id, "Present"] = "✅"
-                                else:
-                                     df.at[person_id, "Present"] = ""
-                                db_excuse = False
-
-                        # Perform DB Update
+                        db_attended, db_excuse = apply_attendance_edit(
+                            df, person_id,
+                            attended=diff.get("Manual Attendance"),
+                            excuse=diff.get("Excuse"),
+                            time_str=current_time_str
+                        )
+
+                        # Queue the DB update; the background worker writes it in batches
                         if db_attended is not None or db_excuse is not None:
-                            update_manual_attendance(person_id, target_date=selected_date, attended=db_attended, excuse=db_excuse)
+                            queue.enqueue(ACTIVITY, person_id, selected_date, attended=db_attended, excuse=db_excuse,
+                                          user_id=st.session_state.user.id)
                             updates_made += 1
 
                     if updates_made > 0:
-                        st.success(f"Updated {updates_made} records.")
+                        # Frames are invalidated when the queue confirms the write (invalidate_saved_attendance)
+                        st.success(f"Saved {updates_made} records. They are synced to the database in the background.")
                         # Clear edits ?
                         st.session_state["attendance_editor"]["edited_rows"] = {}
                         st.rerun() 
@@ -346,7 +494,7 @@ def render_session_attendance(choir_df, selected_year):
         # Calculate and display totals from SESSION DF
         st.divider()
         
-        df_calc = st.session_state.attendance_df
+        df_calc = attendance_df
         total_members = len(df_calc)
         present_count = 0
         excuse_count = 0
@@ -375,7 +523,7 @@ def render_session_attendance(choir_df, selected_year):
         with total_cols[3]:
             st.metric("❌ Absent", absent_count)
 
-    else:
+    elif session_row is None:
         st.info("No practice session created for this date.")
 
 
@@ -384,7 +532,7 @@ def render():
     """Main render function for Choir Attendance tab"""
     st.header("Choir Attendance Dashboard")
     
-    current_year = datetime.now().year
+    current_year = current_date().year
     selected_year = st.number_input("Year", min_value=2020, max_value=2030, value=current_year, step=1)
     
     choir_df = get_choir_members(selected_year)
@@ -1,18 +1,82 @@
+import codecs
+import csv
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 from client.utils.supabase_client import get_supabase
+from client.tabs.activity_data import get_all_persons_df, get_person_index, recurring_dates, session_record
+from client.tabs.choir_data import get_choir_members, create_practice_dates
+from client.tabs.choir_yearly_report import YEARLY_DATASET
+from client.utils.frame_store import get_frame_store
+
+# Number of search matches offered in the person pickers
+SEARCH_RESULTS = 20
+
+# Bulk import: accepted column headings (lowercased) for each persons field
+IMPORT_COLUMNS = {
+    "name": ("name", "first name", "firstname", "first_name"),
+    "surname": ("surname", "last name", "lastname", "last_name"),
+    "grade": ("grade",),
+    "card_uid": ("card_uid", "card uid", "uid", "card"),
+}
+DEFAULT_IMPORT_BATCH_SIZE = 200
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
 
 def get_all_persons():
-    """Fetch all persons from the database"""
-    try:
-        supabase = get_supabase()
-        response = supabase.table("persons").select("*").order("surname", desc=False).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        st.error(f"Error fetching persons: {e}")
+    """Fetch all persons, ordered by surname (from the shared persons cache)"""
+    df_persons = get_all_persons_df()
+    if df_persons.empty:
         return []
+    if "surname" in df_persons.columns:
+        df_persons = df_persons.sort_values("surname", kind="stable")
+    return df_persons.astype(object).where(df_persons.notna(), None).to_dict("records")
+
+
+def person_label(person):
+    """Display label for a person in the pickers"""
+    grade = person.get("grade")
+    uid = person.get("card_uid")
+    label = f"{person.get('name', '')} {person.get('surname', '')} (Grade {grade if grade is not None else 'N/A'})"
+    return f"{label} · {uid}" if uid else label
+
+
+def search_person(label, key, exclude=None):
+    """Search box plus a picker over the best matches; returns the chosen person or None"""
+    index = get_person_index()
+    query = st.text_input(label, key=f"{key}_query", placeholder="Name, surname, grade or card UID")
+    if not query.strip():
+        st.caption(f"Type to search {len(index)} persons.")
+        return None
+
+    matches = index.search(query, k=SEARCH_RESULTS, exclude=exclude)
+    if not matches:
+        st.info("No matching persons.")
+        return None
+
+    return st.selectbox(
+        f"{len(matches)} best matches",
+        options=matches,
+        format_func=person_label,
+        key=f"{key}_select",
+    )
+
+
+def pick_persons(label, key, exclude=None):
+    """Search box plus a multi-select that keeps its picks across searches; returns the chosen persons"""
+    basket_key = f"{key}_basket"
+    basket = st.session_state.setdefault(basket_key, {})
+    index = get_person_index()
+    query = st.text_input(f"Search {label}", key=f"{key}_query", placeholder="Name, surname, grade or card UID")
+    matches = index.search(query, k=SEARCH_RESULTS, exclude=exclude) if query.strip() else []
+    if query.strip() and not matches:
+        st.info("No matching persons.")
+
+    options = list(basket.values()) + [p for p in matches if p["id"] not in basket]
+    chosen = st.multiselect(label, options=options, default=list(basket.values()), format_func=person_label)
+    st.session_state[basket_key] = {p["id"]: p for p in chosen}
+    return chosen
 
 
 def get_choir_register(year):
@@ -26,45 +90,69 @@ def get_choir_register(year):
         return []
 
 
-def add_person_to_choir(person_id, year):
-    """Add a person to the choir register"""
+def add_persons_to_choir(person_ids, year):
+    """Add several persons to the choir register in one batch"""
+    person_ids = list(dict.fromkeys(person_ids))
+    if not person_ids:
+        return False, "No persons selected."
     try:
         supabase = get_supabase()
-        
-        # Check if already exists
-        existing = supabase.table("choir_register").select("*").eq("personId", person_id).eq("year", year).execute()
-        
-        if existing.data and len(existing.data) > 0:
-            # If exists but removed, update to not removed
-            if existing.data[0].get("removed", False):
-                supabase.table("choir_register").update({"removed": False, "updated_at": datetime.now().isoformat()}).eq("id", existing.data[0]["id"]).execute()
-                return True, "Person re-added to choir register."
-            else:
-                return False, "Person already in choir register for this year."
-        else:
-            # Insert new record
-            supabase.table("choir_register").insert({
-                "personId": person_id,
-                "year": year,
-                "removed": False,
-                "updated_at": datetime.now().isoformat()
-            }).execute()
-            return True, "Person added to choir register."
+        now = datetime.now().isoformat()
+        
+        # The lookup only counts who is registered already; the write is one upsert on ("personId", year),
+        # so sessions adding the same person at once cannot create a second row
+        existing = supabase.table("choir_register").select("personId, removed").eq("year", year).in_("personId", person_ids).execute()
+        existing_by_person = {row["personId"]: row for row in existing.data or []}
+        
+        # Rows that were removed earlier are re-activated, the rest inserted
+        readd_ids = [pid for pid, row in existing_by_person.items() if row.get("removed", False)]
+        new_ids = [pid for pid in person_ids if pid not in existing_by_person]
+        already = len(existing_by_person) - len(readd_ids)
+        
+        if readd_ids or new_ids:
+            supabase.table("choir_register").upsert([
+                {"personId": pid, "year": year, "removed": False, "updated_at": now}
+                for pid in readd_ids + new_ids
+            ], on_conflict="personId,year").execute()
+        
+        if not readd_ids and not new_ids:
+            return False, "Selected persons are already in the choir register for this year."
+        get_choir_members.invalidate()
+        msg = f"Added {len(new_ids) + len(readd_ids)} persons to the choir register."
+        if already:
+            msg += f" {already} already registered."
+        return True, msg
     except Exception as e:
-        return False, f"Error adding person: {e}"
+        return False, f"Error adding persons: {e}"
 
 
-def remove_person_from_choir(register_id):
-    """Remove a person from choir register (soft delete by setting removed=True)"""
+def remove_persons_from_choir(register_ids):
+    """Remove several persons from the choir register (soft delete by setting removed=True)"""
+    if not register_ids:
+        return False, "No members selected."
     try:
         supabase = get_supabase()
         supabase.table("choir_register").update({
             "removed": True,
             "updated_at": datetime.now().isoformat()
-        }).eq("id", register_id).execute()
-        return True, "Person removed from choir register."
+        }).in_("id", list(register_ids)).execute()
+        get_choir_members.invalidate()
+        return True, f"Removed {len(register_ids)} persons from the choir register."
+    except Exception as e:
+        return False, f"Error removing persons: {e}"
+
+
+def rollover_choir_register(from_year, to_year):
+    """Copy the active members of one year's register into another year"""
+    try:
+        supabase = get_supabase()
+        response = supabase.table("choir_register").select("personId").eq("year", from_year).eq("removed", False).execute()
     except Exception as e:
-        return False, f"Error removing person: {e}"
+        return False, f"Error reading {from_year} register: {e}"
+    person_ids = [row["personId"] for row in response.data or []]
+    if not person_ids:
+        return False, f"No choir members found for {from_year}."
+    return add_persons_to_choir(person_ids, to_year)
 
 
 def get_all_practice_dates():
@@ -88,8 +176,8 @@ def delete_practice_date(date_id):
         return False, f"Error deleting practice date: {e}"
 
 
-def add_practice_date(practice_date):
-    """Add a new practice date"""
+def add_practice_date(practice_date, start_time=None, end_time=None, lock=None):
+    """Add a new practice date, optionally with a practice time window and gate"""
     try:
         supabase = get_supabase()
         date_str = practice_date.strftime("%Y-%m-%d")
@@ -99,10 +187,9 @@ def add_practice_date(practice_date):
         if existing.data and len(existing.data) > 0:
             return False, "Practice date already exists."
         
-        supabase.table("choir_practice_dates").insert({
-            "date": date_str,
-            "updated_at": datetime.now().isoformat()
-        }).execute()
+        supabase.table("choir_practice_dates").insert(
+            session_record(practice_date, start_time, end_time, lock)
+        ).execute()
         return True, "Practice date added."
     except Exception as e:
         return False, f"Error adding practice date: {e}"
@@ -127,6 +214,8 @@ def update_person(person_id, name=None, surname=None, grade=None):
         data["updated_at"] = datetime.now().isoformat()
         
         supabase.table("persons").update(data).eq("id", person_id).execute()
+        get_all_persons_df.invalidate()
+        get_choir_members.invalidate()
         return True, "Person updated successfully."
     except Exception as e:
         return False, f"Error updating person: {e}"
@@ -149,6 +238,7 @@ def add_new_person(name, surname, grade=None, card_uid=None):
             data["card_uid"] = card_uid
         
         supabase.table("persons").insert(data).execute()
+        get_all_persons_df.invalidate()
         return True, "Person added successfully."
     except Exception as e:
         return False, f"Error adding person: {e}"
@@ -159,11 +249,199 @@ def delete_person(person_id):
     try:
         supabase = get_supabase()
         supabase.table("persons").delete().eq("id", person_id).execute()
+        get_all_persons_df.invalidate()
+        get_choir_members.invalidate()
         return True, "Person deleted successfully."
     except Exception as e:
         return False, f"Error deleting person: {e}"
 
 
+def read_import_rows(uploaded_file):
+    """Yield (row number, raw row dict) from an uploaded CSV or XLSX file, one row at a time"""
+    uploaded_file.seek(0)
+    if uploaded_file.name.lower().endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Excel import needs openpyxl: pip install openpyxl")
+        sheet = load_workbook(uploaded_file, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            if any(v not in (None, "") for v in values):
+                yield number, dict(zip(header, values))
+    else:
+        reader = csv.DictReader(codecs.iterdecode(uploaded_file, "utf-8-sig"))
+        reader.fieldnames = [(h or "").strip().lower() for h in reader.fieldnames or []]
+        for number, row in enumerate(reader, start=2):
+            if any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                yield number, row
+
+
+def _import_value(raw, field):
+    for column in IMPORT_COLUMNS[field]:
+        value = raw.get(column)
+        if value is not None and str(value).strip() != "":
+            return str(value).strip()
+    return None
+
+
+def _uid_key(card_uid):
+    return card_uid.strip().upper() if card_uid else None
+
+
+def plan_person_import(rows, persons):
+    """
+    Validate import rows against the persons directory.
+
+    Returns (inserts, updates, unchanged, errors): new persons, changes to
+    existing persons (matched on card UID), rows that change nothing, and
+    (row number, message) for rows that cannot be imported. Rows without a
+    card, or with a card the directory does not know yet, are matched on
+    name (and grade, when several persons share the name); a new card only
+    goes to a person without one. A row matching several persons, or
+    repeating an earlier card-less row, is an error rather than another new
+    person.
+    """
+    by_uid = {_uid_key(p["card_uid"]): p for p in persons if p.get("card_uid")}
+    by_name = {}
+    for p in persons:
+        by_name.setdefault(((p.get("name") or "").lower(), (p.get("surname") or "").lower()), []).append(p)
+
+    inserts, updates, unchanged, errors = [], [], [], []
+    seen_uids = {}
+    seen_people = {}
+    # Card-less persons given a new card by an earlier row
+    carded = {}
+    for number, raw in rows:
+        name = _import_value(raw, "name")
+        surname = _import_value(raw, "surname")
+        grade = _import_value(raw, "grade")
+        card_uid = _import_value(raw, "card_uid")
+
+        if not name or not surname:
+            errors.append((number, "Name and Surname are required."))
+            continue
+        if grade is not None:
+            try:
+                grade = int(float(grade))
+            except (ValueError, OverflowError):
+                errors.append((number, f"Grade '{grade}' is not a number."))
+                continue
+            if not 1 <= grade <= 12:
+                errors.append((number, f"Grade {grade} is not between 1 and 12."))
+                continue
+
+        key = _uid_key(card_uid)
+        if key:
+            if key in seen_uids:
+                errors.append((number, f"Card UID {card_uid} already used on row {seen_uids[key]}."))
+                continue
+            seen_uids[key] = number
+
+        else:
+            person_key = (name.lower(), surname.lower(), grade)
+            if person_key in seen_people:
+                errors.append((number, f"Same person as row {seen_people[person_key]}."))
+                continue
+            seen_people[person_key] = number
+
+        existing = by_uid.get(key) if key else None
+        if existing is None:
+            # Matched on name, and on grade if the name is shared; a new card is issued to a person without one
+            matches = by_name.get((name.lower(), surname.lower()), [])
+            if key:
+                matches = [p for p in matches if not p.get("card_uid")]
+            if len(matches) > 1 and grade is not None:
+                matches = [p for p in matches if str(p.get("grade") or "").split(".")[0] == str(grade)]
+            if len(matches) > 1:
+                errors.append((number, f"{len(matches)} persons are called {name} {surname}; add their card UID to pick one."))
+                continue
+            existing = matches[0] if matches else None
+            if existing is not None and key:
+                if existing["id"] in carded:
+                    errors.append((number, f"{name} {surname} already gets a card on row {carded[existing['id']]}."))
+                    continue
+                carded[existing["id"]] = number
+
+        row = {"row": number, "name": name, "surname": surname, "grade": grade, "card_uid": card_uid}
+        if existing is None:
+            inserts.append(row)
+            continue
+
+        changes = {}
+        for field in ("name", "surname", "grade", "card_uid"):
+            current = existing.get(field)
+            if field == "grade" and current is not None:
+                try:
+                    current = int(float(current))
+                except (TypeError, ValueError, OverflowError):
+                    pass
+            if row[field] is None or (field == "card_uid" and _uid_key(row[field]) == _uid_key(current)):
+                # Blank cells keep the stored value, as does a card UID typed in another case
+                row[field] = current
+            elif row[field] != current:
+                changes[field] = row[field]
+        if changes:
+            updates.append({**row, "id": existing["id"], "changes": changes})
+        else:
+            unchanged.append(row)
+    return inserts, updates, unchanged, errors
+
+
+def _person_data(row, now):
+    # Every record in a bulk request must carry the same keys
+    return {
+        "name": row["name"],
+        "surname": row["surname"],
+        "grade": row["grade"],
+        "card_uid": row["card_uid"] or None,
+        "updated_at": now,
+    }
+
+
+def import_persons(inserts, updates, batch_size=DEFAULT_IMPORT_BATCH_SIZE):
+    """
+    Write an import plan in batches.
+
+    New persons are inserted and changed persons upserted on id, `batch_size`
+    rows per request. When a batch is rejected its rows are retried one by one
+    so the error report names the offending rows. Returns (written, errors).
+    """
+    supabase = get_supabase()
+    now = datetime.now().isoformat()
+    written, errors = 0, []
+
+    def write(rows, send):
+        nonlocal written
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                send([record for _, record in batch])
+                written += len(batch)
+            except Exception:
+                for number, record in batch:
+                    try:
+                        send([record])
+                        written += 1
+                    except Exception as e:
+                        errors.append((number, str(e)))
+
+    write(
+        [(row["row"], _person_data(row, now)) for row in inserts],
+        lambda records: supabase.table("persons").insert(records).execute(),
+    )
+    write(
+        [(row["row"], {**_person_data(row, now), "id": row["id"]}) for row in updates],
+        lambda records: supabase.table("persons").upsert(records).execute(),
+    )
+
+    if written:
+        get_all_persons_df.invalidate()
+        get_choir_members.invalidate()
+    return written, errors
+
+
 def render_choir_register_management():
     """Render the choir register management interface"""
     st.subheader("🎵 Choir Register Management")
@@ -200,60 +478,64 @@ def render_choir_register_management():
             st.dataframe(df.drop(columns=["ID"]), width='stretch', hide_index=True)
         
         with col2:
-            st.write("**Remove Member**")
-            st.caption("Select a member ID to remove")
+            st.write("**Remove Members**")
             
-            member_options = {f"{row['Name']} {row['Surname']} (Grade {row['Grade']})": row['ID'] for _, row in df.iterrows()}
+            member_options = {record["id"]: f"{row['Name']} {row['Surname']} (Grade {row['Grade']})" for record, row in zip(choir_register, display_data)}
+            selected_members = st.multiselect("Select Members", options=list(member_options), format_func=member_options.get, key="remove_member_select")
             
-            if member_options:
-                selected_member = st.selectbox("Select Member", options=list(member_options.keys()), key="remove_member_select")
-                
-                if st.button("Remove from Choir", type="secondary", key="remove_member_btn"):
-                    member_id = member_options[selected_member]
-                    success, msg = remove_person_from_choir(member_id)
-                    if success:
-                        st.success(msg)
-                        st.rerun()
-                    else:
-                        st.error(msg)
+            if st.button(f"Remove {len(selected_members) or ''} from Choir", type="secondary", key="remove_member_btn", disabled=not selected_members):
+                success, msg = remove_persons_from_choir(selected_members)
+                if success:
+                    get_frame_store().invalidate(YEARLY_DATASET, selected_year)
+                    st.success(msg)
+                    st.rerun()
+                else:
+                    st.error(msg)
     else:
         st.info(f"No choir members found for {selected_year}.")
     
     st.divider()
     
-    # Add new member
-    st.write("### Add New Member to Choir")
-    
-    all_persons = get_all_persons()
+    # Add new members
+    st.write("### Add Members to Choir")
     
-    if all_persons:
-        # Filter out persons already in choir
+    if len(get_person_index()):
+        # Persons already in the choir are left out of the matches
         choir_person_ids = {record["personId"] for record in choir_register} if choir_register else set()
-        available_persons = [p for p in all_persons if p["id"] not in choir_person_ids]
         
-        if available_persons:
-            person_options = {f"{p['name']} {p['surname']} (Grade {p.get('grade', 'N/A')})": p['id'] for p in available_persons}
-            
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                selected_person = st.selectbox("Select Person to Add", options=list(person_options.keys()), key="add_person_select")
-            
-            with col2:
-                st.write("")  # Spacer
-                st.write("")  # Spacer
-                if st.button("Add to Choir", type="primary", key="add_person_btn"):
-                    person_id = person_options[selected_person]
-                    success, msg = add_person_to_choir(person_id, selected_year)
-                    if success:
-                        st.success(msg)
-                        st.rerun()
-                    else:
-                        st.error(msg)
-        else:
-            st.info("All available persons are already in the choir register for this year.")
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            selected_persons = pick_persons("Persons to Add", key="add_person", exclude=choir_person_ids)
+        
+        with col2:
+            st.write("")  # Spacer
+            st.write("")  # Spacer
+            if st.button(f"Add {len(selected_persons) or ''} to Choir", type="primary", key="add_person_btn", disabled=not selected_persons):
+                success, msg = add_persons_to_choir([p["id"] for p in selected_persons], selected_year)
+                if success:
+                    st.session_state.pop("add_person_basket", None)
+                    get_frame_store().invalidate(YEARLY_DATASET, selected_year)
+                    st.success(msg)
+                    st.rerun()
+                else:
+                    st.error(msg)
     else:
         st.warning("No persons found in the database.")
+    
+    st.divider()
+    
+    # Roll the register over into the next year
+    st.write("### Roll Over Register")
+    next_year = selected_year + 1
+    st.caption(f"Copies every current {selected_year} member into the {next_year} register. Members already registered for {next_year} are left as they are.")
+    if st.button(f"Roll Over {selected_year} → {next_year}", key="rollover_btn", disabled=not choir_register):
+        success, msg = rollover_choir_register(selected_year, next_year)
+        if success:
+            get_frame_store().invalidate(YEARLY_DATASET, next_year)
+            st.success(msg)
+        else:
+            st.error(msg)
 
 
 def render_practice_dates_management():
@@ -271,6 +553,9 @@ def render_practice_dates_management():
             display_data.append({
                 "ID": record["id"],
                 "Date": record.get("date", "N/A"),
+                "Start": (record.get("start_time") or "")[:5] or "All day",
+                "End": (record.get("end_time") or "")[:5] or "All day",
+                "Gate": record.get("lock") or "Any",
                 "Created": record.get("created_at", "N/A")[:10] if record.get("created_at") else "N/A"
             })
         
@@ -304,6 +589,7 @@ def render_practice_dates_management():
                     else:
                         success, msg = delete_practice_date(date_id)
                         if success:
+                            get_frame_store().invalidate(YEARLY_DATASET, int(selected_date[:4]))
                             st.success(msg)
                             st.session_state.confirm_delete = None
                             st.rerun()
@@ -321,106 +607,190 @@ def render_practice_dates_management():
     
     with col1:
         new_date = st.date_input("Select Date", value=date.today(), key="new_practice_date")
+        st.caption("Only card scans inside the practice window (and at the gate, if given) count as attendance. Leave the times empty to count the whole day.")
+        time_col1, time_col2, gate_col = st.columns(3)
+        with time_col1:
+            new_start_time = st.time_input("Start Time (Optional)", value=None, key="new_practice_start")
+        with time_col2:
+            new_end_time = st.time_input("End Time (Optional)", value=None, key="new_practice_end")
+        with gate_col:
+            new_lock = st.text_input("Gate (Optional)", key="new_practice_lock").strip()
     
     with col2:
         st.write("")  # Spacer
         st.write("")  # Spacer
         if st.button("Add Practice Date", type="primary", key="add_date_btn"):
-            success, msg = add_practice_date(new_date)
+            if new_start_time and new_end_time and new_end_time <= new_start_time:
+                st.error("End time must be after start time.")
+                return
+            success, msg = add_practice_date(new_date, new_start_time, new_end_time, new_lock or None)
             if success:
+                get_frame_store().invalidate(YEARLY_DATASET, new_date.year)
                 st.success(msg)
                 st.rerun()
             else:
                 st.error(msg)
 
 
+def _date_ranges(df):
+    """(start, end) pairs from a Start/End editor table; a missing End means a single day"""
+    ranges = []
+    for row in df.to_dict("records"):
+        start, end = row.get("Start"), row.get("End")
+        if start is None or pd.isna(start):
+            continue
+        if end is None or pd.isna(end):
+            end = start
+        start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+
+def render_recurring_schedule():
+    """Render the recurring practice schedule generator"""
+    st.write("### Recurring Schedule")
+    st.caption("Creates a practice on every selected weekday inside the term dates, except on the excluded dates. Dates that already exist are skipped.")
+    
+    year = date.today().year
+    weekdays = st.multiselect("Weekdays", options=list(range(7)), format_func=WEEKDAYS.__getitem__, key="recurring_weekdays")
+    
+    col1, col2 = st.columns(2)
+    date_columns = {
+        "Start": st.column_config.DateColumn("Start", required=True),
+        "End": st.column_config.DateColumn("End"),
+    }
+    with col1:
+        st.write("**Terms**")
+        terms_df = st.data_editor(
+            pd.DataFrame({"Start": [date.today()], "End": [date(year, 12, 31)]}),
+            column_config=date_columns, num_rows="dynamic", hide_index=True, key="recurring_terms",
+        )
+    with col2:
+        st.write("**Excluded Dates** (holidays; leave End empty for a single day)")
+        exclusions_df = st.data_editor(
+            pd.DataFrame({"Start": pd.Series(dtype="object"), "End": pd.Series(dtype="object")}),
+            column_config=date_columns, num_rows="dynamic", hide_index=True, key="recurring_exclusions",
+        )
+    
+    time_col1, time_col2, gate_col = st.columns(3)
+    with time_col1:
+        start_time = st.time_input("Start Time (Optional)", value=None, key="recurring_start")
+    with time_col2:
+        end_time = st.time_input("End Time (Optional)", value=None, key="recurring_end")
+    with gate_col:
+        lock = st.text_input("Gate (Optional)", key="recurring_lock").strip()
+    
+    excluded = set(recurring_dates(range(7), _date_ranges(exclusions_df)))
+    dates = recurring_dates(weekdays, _date_ranges(terms_df), exclude=excluded)
+    if not weekdays or not dates:
+        st.info("Select weekdays and term dates to preview the schedule.")
+        return
+    
+    with st.expander(f"Preview: {len(dates)} practice dates"):
+        st.dataframe(
+            pd.DataFrame({"Date": dates, "Day": [WEEKDAYS[d.weekday()] for d in dates]}),
+            width='stretch', hide_index=True,
+        )
+    
+    if st.button(f"Create {len(dates)} Practice Dates", type="primary", key="recurring_create_btn"):
+        if start_time and end_time and end_time <= start_time:
+            st.error("End time must be after start time.")
+            return
+        success, msg = create_practice_dates(dates, start_time, end_time, lock or None)
+        if success:
+            for affected_year in {d.year for d in dates}:
+                get_frame_store().invalidate(YEARLY_DATASET, affected_year)
+            st.success(msg)
+            st.rerun()
+        else:
+            st.error(msg)
+
+
 def render_persons_management():
     """Render the persons management interface"""
     st.subheader("👤 Persons Management")
     
-    # Display all persons
-    st.write("### All Persons")
-    all_persons = get_all_persons()
+    # Look up persons; the whole directory is only counted, never rendered
+    st.write("### Find Persons")
+    index = get_person_index()
     
-    if all_persons:
-        # Prepare data for display
-        display_data = []
-        for person in all_persons:
-            display_data.append({
-                "ID": person["id"],
+    if len(index):
+        st.write(f"**Total Persons: {len(index)}**")
+        
+        query = st.text_input("Search Persons", key="persons_table_query", placeholder="Name, surname, grade or card UID")
+        matches = index.search(query, k=SEARCH_RESULTS) if query.strip() else []
+        if not query.strip():
+            st.caption(f"Type to list up to {SEARCH_RESULTS} matching persons.")
+        elif not matches:
+            st.info("No matching persons.")
+        else:
+            df = pd.DataFrame([{
                 "Name": person.get("name", "N/A"),
                 "Surname": person.get("surname", "N/A"),
                 "Grade": person.get("grade", "N/A"),
-                "Card UID": person.get("card_uid", "N/A")
-            })
-        
-        df = pd.DataFrame(display_data)
-        
-        st.write(f"**Total Persons: {len(df)}**")
-        
-        # Display the dataframe
-        st.dataframe(df.drop(columns=["ID"]), width='stretch', hide_index=True)
+                "Card UID": person.get("card_uid", "N/A"),
+            } for person in matches])
+            st.dataframe(df, width='stretch', hide_index=True)
         
         st.divider()
         
         # Edit person section
         st.write("### Edit Person")
         
-        # Create a selectbox with person names
-        person_options = {f"{row['Name']} {row['Surname']} (ID: {row['ID']})": row['ID'] for _, row in df.iterrows()}
-        
-        selected_person_key = st.selectbox("Select Person to Edit", options=list(person_options.keys()), key="edit_person_select")
-        selected_person_id = person_options[selected_person_key]
-        
-        # Get the current person data
-        selected_person_data = df[df['ID'] == selected_person_id].iloc[0]
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            new_name = st.text_input("Name", value=selected_person_data['Name'], key="edit_name")
+        selected_person = search_person("Search Person to Edit", key="edit_person")
         
-        with col2:
-            new_surname = st.text_input("Surname", value=selected_person_data['Surname'], key="edit_surname")
-        
-        with col3:
-            # Handle grade - could be N/A or a number
-            current_grade = selected_person_data['Grade']
-            if current_grade == "N/A" or pd.isna(current_grade):
-                grade_value = None
-            else:
-                try:
-                    grade_value = int(float(current_grade))
-                except:
-                    grade_value = None
+        if selected_person is not None:
+            selected_person_id = selected_person["id"]
+            current_name = selected_person.get("name") or ""
+            current_surname = selected_person.get("surname") or ""
             
-            new_grade = st.number_input("Grade", min_value=1, max_value=12, value=grade_value, key="edit_grade")
-        
-        if st.button("Update Person", type="primary", key="update_person_btn"):
-            # Only update if values changed
-            name_changed = new_name != selected_person_data['Name']
-            surname_changed = new_surname != selected_person_data['Surname']
+            col1, col2, col3 = st.columns(3)
             
-            # Check if grade changed
-            grade_changed = False
-            if new_grade is not None:
-                if grade_value is None or new_grade != grade_value:
-                    grade_changed = True
+            # Widget keys include the person so the fields reset when another person is picked
+            with col1:
+                new_name = st.text_input("Name", value=current_name, key=f"edit_name_{selected_person_id}")
             
-            if name_changed or surname_changed or grade_changed:
-                success, msg = update_person(
-                    selected_person_id,
-                    name=new_name if name_changed else None,
-                    surname=new_surname if surname_changed else None,
-                    grade=new_grade if grade_changed else None
-                )
-                if success:
-                    st.success(msg)
-                    st.rerun()
+            with col2:
+                new_surname = st.text_input("Surname", value=current_surname, key=f"edit_surname_{selected_person_id}")
+            
+            with col3:
+                # Handle grade - could be missing or a number
+                current_grade = selected_person.get("grade")
+                if current_grade is None or pd.isna(current_grade):
+                    grade_value = None
                 else:
-                    st.error(msg)
-            else:
-                st.info("No changes to save.")
+                    try:
+                        grade_value = int(float(current_grade))
+                    except:
+                        grade_value = None
+                
+                new_grade = st.number_input("Grade", min_value=1, max_value=12, value=grade_value, key=f"edit_grade_{selected_person_id}")
+            
+            if st.button("Update Person", type="primary", key="update_person_btn"):
+                # Only update if values changed
+                name_changed = new_name != current_name
+                surname_changed = new_surname != current_surname
+                
+                # Check if grade changed
+                grade_changed = False
+                if new_grade is not None:
+                    if grade_value is None or new_grade != grade_value:
+                        grade_changed = True
+                
+                if name_changed or surname_changed or grade_changed:
+                    success, msg = update_person(
+                        selected_person_id,
+                        name=new_name if name_changed else None,
+                        surname=new_surname if surname_changed else None,
+                        grade=new_grade if grade_changed else None
+                    )
+                    if success:
+                        st.success(msg)
+                        st.rerun()
+                    else:
+                        st.error(msg)
+                else:
+                    st.info("No changes to save.")
         
         st.divider()
         
@@ -457,6 +827,59 @@ def render_persons_management():
                 st.error("Name and Surname are required.")
     else:
         st.info("No persons found in the database.")
+    
+    st.divider()
+    render_bulk_import()
+
+
+def render_bulk_import():
+    """Render the bulk import of persons from a CSV or Excel file"""
+    st.write("### Bulk Import")
+    st.caption("Columns: Name, Surname, Grade (optional), Card UID (optional). Existing persons are matched on Card UID, or on name when the row has no Card UID or a new one; a new Card UID is assigned to the matching person without a card.")
+    
+    uploaded_file = st.file_uploader("CSV or Excel file", type=["csv", "xlsx"], key="import_file")
+    if uploaded_file is None:
+        return
+    
+    try:
+        inserts, updates, unchanged, errors = plan_person_import(read_import_rows(uploaded_file), get_all_persons())
+    except Exception as e:
+        st.error(f"Error reading file: {e}")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("New", len(inserts))
+    col2.metric("Changed", len(updates))
+    col3.metric("Unchanged", len(unchanged))
+    col4.metric("Errors", len(errors))
+    
+    if inserts:
+        with st.expander(f"New persons ({len(inserts)})"):
+            st.dataframe(pd.DataFrame(inserts), width='stretch', hide_index=True)
+    if updates:
+        with st.expander(f"Changed persons ({len(updates)})"):
+            st.dataframe(pd.DataFrame([
+                {"row": u["row"], "name": u["name"], "surname": u["surname"],
+                 "changes": ", ".join(f"{field} → {value}" for field, value in u["changes"].items())}
+                for u in updates
+            ]), width='stretch', hide_index=True)
+    if errors:
+        with st.expander(f"Rows that will be skipped ({len(errors)})", expanded=True):
+            st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]), width='stretch', hide_index=True)
+    
+    if not inserts and not updates:
+        st.info("Nothing to import.")
+        return
+    
+    batch_size = st.number_input("Rows per request", min_value=1, max_value=1000, value=DEFAULT_IMPORT_BATCH_SIZE, step=50, key="import_batch_size")
+    if st.button(f"Import {len(inserts) + len(updates)} Persons", type="primary", key="import_persons_btn"):
+        with st.spinner("Importing..."):
+            written, write_errors = import_persons(inserts, updates, batch_size=batch_size)
+        if written:
+            st.success(f"Imported {written} persons.")
+        if write_errors:
+            st.error(f"{len(write_errors)} rows could not be written.")
+            st.dataframe(pd.DataFrame(write_errors, columns=["Row", "Error"]), width='stretch', hide_index=True)
 
 
 
@@ -473,6 +896,8 @@ def render():
     
     with tab2:
         render_practice_dates_management()
+        st.divider()
+        render_recurring_schedule()
     
     with tab3:
         render_persons_management()
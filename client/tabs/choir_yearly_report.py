@@ -1,97 +1,188 @@
+import io
 import streamlit as st
 import pandas as pd
-from client.tabs.choir_data import get_practice_dates, get_logs_for_date_range, get_manual_attendance_for_date
+from client.tabs.activity_data import compute_attendance
+from client.tabs.choir_data import ACTIVITY, get_practice_dates
+from client.utils.frame_store import get_frame_store, lease_frame
+from client.utils.job_runner import CANCELLED, FAILED, get_job_runner, render_job_progress
+from client.utils.supabase_client import get_supabase
+
+YEARLY_DATASET = "choir_yearly"
+REPORT_JOB = "yearly_report"
+EXPORT_JOB = "yearly_export"
+
+
+def build_attendance_matrix(members_df, attendance_map):
+    """Build the person x date attendance matrix from an engine attendance map"""
+    matrix = []
+    dates_list = sorted(attendance_map.keys())
+
+    for _, person in members_df.iterrows():
+        uid = person.get("card_uid")
+        # Resolve person_id just like in choir_attendance.py
+        person_id = person.get('id_y') or person.get('id') or person.get('person_id')
+
+        row_data = {
+            "Name": f"{person.get('name', '')} {person.get('surname', '')}"
+        }
+        total_attended = 0
+        excused_count = 0
+
+        for d in dates_list:
+            day_data = attendance_map[d]
+
+            # Check status
+            in_logs = uid in day_data["card_uids"]
+            in_manual = person_id in day_data["manual_ids"]
+            in_excused = person_id in day_data["excused_ids"]
+
+            attended = in_logs or in_manual
+
+            if attended:
+                row_data[d] = "✅"
+                total_attended += 1
+            elif in_excused:
+                row_data[d] = "📝"
+                excused_count += 1
+            else:
+                row_data[d] = "❌"
+
+        row_data["Total"] = total_attended
+        row_data["%"] = attendance_percentage(total_attended, excused_count, len(dates_list))
+
+        matrix.append(row_data)
+
+    return pd.DataFrame(matrix)
+
+
+def attendance_percentage(attended, excused, practices):
+    """Attendance percentage label; excused days do not count"""
+    net_practices = practices - excused
+    if net_practices > 0:
+        return f"{(attended / net_practices * 100):.1f}%"
+    return "N/A"
+
+
+def apply_late_attendance(report_df, members_df, day, person_ids):
+    """
+    Copy of a yearly matrix with members marked present on `day` ("YYYY-MM-DD") after late scans.
+
+    Only the affected rows' totals are recomputed. Returns (frame, changed
+    rows), or None when the matrix does not match the roster or the date.
+    """
+    if day not in report_df.columns or len(report_df) != len(members_df):
+        return None
+    positions = {}
+    for position, (_, person) in enumerate(members_df.iterrows()):
+        positions[person.get('id_y') or person.get('id') or person.get('person_id')] = position
+    date_columns = [c for c in report_df.columns if c not in ("Name", "Total", "%")]
+
+    df = report_df.copy()
+    changed = 0
+    for person_id in person_ids:
+        position = positions.get(person_id)
+        if position is None or df.iat[position, df.columns.get_loc(day)] == "✅":
+            continue
+        row = df.index[position]
+        df.at[row, day] = "✅"
+        cells = df.loc[row, date_columns]
+        df.at[row, "Total"] = int((cells == "✅").sum())
+        df.at[row, "%"] = attendance_percentage(df.at[row, "Total"], int((cells == "📝").sum()), len(date_columns))
+        changed += 1
+    return df, changed
+
+
+def build_yearly_report(choir_df, practice_dates_df, progress=None):
+    """Compile the yearly attendance matrix for the choir"""
+    attendance_map = compute_attendance({ACTIVITY: practice_dates_df.to_dict("records")}, progress=progress)[ACTIVITY]
+    if progress:
+        progress(0.95, "Building the matrix")
+    return build_attendance_matrix(choir_df, attendance_map)
+
+
+def export_xlsx(report_df, sheet_name):
+    """The report as XLSX file content"""
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise ValueError("Excel export needs openpyxl: pip install openpyxl")
+    buffer = io.BytesIO()
+    report_df.to_excel(buffer, index=False, sheet_name=sheet_name[:31])
+    return buffer.getvalue()
+
+
+def render_job_outcome(job, key, what):
+    """Show why a finished job has no result, with a button to run it again; returns True if it should be resubmitted"""
+    if job.status == FAILED:
+        st.error(f"Error {what}: {job.error}")
+    else:
+        st.info(f"Stopped {what}.")
+    return st.button("Try Again" if job.status == FAILED else "Start Again", key=f"{key}_again")
+
 
 def render_yearly_report(choir_df, selected_year):
     """Render yearly attendance report subtab"""
     st.subheader(f"Attendance Report {selected_year}")
-    
+
     practice_dates_df = get_practice_dates(selected_year)
-    
+
     if practice_dates_df.empty:
         st.info("No practice dates recorded yet for this year.")
     else:
-        attendance_map = {} 
-        
-        with st.spinner("Compiling yearly report..."):
-            for _, date_row in practice_dates_df.iterrows():
-                p_date = date_row['date']
-                p_date_str = p_date.strftime("%Y-%m-%d")
-                
-                # 1. Get Log Attendance (Card Scans)
-                d_start = p_date.replace(hour=0, minute=0, second=0)
-                d_end = p_date.replace(hour=23, minute=59, second=59)
-                
-                logs = get_logs_for_date_range(d_start, d_end)
-                log_uids = set()
-                if logs:
-                    dfl = pd.DataFrame(logs)
-                    c = "card_uid" if "card_uid" in dfl.columns else "student_uid"
-                    if c in dfl.columns:
-                        log_uids = set(dfl[c].unique())
-
-                # 2. Get Manual Attendance
-                manual_recs = get_manual_attendance_for_date(p_date.date())
-                manual_person_ids = set()
-                excused_person_ids = set()
-                
-                if manual_recs:
-                    for r in manual_recs:
-                        pid = r.get('person_id')
-                        if pid:
-                            if r.get('attended'):
-                                manual_person_ids.add(pid)
-                            if r.get('excuse'):
-                                excused_person_ids.add(pid)
-                
-                attendance_map[p_date_str] = {
-                    "card_uids": log_uids,
-                    "manual_ids": manual_person_ids,
-                    "excused_ids": excused_person_ids
-                }
-
-        matrix = []
-        dates_list = sorted(attendance_map.keys())
-        
-        for _, person in choir_df.iterrows():
-            uid = person.get("card_uid")
-            # Resolve person_id just like in choir_attendance.py
-            person_id = person.get('id_y') or person.get('id') or person.get('person_id')
-
-            row_data = {
-                "Name": f"{person.get('name', '')} {person.get('surname', '')}"
-            }
-            total_attended = 0
-            excused_count = 0
-            
-            for d in dates_list:
-                day_data = attendance_map[d]
-                
-                # Check status
-                in_logs = uid in day_data["card_uids"]
-                in_manual = person_id in day_data["manual_ids"]
-                in_excused = person_id in day_data["excused_ids"]
-                
-                attended = in_logs or in_manual
-                
-                if attended:
-                    row_data[d] = "✅"
-                    total_attended += 1
-                elif in_excused:
-                    row_data[d] = "📝"
-                    excused_count += 1
-                else:
-                    row_data[d] = "❌"
-            
-            row_data["Total"] = total_attended
-            
-            # Percentage ignores excused days
-            net_practices = len(dates_list) - excused_count
-            if net_practices > 0:
-                 row_data["%"] = f"{(total_attended / net_practices * 100):.1f}%"
-            else:
-                 row_data["%"] = "N/A"
-                
-            matrix.append(row_data)
-            
-        st.dataframe(pd.DataFrame(matrix), width='stretch')
+        store = get_frame_store()
+        runner = get_job_runner()
+        if st.button("Refresh Report", key="refresh_yearly_report"):
+            store.invalidate(YEARLY_DATASET, selected_year)
+
+        def build(progress=None):
+            return build_yearly_report(choir_df, practice_dates_df, progress)
+
+        # A report already in the store (this or another session's, or pre-built) is used directly;
+        # otherwise it is compiled in the background, once per year and store version
+        params = {"year": selected_year, "version": store.version(YEARLY_DATASET, selected_year)}
+        if store.peek(YEARLY_DATASET, selected_year) is None:
+            job = runner.submit(REPORT_JOB, params, build, label=f"Yearly report {selected_year}", client=get_supabase())
+            if job.status in (FAILED, CANCELLED):
+                if render_job_outcome(job, "yearly_report_job", "compiling the yearly report"):
+                    runner.forget(REPORT_JOB, params)
+                    st.rerun()
+                return
+            if not job.finished:
+                render_job_progress(job, "yearly_report_job")
+                return
+            report = job.result
+            build = lambda: report
+
+        # Shared between sessions until attendance changes or the report is refreshed
+        report_df = lease_frame("yearly_report_lease", YEARLY_DATASET, selected_year, build, follow_version=True)
+        st.dataframe(report_df, width='stretch')
+        render_export(report_df, selected_year, params)
+
+
+def render_export(report_df, selected_year, params):
+    """CSV download of the report, and an Excel export prepared in the background"""
+    runner = get_job_runner()
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "Download CSV", report_df.to_csv(index=False).encode("utf-8"),
+        file_name=f"choir_attendance_{selected_year}.csv", mime="text/csv", key="yearly_report_csv",
+    )
+
+    job = runner.get(EXPORT_JOB, params)
+    with col2:
+        if job is None:
+            if st.button("Prepare Excel Export", key="yearly_report_xlsx_start"):
+                runner.submit(EXPORT_JOB, params, lambda progress: export_xlsx(report_df, f"Choir {selected_year}"),
+                              label=f"Excel export {selected_year}")
+                st.rerun()
+        elif job.status in (FAILED, CANCELLED):
+            if render_job_outcome(job, "yearly_report_xlsx", "preparing the Excel export"):
+                runner.forget(EXPORT_JOB, params)
+                st.rerun()
+        elif not job.finished:
+            render_job_progress(job, "yearly_report_xlsx")
+        else:
+            st.download_button(
+                "Download Excel", job.result, file_name=f"choir_attendance_{selected_year}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key="yearly_report_xlsx",
+            )
@@ -0,0 +1,188 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from client.utils.supabase_client import current_date, fetch_pages, get_supabase
+from client.utils.cache import cached
+from client.utils.scan_log import DISPLAY_TZ, decode_scans
+
+# Database function from db/migrations/001_gate_traffic.sql
+GATE_TRAFFIC_RPC = "gate_traffic"
+BUCKET_MINUTES = 5
+
+TRAFFIC_COLUMNS = ["day", "lock", "slot", "granted", "unidentified"]
+MEASURES = {"Total": "total", "Granted": "granted", "Unidentified": "unidentified"}
+
+
+def _utc_bounds(start_date, end_date):
+    """UTC instants covering the local days start_date..end_date"""
+    tz = ZoneInfo(DISPLAY_TZ)
+    start = datetime.combine(start_date, datetime.min.time(), tzinfo=tz)
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def traffic_from_rpc(rows):
+    """Expand gate_traffic rows (one per day and gate, with slot arrays) into one row per slot"""
+    if not rows:
+        return pd.DataFrame(columns=TRAFFIC_COLUMNS)
+    lengths = [len(r["slots"] or []) for r in rows]
+    return pd.DataFrame({
+        "day": np.repeat([pd.Timestamp(r["day"]).date() for r in rows], lengths),
+        "lock": np.repeat([r["lock"] for r in rows], lengths),
+        "slot": np.concatenate([r["slots"] or [] for r in rows]).astype(np.int32),
+        "granted": np.concatenate([r["granted"] or [] for r in rows]).astype(np.int32),
+        "unidentified": np.concatenate([r["unidentified"] or [] for r in rows]).astype(np.int32),
+    })
+
+
+def bucket_scans(scans, column, bucket_minutes=BUCKET_MINUTES):
+    """Count decoded scans per local day, gate and time-of-day slot"""
+    if not scans.num_rows or "created_at" not in scans.column_names:
+        return pd.DataFrame(columns=["day", "lock", "slot", column])
+    local = pd.to_datetime(scans["created_at"].to_numpy(), unit="us", utc=True).tz_convert(DISPLAY_TZ)
+    frame = pd.DataFrame({
+        "day": local.date,
+        "lock": scans["lock"].to_pandas().astype(object) if "lock" in scans.column_names else None,
+        "slot": ((local.hour * 60 + local.minute) // bucket_minutes).astype(np.int32),
+    })
+    return frame.groupby(["day", "lock", "slot"], dropna=False).size().rename(column).reset_index()
+
+
+def get_gate_traffic_local(start_date, end_date, bucket_minutes=BUCKET_MINUTES):
+    """Fallback when the database function is missing: fetch the raw scans and bucket them here"""
+    supabase = get_supabase()
+    start, end = _utc_bounds(start_date, end_date)
+
+    def scans(table, columns):
+        return decode_scans(fetch_pages(
+            lambda: supabase.table(table).select(columns)
+            .gte("created_at", start.isoformat()).lt("created_at", end.isoformat())
+            .order("created_at")
+        ))
+
+    logs = scans("access_logs", "lock, status, created_at")
+    if logs.num_rows and "status" in logs.column_names:
+        # Same rule as the database function: only explicit failures are not granted
+        logs = logs.filter(logs["status"].fill_null(True))
+    granted = bucket_scans(logs, "granted", bucket_minutes)
+    unidentified = bucket_scans(scans("unidentified_cards", "lock, created_at"), "unidentified", bucket_minutes)
+
+    traffic = granted.merge(unidentified, on=["day", "lock", "slot"], how="outer")
+    traffic[["granted", "unidentified"]] = traffic[["granted", "unidentified"]].fillna(0).astype(np.int32)
+    return traffic[TRAFFIC_COLUMNS]
+
+
+def function_missing(error):
+    """Whether an RPC failed because the database function does not exist (its migration is not applied)"""
+    # PostgREST answers PGRST202 for an unknown function; a 404 without a JSON body comes through as the status
+    return str(getattr(error, "code", "")) in ("PGRST202", "404")
+
+
+@cached("gate_traffic", ttl=300)
+def get_gate_traffic(start_date, end_date, bucket_minutes=BUCKET_MINUTES):
+    """Scans per local day, gate and time-of-day slot, aggregated by the database when possible"""
+    try:
+        supabase = get_supabase()
+        start, end = _utc_bounds(start_date, end_date)
+        rows = fetch_pages(lambda: supabase.rpc(GATE_TRAFFIC_RPC, {
+            "start_at": start.isoformat(),
+            "end_at": end.isoformat(),
+            "bucket_minutes": bucket_minutes,
+            "tz": DISPLAY_TZ,
+        }))
+        traffic = traffic_from_rpc(rows)
+        traffic.attrs["source"] = "database"
+        return traffic
+    except Exception as e:
+        if not function_missing(e):
+            # Timeouts, permissions and the like would fail the raw-scan fallback too, only slower
+            st.error(f"Error fetching gate traffic: {e}")
+            return pd.DataFrame(columns=TRAFFIC_COLUMNS)
+    try:
+        traffic = get_gate_traffic_local(start_date, end_date, bucket_minutes)
+        traffic.attrs["source"] = "client"
+        return traffic
+    except Exception as e:
+        st.error(f"Error fetching gate traffic: {e}")
+        return pd.DataFrame(columns=TRAFFIC_COLUMNS)
+
+
+def slot_label(slot, bucket_minutes=BUCKET_MINUTES):
+    minutes = int(slot) * bucket_minutes
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def summarize_gates(traffic, bucket_minutes=BUCKET_MINUTES):
+    """Per gate: total scans, peak scans in one bucket (and when), and the busiest time of day on average"""
+    rows = []
+    days = traffic["day"].nunique()
+    for lock, gate in traffic.groupby("lock", dropna=False):
+        peak = gate.loc[gate["total"].idxmax()]
+        profile = gate.groupby("slot")["total"].sum() / max(days, 1)
+        rows.append({
+            "Gate": lock if lock is not None and not pd.isna(lock) else "Unknown",
+            "Scans": int(gate["total"].sum()),
+            "Unidentified": int(gate["unidentified"].sum()),
+            f"Peak per {bucket_minutes} min": int(peak["total"]),
+            "Peak At": f"{peak['day']} {slot_label(peak['slot'], bucket_minutes)}",
+            "Busiest Time (avg/day)": f"{slot_label(profile.idxmax(), bucket_minutes)} ({profile.max():.1f})",
+        })
+    return pd.DataFrame(rows).sort_values("Scans", ascending=False)
+
+
+def render_heatmap(traffic, measure, bucket_minutes=BUCKET_MINUTES):
+    """Day x time-of-day heatmap of one measure"""
+    import altair as alt
+
+    grid = traffic.groupby(["day", "slot"], as_index=False)[measure].sum()
+    grid = grid[grid[measure] > 0]
+    if grid.empty:
+        st.info("No scans for this selection.")
+        return
+    grid["time"] = [slot_label(s, bucket_minutes) for s in grid["slot"]]
+    grid["day"] = grid["day"].astype(str)
+
+    chart = alt.Chart(grid).mark_rect().encode(
+        x=alt.X("time:O", title="Time of day", axis=alt.Axis(labelOverlap=True)),
+        y=alt.Y("day:O", title="Date"),
+        color=alt.Color(f"{measure}:Q", title="Scans", scale=alt.Scale(scheme="orangered")),
+        tooltip=["day", "time", alt.Tooltip(f"{measure}:Q", title="Scans")],
+    ).properties(height=max(200, 12 * grid["day"].nunique()))
+    st.altair_chart(chart, width='stretch')
+
+
+def render():
+    """Main render function for Gate Analytics tab"""
+    st.markdown("### Gate Traffic")
+    st.caption(f"Scans per gate in {BUCKET_MINUTES}-minute buckets, school time.")
+
+    today = current_date()
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        selected = st.date_input("Date Range", value=(today - timedelta(days=90), today), key="gate_range")
+    if not isinstance(selected, (tuple, list)) or len(selected) != 2:
+        st.info("Select a start and end date.")
+        return
+    start_date, end_date = selected
+
+    traffic = get_gate_traffic(start_date, end_date)
+    if traffic.empty:
+        st.info("No gate traffic in this period.")
+        return
+    if traffic.attrs.get("source") == "client":
+        st.warning("The gate_traffic database function is not installed; scans were aggregated in the dashboard. Run the migrations (db/migrate.py up) for faster loading.")
+
+    traffic = traffic.assign(total=traffic["granted"] + traffic["unidentified"])
+    st.dataframe(summarize_gates(traffic), width='stretch', hide_index=True)
+
+    gates = sorted(traffic["lock"].dropna().unique().tolist())
+    with col2:
+        gate = st.selectbox("Gate", options=["All gates"] + gates, key="gate_select")
+    with col3:
+        measure = MEASURES[st.radio("Scans", options=list(MEASURES), horizontal=True, key="gate_measure")]
+
+    if gate != "All gates":
+        traffic = traffic[traffic["lock"] == gate]
+    render_heatmap(traffic, measure)
@@ -1,35 +1,172 @@
 import streamlit as st
-import pandas as pd
-from client.utils.supabase_client import get_supabase
+import threading
+from datetime import datetime, timedelta, timezone
+from client.utils.supabase_client import current_time, fetch_pages, get_secret, get_supabase
+from client.utils.scan_log import decode_scans, epoch_us, local_time, to_display_frame
+from client.utils.incident_tracker import (
+    CRITICAL, DEFAULT_GATE_THRESHOLD, DEFAULT_REPEAT_THRESHOLD, DEFAULT_WINDOW_SECONDS, IncidentTracker,
+)
+
+# Table from db/migrations/002_unidentified_incidents.sql
+INCIDENTS_TABLE = "unidentified_incidents"
+# Raw scans shown under the incidents
+RAW_FEED_ROWS = 50
+INCIDENT_HISTORY_DAYS = 7
+
+def _iso(us):
+    return datetime.fromtimestamp(us / 1_000_000, tz=timezone.utc).isoformat()
+
+@st.cache_resource
+def get_incident_feed():
+    """Process-wide incident tracker and the position of the last scan fed to it"""
+    window = float(get_secret("INCIDENT_WINDOW_MINUTES") or DEFAULT_WINDOW_SECONDS / 60) * 60
+    tracker = IncidentTracker(
+        window=window,
+        repeat_threshold=int(get_secret("INCIDENT_REPEAT_THRESHOLD") or DEFAULT_REPEAT_THRESHOLD),
+        gate_threshold=int(get_secret("INCIDENT_GATE_THRESHOLD") or DEFAULT_GATE_THRESHOLD),
+    )
+    # watermark: created_at (epoch us) of the newest scan fed; seen: ids fed at exactly that time
+    return {"tracker": tracker, "watermark": None, "seen": set(), "lock": threading.Lock(), "persist_error": None}
+
+def save_incidents(incidents):
+    """Upsert changed incidents; returns (bool, msg)"""
+    if not incidents:
+        return True, "Nothing to save"
+    try:
+        supabase = get_supabase()
+        rows = [{
+            "card_uid": i["card_uid"],
+            "opened_at": _iso(i["opened_at"]),
+            "last_seen": _iso(i["last_seen"]),
+            "attempts": i["attempts"],
+            "locks": i["locks"],
+            "max_per_gate": i["max_per_gate"],
+            "severity": i["severity"],
+            "status": i["status"],
+        } for i in incidents]
+        supabase.table(INCIDENTS_TABLE).upsert(rows, on_conflict="card_uid,opened_at").execute()
+        return True, f"Saved {len(rows)} incidents"
+    except Exception as e:
+        return False, f"Error saving incidents: {e}"
+
+def poll_incidents():
+    """Feed unidentified scans newer than the watermark to the tracker and persist changed incidents; returns new alerts"""
+    feed = get_incident_feed()
+    tracker = feed["tracker"]
+    alerts = []
+    with feed["lock"]:
+        # A fresh process starts one window back (from the minute, so a cassette replay asks the same), so open
+        # incidents are rebuilt after a restart
+        since = feed["watermark"] or epoch_us(current_time(timezone.utc).replace(second=0, microsecond=0)) - tracker.window_us
+        supabase = get_supabase()
+        rows = fetch_pages(
+            lambda: supabase.table("unidentified_cards").select("id, card_uid, lock, created_at")
+            .gte("created_at", _iso(since)).order("created_at").order("id")
+        )
+        for row in rows:
+            ts = epoch_us(row["created_at"])
+            if ts == feed["watermark"] and row["id"] in feed["seen"]:
+                continue
+            alerts.extend(tracker.observe(row.get("card_uid"), row.get("lock"), ts))
+            if ts != feed["watermark"]:
+                feed["watermark"], feed["seen"] = ts, set()
+            feed["seen"].add(row["id"])
+        if feed["watermark"] is None:
+            feed["watermark"] = since
+
+        changes = tracker.take_changes()
+        ok, msg = save_incidents(changes)
+        if not ok:
+            tracker.restore_changes(changes)
+        feed["persist_error"] = None if ok else msg
+    return alerts
+
+def get_incident_history(days=INCIDENT_HISTORY_DAYS):
+    """Persisted incidents of the last few days, newest first"""
+    try:
+        supabase = get_supabase()
+        # From midnight (UTC), so the filter stays the same all day and a cassette replay matches it
+        since = current_time(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+        response = supabase.table(INCIDENTS_TABLE).select("*").gte("last_seen", since.isoformat()).order("last_seen", desc=True).limit(500).execute()
+        return response.data or []
+    except Exception as e:
+        st.error(f"Error fetching incident history: {e}")
+        return []
 
 def get_unidentified_logs():
     """Fetch recent unidentified card scans"""
     try:
         supabase = get_supabase()
-        response = supabase.table("unidentified_cards").select("*").order("created_at", desc=True).limit(50).execute()
-        return response.data
+        response = supabase.table("unidentified_cards").select("*").order("created_at", desc=True).limit(RAW_FEED_ROWS).execute()
+        return decode_scans(response.data)
     except Exception as e:
         st.error(f"Error fetching unidentified logs: {e}")
-        return []
+        return decode_scans([])
+
+def incident_rows(incidents):
+    """Display rows for ranked incidents"""
+    return [{
+        "Card UID": i["card_uid"],
+        "Severity": i["severity"].title(),
+        "Status": i["status"].title(),
+        "Attempts": i["attempts"],
+        "Gates": ", ".join(i["locks"]),
+        "Max at One Gate": i["max_per_gate"],
+        "Opened": local_time(i["opened_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+        "Last Seen": local_time(i["last_seen"]).strftime("%Y-%m-%d %H:%M:%S"),
+    } for i in incidents]
 
 def render():
     """Main render function for Live Monitor tab"""
-    st.markdown("### Unidentified Card Scans")
-    data = get_unidentified_logs()
-
-    if data:
-        df = pd.DataFrame(data)
-        
-        if "created_at" in df.columns:
-            df["created_at"] = pd.to_datetime(df["created_at"])
-            if df["created_at"].dt.tz is None:
-                 df["created_at"] = df["created_at"].dt.tz_localize("UTC")
-            df["created_at"] = df["created_at"].dt.tz_convert("Africa/Johannesburg")
-        
-        display_cols = ["id", "card_uid", "lock", "created_at"]
-        display_cols = [c for c in display_cols if c in df.columns]
-        
-        st.dataframe(df[display_cols], width='stretch')
-        st.metric("Recent Unidentified Scans", len(df))
+    st.markdown("### Unidentified Card Incidents")
+    feed = get_incident_feed()
+    tracker = feed["tracker"]
+    try:
+        for alert in poll_incidents():
+            st.toast(f"{alert['severity'].title()}: card {alert['card_uid']} {alert['event']} ({alert['attempts']} attempts at {', '.join(alert['locks'])})")
+    except Exception as e:
+        st.error(f"Error reading unidentified scans: {e}")
+    if feed["persist_error"]:
+        st.warning(f"{feed['persist_error']}. Incidents are kept in memory until saving succeeds; run the migrations (db/migrate.py up) if the table is missing.")
+
+    window_minutes = tracker.window_us / 60_000_000
+    st.caption(
+        f"An incident opens when an unknown card is tried {tracker.repeat_threshold} times at one gate, "
+        f"or at {tracker.gate_threshold} gates, within {window_minutes:g} minutes."
+    )
+
+    incidents = tracker.ranked(now=epoch_us(current_time(timezone.utc)))
+    open_incidents = [i for i in incidents if i["status"] == "open"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Open Incidents", len(open_incidents))
+    col2.metric("Critical", sum(1 for i in open_incidents if i["severity"] == CRITICAL))
+    col3.metric("Cards Tracked", tracker.stats()["tracked_cards"])
+
+    for i in open_incidents[:5]:
+        message = f"Card {i['card_uid']}: {i['attempts']} attempts at {', '.join(i['locks'])}, last at {local_time(i['last_seen']).strftime('%H:%M:%S')}"
+        if i["severity"] == CRITICAL:
+            st.error(message)
+        else:
+            st.warning(message)
+
+    if incidents:
+        st.dataframe(incident_rows(incidents), width='stretch', hide_index=True)
     else:
-        st.info("No unidentified logs found.")
+        st.info("No incidents in the current window.")
+
+    with st.expander(f"Incident history (last {INCIDENT_HISTORY_DAYS} days)"):
+        history = get_incident_history()
+        if history:
+            st.dataframe(history, width='stretch', hide_index=True)
+        else:
+            st.info("No saved incidents.")
+
+    with st.expander(f"Latest {RAW_FEED_ROWS} unidentified scans"):
+        data = get_unidentified_logs()
+        if data.num_rows:
+            df = to_display_frame(data)
+            display_cols = ["id", "card_uid", "lock", "created_at"]
+            display_cols = [c for c in display_cols if c in df.columns]
+            st.dataframe(df[display_cols], width='stretch')
+        else:
+            st.info("No unidentified logs found.")
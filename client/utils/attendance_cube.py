@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+from datetime import date, datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DEFAULT_CUBE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data", "attendance_cube.arrow")
+# Bumped when the layout changes; a file of another version is rebuilt
+CUBE_VERSION = "1"
+
+DIMENSIONS = ("activity", "grade", "week", "month", "gate")
+MEASURES = ("present", "excused", "absent")
+# Gate of members present through manual attendance, and of members not present
+MANUAL_GATE = "manual"
+NO_GATE = "none"
+UNKNOWN = "unknown"
+
+_LABEL = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("activity", _LABEL),
+    ("date", pa.date32()),
+    ("week", _LABEL),
+    ("month", _LABEL),
+    ("grade", _LABEL),
+    ("gate", _LABEL),
+    ("present", pa.int32()),
+    ("excused", pa.int32()),
+    ("absent", pa.int32()),
+])
+
+
+def _partition_key(activity, day):
+    return f"{activity}|{day}"
+
+
+def _sort_key(value):
+    """Grades sort as numbers ("8" before "10"), other labels as text"""
+    return (0, int(value), "") if value.isdigit() else (1, 0, value)
+
+
+def iso_week(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class AttendanceCube:
+    """
+    Attendance counts by (activity, session date, grade, gate), in columnar form.
+
+    Each session is one partition of a few rows, one per grade and gate, with
+    the number of members present, excused and absent; ISO week and month are
+    stored next to the date so they can be grouped on directly. Partitions are
+    replaced as a whole when a session is (re)computed, so the cube is built
+    incrementally, and `built` records when each one was computed. Slicing
+    filters and groups the Arrow table in place; the cube is saved as a
+    compressed Arrow IPC file so a restart does not recompute past sessions.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self.table = SCHEMA.empty_table()
+        self.built = {}
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with pa.memory_map(self.path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return
+        metadata = table.schema.metadata or {}
+        if metadata.get(b"cube_version", b"").decode() != CUBE_VERSION:
+            return
+        self.built = json.loads(metadata.get(b"built", b"{}"))
+        self.table = table.replace_schema_metadata(None)
+
+    def save(self):
+        """Write the cube to its file (atomically, so readers never see half a file)"""
+        if not self.path:
+            return
+        with self._lock:
+            table = self.table.replace_schema_metadata({"cube_version": CUBE_VERSION, "built": json.dumps(self.built)})
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp = f"{self.path}.tmp"
+        options = pa.ipc.IpcWriteOptions(compression="zstd" if pa.Codec.is_available("zstd") else None)
+        with pa.OSFile(temp, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        os.replace(temp, self.path)
+
+    def needs(self, activity, day):
+        """Whether the session of `activity` on `day` ("YYYY-MM-DD") has not been computed"""
+        with self._lock:
+            return _partition_key(activity, day) not in self.built
+
+    def invalidate(self, day, activity=None):
+        """Mark the sessions of `day` (of one activity, or all) for recomputation; their rows stay until then"""
+        with self._lock:
+            for key in list(self.built):
+                key_activity, key_day = key.split("|", 1)
+                if key_day == day and activity in (None, key_activity):
+                    self.built.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self.table = SCHEMA.empty_table()
+            self.built = {}
+
+    def replace(self, partitions):
+        """
+        Store recomputed sessions.
+
+        `partitions` maps (activity, "YYYY-MM-DD") to rows of
+        {"grade", "gate", "present", "excused", "absent"}; an empty list
+        records a session without members.
+        """
+        columns = {name: [] for name in SCHEMA.names}
+        for (activity, day), rows in partitions.items():
+            session_date = date.fromisoformat(day)
+            for row in rows:
+                columns["activity"].append(activity)
+                columns["date"].append(session_date)
+                columns["week"].append(iso_week(session_date))
+                columns["month"].append(session_date.strftime("%Y-%m"))
+                for name in ("grade", "gate") + MEASURES:
+                    columns[name].append(row[name])
+        new = pa.table(
+            {name: pa.array(values, type=pa.string() if pa.types.is_dictionary(SCHEMA.field(name).type) else SCHEMA.field(name).type)
+             for name, values in columns.items()}
+        )
+        new = new.cast(SCHEMA)
+
+        built_at = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            keep = None
+            by_activity = {}
+            for activity, day in partitions:
+                by_activity.setdefault(activity, []).append(date.fromisoformat(day))
+            for activity, days in by_activity.items():
+                replaced = pc.and_(
+                    pc.equal(self.table["activity"].cast(pa.string()), activity),
+                    pc.is_in(self.table["date"], value_set=pa.array(days, pa.date32())),
+                )
+                keep = pc.invert(replaced) if keep is None else pc.and_(keep, pc.invert(replaced))
+            kept = self.table.filter(keep) if keep is not None else self.table
+            self.table = pa.concat_tables([kept, new]).unify_dictionaries().combine_chunks()
+            for activity, day in partitions:
+                self.built[_partition_key(activity, day)] = built_at
+
+    def values(self, dimension):
+        """Sorted distinct values of a dimension, for filter choices"""
+        with self._lock:
+            column = self.table[dimension]
+        return sorted((v for v in pc.unique(column.cast(pa.string())).to_pylist() if v is not None), key=_sort_key)
+
+    def date_range(self):
+        with self._lock:
+            if not self.table.num_rows:
+                return None, None
+            bounds = pc.min_max(self.table["date"])
+        return bounds["min"].as_py(), bounds["max"].as_py()
+
+    def slice(self, by, start=None, end=None, **filters):
+        """
+        Totals grouped by the `by` dimensions, as a DataFrame.
+
+        `start` / `end` bound the session dates (inclusive); any dimension can
+        be filtered with a list of values, e.g. grade=["8", "9"]. The rate
+        leaves excused members out, like the yearly report.
+        """
+        with self._lock:
+            table = self.table
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(table["date"], pa.scalar(start, pa.date32()))
+        if end is not None:
+            upper = pc.less_equal(table["date"], pa.scalar(end, pa.date32()))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        for dimension, values in filters.items():
+            if values:
+                selected = pc.is_in(table[dimension].cast(pa.string()), value_set=pa.array(list(values), pa.string()))
+                mask = selected if mask is None else pc.and_(mask, selected)
+        if mask is not None:
+            table = table.filter(mask)
+
+        totals = table.group_by(list(by)).aggregate([(m, "sum") for m in MEASURES])
+        totals = totals.rename_columns([name.removesuffix("_sum") for name in totals.column_names])
+        df = totals.to_pandas()
+        for dimension in by:
+            df[dimension] = df[dimension].astype(str)
+        counted = df["present"] + df["absent"]
+        df["rate"] = (df["present"] / counted.where(counted > 0)).round(3)
+        return df.sort_values(list(by), key=lambda column: column.map(_sort_key)).reset_index(drop=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self.built),
+                "rows": self.table.num_rows,
+                "bytes": self.table.nbytes,
+                "updated": max(self.built.values()) if self.built else None,
+            }
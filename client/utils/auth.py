@@ -1,23 +1,58 @@
+import json
 import streamlit as st
-from .supabase_client import get_supabase
+from .supabase_client import get_token_store
+
+# Cookie that lets a reconnecting browser resume its session. It is never put
+# in the URL, where it would end up in history, logs and shared links.
+SID_COOKIE = "eduqure_sid"
+
+def _write_sid_cookie(sid):
+    """Store the sid in the browser (or clear it when sid is None); the cookie is read back on reconnect"""
+    secure = "; Secure" if str(st.context.url or "").startswith("https://") else ""
+    if sid:
+        max_age = int(get_token_store().idle_ttl)
+        value = f"{SID_COOKIE}={sid}; Path=/; Max-Age={max_age}; SameSite=Strict{secure}"
+    else:
+        value = f"{SID_COOKIE}=; Path=/; Max-Age=0; SameSite=Strict{secure}"
+    st.html(f"<script>document.cookie = {json.dumps(value)};</script>", unsafe_allow_javascript=True)
 
 def init_auth_state():
-    """Initialize authentication state in session"""
+    """Initialize authentication state in session, resuming a stored session on reconnect"""
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False
 
+    # Links from before the cookie carried the sid in the URL: never honour them
+    st.query_params.pop("sid", None)
+
+    if "pending_sid_cookie" in st.session_state:
+        # login()/logout() rerun straight away, so the cookie is written on the next run
+        _write_sid_cookie(st.session_state.pop("pending_sid_cookie"))
+        return
+
+    sid = st.context.cookies.to_dict().get(SID_COOKIE)
+    if not st.session_state.authenticated and sid:
+        # Reconnect (browser refresh, new tab): no auth round trip unless the token expired
+        user = get_token_store().resume(sid)
+        if user is not None:
+            st.session_state.authenticated = True
+            st.session_state.user = user
+            st.session_state.sid = sid
+        else:
+            _write_sid_cookie(None)
+
 def login():
     """Display login form and handle authentication"""
     st.header("Login")
     email = st.text_input("Email").strip()
     password = st.text_input("Password", type="password").strip()
-    
+
     if st.button("Log In"):
         try:
-            supabase = get_supabase()
-            response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+            sid, user = get_token_store().sign_in(email, password)
             st.session_state.authenticated = True
-            st.session_state.user = response.user
+            st.session_state.user = user
+            st.session_state.sid = sid
+            st.session_state.pending_sid_cookie = sid
             st.success("Logged in successfully!")
             st.rerun()
         except Exception as e:
@@ -25,11 +60,10 @@ def login():
 
 def logout():
     """Handle user logout"""
-    try:
-        supabase = get_supabase()
-        supabase.auth.sign_out()
-    except:
-        pass
+    sid = st.session_state.pop("sid", None)
+    if sid:
+        get_token_store().sign_out(sid)
+    st.session_state.pending_sid_cookie = None
     st.session_state.authenticated = False
     st.session_state.pop("user", None)
     st.rerun()
@@ -0,0 +1,181 @@
+import functools
+import threading
+import time
+import streamlit as st
+from client.utils.cache_backends import DEFAULT_NAMESPACE, SharedCache, open_backend
+from client.utils.supabase_client import get_secret
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if hasattr(value, "empty"):
+        return value.empty
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+class DataCache:
+    """
+    Process-wide cache of fetched data with freshness tracking.
+
+    Entries are keyed by (name, args) and expire after their TTL. Values are
+    shared between sessions and must be treated as read-only. Empty results are
+    not cached, because the data functions return empty values on errors.
+
+    With a SharedCache, loaded values are also stored for the other replicas
+    and a local miss is first looked up there; invalidating a name drops its
+    entries on every replica.
+    """
+
+    def __init__(self, shared=None):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self.shared = shared
+
+    def _token(self, name):
+        return self.shared.token(("data", name)) if self.shared else None
+
+    def get(self, key, loader, ttl=None):
+        token = self._token(key[0])
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry["token"] == token and (entry["ttl"] is None or time.time() - entry["fetched_at"] < entry["ttl"]):
+            entry["hits"] += 1
+            return entry["value"]
+        value = self._from_shared(key, token, ttl) if self.shared else None
+        if value is not None:
+            return value
+        return self.refresh(key, loader, ttl)
+
+    def _from_shared(self, key, token, ttl, max_age=None):
+        """A fresh value another replica loaded (kept locally from now on), or None"""
+        found = self.shared.get(("data", key[0]), token, key[1])
+        if found is None:
+            return None
+        value, meta = found
+        ttl = ttl if ttl is not None else meta.get("ttl")
+        age = time.time() - meta["fetched_at"]
+        if (ttl is not None and age >= ttl) or (max_age is not None and age >= max_age):
+            return None
+        with self._lock:
+            self._entries[key] = {
+                "value": value,
+                "fetched_at": meta["fetched_at"],
+                "load_seconds": meta["load_seconds"],
+                "ttl": ttl,
+                "hits": 1,
+                "token": token,
+                "source": "shared",
+            }
+        return value
+
+    def warm(self, key, loader, ttl=None):
+        """
+        Load a value ahead of its expiry, for the warm-up scheduler.
+
+        An entry of the current token loaded within the first half of its TTL,
+        here or by another replica, is kept as it is, so replicas warming at
+        the same time load it once. Never invalidates.
+        """
+        token = self._token(key[0])
+        max_age = ttl / 2 if ttl else None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry["token"] == token and (max_age is None or time.time() - entry["fetched_at"] < max_age):
+            return entry["value"]
+        value = self._from_shared(key, token, ttl, max_age) if self.shared else None
+        if value is not None:
+            return value
+        return self.refresh(key, loader, ttl)
+
+    def refresh(self, key, loader, ttl=None):
+        """Load the value now and store it, replacing any previous one"""
+        token = self._token(key[0])
+        started = time.time()
+        value = loader()
+        if not _is_empty(value):
+            with self._lock:
+                previous = self._entries.get(key, {})
+                entry = self._entries[key] = {
+                    "value": value,
+                    "fetched_at": time.time(),
+                    "load_seconds": time.time() - started,
+                    "ttl": ttl if ttl is not None else previous.get("ttl"),
+                    "hits": 0,
+                    "token": token,
+                    "source": "loaded",
+                }
+            if self.shared:
+                meta = {"fetched_at": entry["fetched_at"], "load_seconds": entry["load_seconds"], "ttl": entry["ttl"]}
+                if not self.shared.put(("data", key[0]), token, key[1], value, ttl=entry["ttl"], meta=meta):
+                    entry["source"] = "local only"
+        return value
+
+    def invalidate(self, name):
+        """Drop every entry of a cached function (on every replica, with a shared cache)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == name]:
+                del self._entries[key]
+        if self.shared:
+            self.shared.bump(("data", name))
+
+    def freshness(self):
+        """One row per cached entry with its age"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "Data": name + (f" {', '.join(map(str, args))}" if args else ""),
+                    "Age (s)": int(now - e["fetched_at"]),
+                    "TTL (s)": e["ttl"] if e["ttl"] is not None else "-",
+                    "Load (ms)": int(e["load_seconds"] * 1000),
+                    "Hits": e["hits"],
+                    "Source": e["source"],
+                }
+                for (name, args), e in sorted(self._entries.items(), key=lambda item: str(item[0]))
+            ]
+
+
+@st.cache_resource
+def get_shared_cache():
+    """
+    The cache shared between dashboard replicas, or None (each replica caches on its own).
+
+    CACHE_BACKEND selects the backend: "memory", "disk:<directory>" or
+    "redis://host:port/db"; CACHE_NAMESPACE separates deployments using
+    one backend.
+    """
+    url = get_secret("CACHE_BACKEND")
+    if not url:
+        return None
+    return SharedCache(open_backend(url), namespace=get_secret("CACHE_NAMESPACE") or DEFAULT_NAMESPACE)
+
+
+@st.cache_resource
+def get_data_cache():
+    """Get the process-wide data cache"""
+    return DataCache(get_shared_cache())
+
+
+def cached(name, ttl=None):
+    """
+    Cache a data function's result process-wide under `name`.
+
+    The wrapped function gains `.refresh(*args)` to reload an entry now,
+    `.warm(*args)` to load it ahead of expiry unless a recent one is loaded
+    (used by the warm-up scheduler) and `.invalidate()` to drop all its
+    entries after a write.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            return get_data_cache().get((name, args), lambda: fn(*args), ttl)
+
+        wrapper.refresh = lambda *args: get_data_cache().refresh((name, args), lambda: fn(*args), ttl)
+        wrapper.warm = lambda *args: get_data_cache().warm((name, args), lambda: fn(*args), ttl)
+        wrapper.invalidate = lambda: get_data_cache().invalidate(name)
+        return wrapper
+    return decorator
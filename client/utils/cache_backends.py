@@ -0,0 +1,358 @@
+import hashlib
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import unquote, urlparse
+import pandas as pd
+import pyarrow as pa
+
+# Part of every shared key: bumped when the key layout or serialization changes,
+# so replicas running different releases never read each other's entries
+CACHE_FORMAT = "1"
+DEFAULT_NAMESPACE = "eduqure"
+# How often a replica checks whether another one invalidated a name
+DEFAULT_VERSION_CHECK_SECONDS = 5.0
+# After a backend error, the backend is left alone this long (data is loaded locally meanwhile)
+DEFAULT_RETRY_SECONDS = 30.0
+DEFAULT_TIMEOUT = 0.5
+
+_FRAME = b"A"
+_JSON = b"J"
+# Length of the JSON metadata in front of a shared entry
+_META = struct.Struct(">I")
+# What a backend call returns when the backend is unavailable
+_FAILED = object()
+
+
+def encode(value):
+    """
+    Compact bytes for a cached value: DataFrames of scalars as Arrow IPC, other values as compressed JSON.
+
+    Raises TypeError for values that cannot be represented; those are only
+    cached in-process.
+    """
+    if isinstance(value, pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(value, preserve_index=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise TypeError(f"Frame cannot be shared: {e}") from e
+        if any(pa.types.is_nested(field.type) for field in table.schema):
+            # Sets, tuples and dicts in cells would come back as arrays
+            raise TypeError("Frames with collections in their cells are not shared")
+        if value.attrs:
+            table = table.replace_schema_metadata({**table.schema.metadata, b"attrs": json.dumps(value.attrs)})
+        options = pa.ipc.IpcWriteOptions(compression="zstd" if pa.Codec.is_available("zstd") else None)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return _FRAME + sink.getvalue().to_pybytes()
+    return _JSON + zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(blob):
+    if blob[:1] == _FRAME:
+        table = pa.ipc.open_stream(blob[1:]).read_all()
+        frame = table.to_pandas()
+        attrs = (table.schema.metadata or {}).get(b"attrs")
+        if attrs:
+            frame.attrs.update(json.loads(attrs))
+        return frame
+    if blob[:1] == _JSON:
+        return json.loads(zlib.decompress(blob[1:]))
+    raise ValueError("Unknown cache entry format")
+
+
+class MemoryBackend:
+    """In-process key-value backend: shares entries between caches of one process, and stands in for the others in tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def describe(self):
+        return "memory"
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            blob, expires = item
+            if expires and expires <= time.time():
+                del self._values[key]
+                return None
+            return blob
+
+    def set(self, key, blob, ttl=None):
+        with self._lock:
+            self._values[key] = (blob, time.time() + ttl if ttl else 0)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class DiskBackend:
+    """
+    On-disk key-value backend: one file per key in a directory.
+
+    Replicas on one host (or sharing a volume) see each other's entries.
+    Files start with their expiry time and are replaced atomically, so a
+    reader never sees half an entry; expired files are removed when read.
+    """
+
+    _HEADER = struct.Struct(">d")
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def describe(self):
+        return f"disk ({self.directory})"
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        (expires,) = self._HEADER.unpack_from(data)
+        if expires and expires <= time.time():
+            self.delete(key)
+            return None
+        return data[self._HEADER.size:]
+
+    def set(self, key, blob, ttl=None):
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(self._HEADER.pack(time.time() + ttl if ttl else 0))
+            f.write(blob)
+        os.replace(temp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class RedisBackend:
+    """
+    Networked key-value backend speaking the Redis protocol (Redis, Valkey, or tools/cache_server.py).
+
+    Only GET, SET with an expiry and DEL are used, over one connection
+    guarded by a lock; the connection is reopened after an error.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    @classmethod
+    def from_url(cls, url, timeout=DEFAULT_TIMEOUT):
+        parsed = urlparse(url)
+        db = parsed.path.strip("/")
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, int(db) if db else 0,
+                   unquote(parsed.password) if parsed.password else None, timeout)
+
+    def describe(self):
+        return f"redis ({self.host}:{self.port}/{self.db})"
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def _send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RuntimeError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self._reader.read(size + 2)[:-2]
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._reply() for _ in range(size)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line!r}")
+
+    def command(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, ConnectionError):
+                self._close()
+                raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, blob, ttl=None):
+        if ttl:
+            self.command("SET", key, blob, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, blob)
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+
+def open_backend(url):
+    """
+    The backend for a CACHE_BACKEND setting.
+
+    "memory", "disk:<directory>" (or "file://<directory>") and
+    "redis://[:password@]host[:port][/db]" are understood.
+    """
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith("disk:"):
+        return DiskBackend(url[len("disk:"):])
+    if url.startswith("file://"):
+        return DiskBackend(unquote(urlparse(url).path))
+    if url.startswith("redis://"):
+        return RedisBackend.from_url(url)
+    raise ValueError(f"Unknown cache backend: {url}")
+
+
+def _digest(parts):
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:20]
+
+
+class SharedCache:
+    """
+    Entries and invalidations shared between replicas through a key-value backend.
+
+    Every name (a cached function, or a frame dataset and period) has a
+    version token in the backend; invalidating a name writes a new token,
+    and entries are stored under keys that include the token, so replicas
+    stop reading the old entries as soon as they see the new token. Tokens
+    are read again at most every `check_seconds`. Keys also carry the
+    namespace and CACHE_FORMAT. Backend errors never reach the callers:
+    reads miss and writes are skipped, and the backend is left alone for
+    `retry_seconds`.
+    """
+
+    def __init__(self, backend, namespace=DEFAULT_NAMESPACE, check_seconds=DEFAULT_VERSION_CHECK_SECONDS,
+                 retry_seconds=DEFAULT_RETRY_SECONDS):
+        self.backend = backend
+        self.namespace = namespace
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._down_until = 0.0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+        self.last_error = None
+
+    def _key(self, kind, *parts):
+        return f"{self.namespace}:{CACHE_FORMAT}:{kind}:{_digest(parts)}"
+
+    def _call(self, method, *args):
+        if time.time() < self._down_until:
+            return _FAILED
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+                self._down_until = time.time() + self.retry_seconds
+            return _FAILED
+
+    def token(self, name):
+        """The current version token of a name ("0" until it is first invalidated)"""
+        now = time.time()
+        with self._lock:
+            known = self._tokens.get(name)
+            if known is not None and now - known[1] < self.check_seconds:
+                return known[0]
+        stored = self._call("get", self._key("version", name))
+        if stored is _FAILED:
+            # The backend is unreachable: keep what was seen last
+            token = known[0] if known is not None else "0"
+        else:
+            token = stored.decode("utf-8") if stored is not None else "0"
+        with self._lock:
+            self._tokens[name] = (token, now)
+        return token
+
+    def bump(self, name):
+        """Give a name a new version token, so every replica drops its entries; returns the token"""
+        token = f"{time.time_ns():x}{random.getrandbits(32):08x}"
+        self._call("set", self._key("version", name), token.encode("utf-8"))
+        with self._lock:
+            self._tokens[name] = (token, time.time())
+        return token
+
+    def get(self, name, token, part=None):
+        """(value, meta) stored for (name, token, part), or None"""
+        blob = self._call("get", self._key("entry", name, token, part))
+        if blob is None or blob is _FAILED:
+            self.stats["misses"] += 1
+            return None
+        try:
+            (size,) = _META.unpack_from(blob)
+            meta = json.loads(blob[_META.size:_META.size + size])
+            value = decode(blob[_META.size + size:])
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.last_error = f"Unreadable entry: {e}"
+            return None
+        self.stats["hits"] += 1
+        return value, meta
+
+    def put(self, name, token, part, value, ttl=None, meta=None):
+        """Store a value (and a small dict of metadata) for other replicas; returns False if it cannot be serialized"""
+        try:
+            payload = encode(value)
+        except TypeError:
+            return False
+        header = json.dumps(meta or {}).encode("utf-8")
+        if self._call("set", self._key("entry", name, token, part), _META.pack(len(header)) + header + payload, ttl) is not _FAILED:
+            self.stats["writes"] += 1
+        return True
+
+    def status(self):
+        return {"backend": self.backend.describe(), **self.stats, "last_error": self.last_error,
+                "available": time.time() >= self._down_until}
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(Exception):
+    """A query in replay mode that the cassette has no recording of"""
+
+
+class CassetteResponse:
+    """The parts of a postgrest APIResponse the dashboard reads"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _Query:
+    """
+    Stand-in for a postgrest request builder: records the chained calls.
+
+    Any builder method (select, eq, gte, order, range, upsert, ...) is recorded
+    as (name, args, kwargs) and returns the same object; `execute` hands the
+    request to the cassette.
+    """
+
+    def __init__(self, cassette, real, kind, name, params=None):
+        self._cassette = cassette
+        self._real = real
+        self._request = {"kind": kind, "name": name, "params": params, "calls": []}
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            self._request["calls"].append([method, list(args), kwargs])
+            return self
+        return call
+
+    def _build(self):
+        """The equivalent builder on the real client"""
+        if self._request["kind"] == "rpc":
+            query = self._real.rpc(self._request["name"], self._request["params"])
+        else:
+            query = self._real.table(self._request["name"])
+        for method, args, kwargs in self._request["calls"]:
+            query = getattr(query, method)(*args, **kwargs)
+        return query
+
+    def execute(self):
+        return self._cassette.execute(self)
+
+
+class CassetteClient:
+    """Supabase client stand-in whose table and rpc queries go through a cassette"""
+
+    def __init__(self, cassette, real=None):
+        self._cassette = cassette
+        self._real = real
+
+    def table(self, name):
+        return _Query(self._cassette, self._real, "table", name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None):
+        return _Query(self._cassette, self._real, "rpc", fn, params or {})
+
+
+class Cassette:
+    """
+    Recorded Supabase queries and their responses, for deterministic profiling.
+
+    In record mode every query made through `client(real)` runs against the
+    real client and is appended to a gzipped NDJSON file: a "req" line with
+    the table or function, the chained filters and projection, the latency
+    and a digest of the response, and a "res" line the first time a response
+    body is seen (repeated polls share one body). In replay mode the same
+    queries are answered from the file, in recorded order for repeats, after
+    the recorded latency times `latency_scale` (0 for none); a query that was
+    not recorded raises CassetteMiss, or returns no rows when `strict` is off.
+
+    Filters derived from the clock (the last few days, today's date) would
+    differ between recording and replay, so the dashboard reads the time
+    through `now()`: while recording it is the real time and its first
+    reading is stored as a "clock" line; a replay is frozen at that time.
+    """
+
+    def __init__(self, path, mode=REPLAY, latency_scale=1.0, strict=True):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.misses = []
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._episodes = {}
+        self.recorded = 0
+        # Time of the recording (epoch seconds), set by the first now() while recording
+        self.clock = None
+        if mode == RECORD:
+            # A recording starts a new file
+            with gzip.open(path, "wt", encoding="utf-8"):
+                pass
+        else:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["t"] == "res":
+                    self._bodies[entry["id"]] = (entry["data"], entry.get("count"))
+                elif entry["t"] == "clock":
+                    self.clock = entry["at"]
+                else:
+                    self._episodes.setdefault(entry["key"], deque()).append(entry)
+                    self.recorded += 1
+
+    def now(self):
+        """Epoch seconds of the dashboard's clock: real while recording, the recording's time in a replay"""
+        if self.mode == REPLAY:
+            return self.clock if self.clock is not None else time.time()
+        now = time.time()
+        with self._lock:
+            if self.clock is None:
+                self.clock = now
+                with gzip.open(self.path, "at", encoding="utf-8") as f:
+                    f.write(_canonical({"t": "clock", "at": now}) + "\n")
+        return now
+
+    def client(self, real=None):
+        """A client that records queries made on `real`, or replays them"""
+        return CassetteClient(self, real)
+
+    def execute(self, query):
+        key = _canonical(query._request)
+        if self.mode == RECORD:
+            return self._record(key, query)
+        return self._replay(key)
+
+    def _record(self, key, query):
+        started = time.perf_counter()
+        error = None
+        try:
+            response = query._build().execute()
+            data, count = response.data, getattr(response, "count", None)
+        except Exception as e:
+            error, data, count = str(e), None, None
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        body = _canonical([data, count])
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+        lines = []
+        with self._lock:
+            if digest not in self._bodies:
+                self._bodies[digest] = (data, count)
+                lines.append({"t": "res", "id": digest, "data": data, "count": count})
+            lines.append({"t": "req", "key": key, "res": digest, "ms": round(latency_ms, 2), "error": error})
+            # Each append is a gzip member of its own; readers see one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(_canonical(line) + "\n")
+            self.recorded += 1
+        if error is not None:
+            raise Exception(error)
+        return CassetteResponse(data, count)
+
+    def _replay(self, key):
+        with self._lock:
+            episodes = self._episodes.get(key)
+            if not episodes:
+                self.misses.append(key)
+                if self.strict:
+                    raise CassetteMiss(f"No recording for {key}")
+                return CassetteResponse([], None)
+            # Repeats are served in recorded order; the last one keeps answering
+            entry = episodes.popleft() if len(episodes) > 1 else episodes[0]
+        if self.latency_scale:
+            time.sleep(entry["ms"] * self.latency_scale / 1000)
+        if entry.get("error"):
+            raise Exception(entry["error"])
+        data, count = self._bodies[entry["res"]]
+        # Callers may modify the rows, so each replay gets its own copy
+        return CassetteResponse(json.loads(json.dumps(data)), count)
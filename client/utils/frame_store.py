@@ -0,0 +1,175 @@
+import threading
+import weakref
+import streamlit as st
+from client.utils.cache import get_shared_cache
+
+# How long a frame stays in the shared cache for other replicas
+SHARED_FRAME_TTL = 6 * 3600
+
+
+class FrameLease:
+    """
+    A session's hold on a shared base frame.
+
+    The lease is kept in `st.session_state`; it is released explicitly when the
+    session moves to another frame, or by the garbage collector when the session
+    (and with it the lease) goes away.
+    """
+
+    def __init__(self, store, key, frame):
+        self.key = key
+        self.frame = frame
+        self._finalizer = weakref.finalize(self, store.release, key)
+
+    def release(self):
+        self.frame = None
+        self._finalizer()
+
+    @property
+    def active(self):
+        return self._finalizer.alive
+
+
+class FrameStore:
+    """
+    Process-wide, reference-counted store of immutable base frames.
+
+    Frames are keyed by (dataset, period, version). Sessions that look at the
+    same data share one frame and apply their edits as a small overlay on a
+    copy taken at render time. `invalidate` bumps the version so new sessions build
+    a fresh frame, while sessions still holding the old one keep it until they
+    release it; a frame is dropped when its last lease is released.
+
+    With a SharedCache, invalidations reach the other replicas (their version
+    is bumped when they see the new token) and a frame built on one replica is
+    taken by the others instead of being built again.
+    """
+
+    def __init__(self, shared=None):
+        self._lock = threading.RLock()
+        self._frames = {}
+        self._refs = {}
+        self._versions = {}
+        self._tokens = {}
+        self.shared = shared
+
+    def _sync(self, dataset, period):
+        """Bump the local version when another replica invalidated (dataset, period); returns the shared token"""
+        if self.shared is None:
+            return None
+        token = self.shared.token(("frame", dataset, period))
+        with self._lock:
+            seen = self._tokens.setdefault((dataset, period), token)
+            if seen != token:
+                self._tokens[(dataset, period)] = token
+                self._versions[(dataset, period)] = self._versions.get((dataset, period), 0) + 1
+        return token
+
+    def version(self, dataset, period):
+        self._sync(dataset, period)
+        with self._lock:
+            return self._versions.get((dataset, period), 0)
+
+    def invalidate(self, dataset, period):
+        """Bump the version of (dataset, period) so the next acquire builds a fresh frame"""
+        with self._lock:
+            self._versions[(dataset, period)] = self._versions.get((dataset, period), 0) + 1
+        if self.shared is not None:
+            token = self.shared.bump(("frame", dataset, period))
+            with self._lock:
+                self._tokens[(dataset, period)] = token
+
+    def peek(self, dataset, period):
+        """The loaded frame of the current version of (dataset, period), or None"""
+        version = self.version(dataset, period)
+        with self._lock:
+            return self._frames.get((dataset, period, version))
+
+    def acquire(self, dataset, period, build):
+        """Return a lease on the current frame for (dataset, period), building it if needed"""
+        token = self._sync(dataset, period)
+        with self._lock:
+            key = (dataset, period, self._versions.get((dataset, period), 0))
+            frame = self._frames.get(key)
+        if frame is None and self.shared is not None:
+            found = self.shared.get(("frame", dataset, period), token)
+            frame = found[0] if found else None
+        if frame is None:
+            # Build outside the lock so a slow fetch does not block other sessions
+            frame = build()
+            if self.shared is not None:
+                self.shared.put(("frame", dataset, period), token, None, frame, ttl=SHARED_FRAME_TTL)
+        with self._lock:
+            frame = self._frames.setdefault(key, frame)
+            self._refs[key] = self._refs.get(key, 0) + 1
+            return FrameLease(self, key, frame)
+
+    def release(self, key):
+        with self._lock:
+            if key not in self._refs:
+                return
+            self._refs[key] -= 1
+            if self._refs[key] <= 0:
+                self._refs.pop(key, None)
+                self._frames.pop(key, None)
+
+    def stats(self):
+        """Memory report: one row per stored frame"""
+        with self._lock:
+            rows = []
+            for (dataset, period, version), frame in self._frames.items():
+                rows.append({
+                    "Dataset": dataset,
+                    "Period": str(period),
+                    "Version": version,
+                    "Sessions": self._refs.get((dataset, period, version), 0),
+                    "Rows": len(frame),
+                    "Bytes": int(frame.memory_usage(deep=True).sum()),
+                })
+            return rows
+
+
+@st.cache_resource
+def get_frame_store():
+    """Get the process-wide frame store"""
+    return FrameStore(get_shared_cache())
+
+
+def lease_frame(state_key, dataset, period, build, follow_version=False):
+    """
+    Keep a lease on the shared frame for (dataset, period) in session state.
+
+    Returns the base frame. By default the session keeps its frame until it
+    switches to another period or drops the lease, even if the dataset is
+    invalidated in the meantime (its overlay was made against that frame).
+    With `follow_version` the session moves to the newest version instead.
+    The previous lease under `state_key` is released when replaced.
+    """
+    store = get_frame_store()
+    lease = st.session_state.get(state_key)
+    if lease is not None and lease.key[:2] == (dataset, period) and lease.active:
+        if not follow_version or lease.key[2] == store.version(dataset, period):
+            return lease.frame
+    if lease is not None:
+        lease.release()
+    lease = store.acquire(dataset, period, build)
+    st.session_state[state_key] = lease
+    return lease.frame
+
+
+def drop_lease(state_key):
+    """Release and forget the lease stored under `state_key`"""
+    lease = st.session_state.pop(state_key, None)
+    if lease is not None:
+        lease.release()
+
+
+def render_memory_report():
+    """Show how much memory the shared frames use"""
+    rows = get_frame_store().stats()
+    total = sum(r["Bytes"] for r in rows)
+    with st.expander(f"Shared data: {len(rows)} frames, {total / 1024:.1f} KiB"):
+        if rows:
+            st.dataframe(rows, width='stretch', hide_index=True)
+        else:
+            st.caption("No shared frames loaded.")
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict, deque
+
+WARNING = "warning"
+CRITICAL = "critical"
+SEVERITY_RANK = {WARNING: 1, CRITICAL: 2}
+
+DEFAULT_WINDOW_SECONDS = 600
+# Attempts of one unknown card at one gate within the window
+DEFAULT_REPEAT_THRESHOLD = 3
+# Distinct gates one unknown card is tried at within the window (lost or cloned card)
+DEFAULT_GATE_THRESHOLD = 2
+DEFAULT_MAX_KEYS = 5000
+DEFAULT_CLOSED_KEPT = 200
+
+
+class IncidentTracker:
+    """
+    Sliding-window aggregation of unidentified card scans.
+
+    Keeps the scan times of the last `window` seconds per (card_uid, lock) and
+    per card in LRU-ordered dictionaries capped at `max_keys` entries, so memory
+    stays bounded however many unknown cards are presented. When a card
+    crosses a threshold an incident is opened (or escalated) and an alert is
+    raised; the incident stays open while attempts continue and is closed after
+    a quiet window. Changed incidents are collected for persistence.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW_SECONDS, repeat_threshold=DEFAULT_REPEAT_THRESHOLD,
+                 gate_threshold=DEFAULT_GATE_THRESHOLD, max_keys=DEFAULT_MAX_KEYS, closed_kept=DEFAULT_CLOSED_KEPT):
+        self.window_us = int(window * 1_000_000)
+        self.repeat_threshold = repeat_threshold
+        self.gate_threshold = gate_threshold
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._by_gate = OrderedDict()
+        self._by_card = OrderedDict()
+        self._open = OrderedDict()
+        self._closed = deque(maxlen=closed_kept)
+        self._dirty = {}
+        self.alerts = deque(maxlen=100)
+        self.evictions = 0
+
+    def _touch(self, table, key, factory):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = factory()
+            if len(table) > self.max_keys:
+                table.popitem(last=False)
+                self.evictions += 1
+        else:
+            table.move_to_end(key)
+        return entry
+
+    def _trim(self, times, now):
+        while times and times[0][0] < now - self.window_us:
+            times.popleft()
+
+    def _close_quiet(self, now):
+        while self._open:
+            card_uid, incident = next(iter(self._open.items()))
+            if now - incident["last_seen"] <= self.window_us:
+                break
+            del self._open[card_uid]
+            incident["status"] = "closed"
+            self._closed.appendleft(incident)
+            self._dirty[(incident["card_uid"], incident["opened_at"])] = incident
+
+    def observe(self, card_uid, lock, ts):
+        """Add one unidentified scan (ts in epoch microseconds); returns the alerts it raised"""
+        with self._lock:
+            self._close_quiet(ts)
+
+            at_gate = self._touch(self._by_gate, (card_uid, lock), deque)
+            at_gate.append((ts, lock))
+            self._trim(at_gate, ts)
+            by_card = self._touch(self._by_card, card_uid, deque)
+            by_card.append((ts, lock))
+            self._trim(by_card, ts)
+            gates = {l for _, l in by_card}
+
+            severity = None
+            if len(gates) >= self.gate_threshold:
+                severity = CRITICAL
+            elif len(at_gate) >= self.repeat_threshold:
+                severity = WARNING
+
+            incident = self._open.get(card_uid)
+            alerts = []
+            if incident is None:
+                if severity is None:
+                    return alerts
+                incident = {
+                    "card_uid": card_uid,
+                    "opened_at": by_card[0][0],
+                    "last_seen": ts,
+                    "attempts": len(by_card),
+                    "locks": sorted({str(l) for l in gates}),
+                    "max_per_gate": len(at_gate),
+                    "severity": severity,
+                    "status": "open",
+                }
+                alerts.append(self._alert(incident, "opened"))
+            else:
+                self._open.move_to_end(card_uid)
+                incident["last_seen"] = ts
+                incident["attempts"] += 1
+                incident["locks"] = sorted(set(incident["locks"]) | {str(l) for l in gates})
+                incident["max_per_gate"] = max(incident["max_per_gate"], len(at_gate))
+                if severity and SEVERITY_RANK[severity] > SEVERITY_RANK[incident["severity"]]:
+                    incident["severity"] = severity
+                    alerts.append(self._alert(incident, "escalated"))
+
+            self._open[card_uid] = incident
+            if len(self._open) > self.max_keys:
+                # Closed like a quiet one, so its stored row does not stay open
+                _, evicted = self._open.popitem(last=False)
+                evicted["status"] = "closed"
+                self._closed.appendleft(evicted)
+                self._dirty[(evicted["card_uid"], evicted["opened_at"])] = evicted
+                self.evictions += 1
+            self._dirty[(card_uid, incident["opened_at"])] = incident
+            return alerts
+
+    def _alert(self, incident, event):
+        alert = {
+            "event": event,
+            "card_uid": incident["card_uid"],
+            "severity": incident["severity"],
+            "locks": list(incident["locks"]),
+            "attempts": incident["attempts"],
+            "at": incident["last_seen"],
+        }
+        self.alerts.appendleft(alert)
+        return alert
+
+    def take_changes(self):
+        """Incidents changed since the last call (for persisting)"""
+        with self._lock:
+            changes = [dict(incident) for incident in self._dirty.values()]
+            self._dirty.clear()
+            return changes
+
+    def restore_changes(self, changes):
+        """Put back changes that could not be persisted"""
+        with self._lock:
+            for incident in changes:
+                self._dirty.setdefault((incident["card_uid"], incident["opened_at"]), incident)
+
+    def ranked(self, now=None):
+        """Open incidents first, then by severity, attempts and recency"""
+        with self._lock:
+            if now is not None:
+                self._close_quiet(now)
+            incidents = [dict(i) for i in self._open.values()] + [dict(i) for i in self._closed]
+        return sorted(
+            incidents,
+            key=lambda i: (i["status"] == "open", SEVERITY_RANK[i["severity"]], i["attempts"], i["last_seen"]),
+            reverse=True,
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_keys": len(self._by_gate),
+                "tracked_cards": len(self._by_card),
+                "open_incidents": len(self._open),
+                "evictions": self.evictions,
+            }
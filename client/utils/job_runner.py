@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from client.utils.supabase_client import get_secret, run_as
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs are kept this long for sessions to pick up their results
+DEFAULT_RESULT_TTL = 3600
+DEFAULT_WORKERS = 2
+DEFAULT_KEPT = 50
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work when the job was cancelled"""
+
+
+class Job:
+    """One submitted computation, its progress and its outcome"""
+
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def report(self, fraction, message=None):
+        """Progress callback handed to the work; also where a cancelled job stops"""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, fraction))
+        if message:
+            self.message = message
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.finished_at = time.time()
+
+
+class JobRunner:
+    """
+    Runs long computations (reports, exports) on a worker pool, off the script run.
+
+    Jobs are keyed by kind and parameters: submitting a job that is queued,
+    running or recently finished returns that job instead of starting
+    another, so reruns, other tabs and other sessions share one computation
+    and its result. The work is called with a `report(fraction, message)`
+    callback for progress, and queries with the client it was submitted with
+    (the requesting user's), never another user's session. Failed and
+    cancelled jobs are resubmitted on the
+    next submit; finished ones are forgotten after `result_ttl` or when more
+    than `keep` have accumulated.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, result_ttl=DEFAULT_RESULT_TTL, keep=DEFAULT_KEPT):
+        self.result_ttl = result_ttl
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    @staticmethod
+    def key(kind, params):
+        return f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def get(self, kind, params):
+        with self._lock:
+            return self._jobs.get(self.key(kind, params))
+
+    def submit(self, kind, params, work, label=None, client=None):
+        """The job for (kind, params), started with work(report) as `client` unless one is pending or fresh"""
+        key = self.key(kind, params)
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(key)
+            if job is not None and job.status not in (FAILED, CANCELLED):
+                return job
+            job = Job(key, label or kind)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+        self._pool.submit(self._run, job, work, client)
+        return job
+
+    def forget(self, kind, params):
+        """Drop the job for (kind, params), cancelling it if it has not finished"""
+        with self._lock:
+            job = self._jobs.pop(self.key(kind, params), None)
+        if job is not None and not job.finished:
+            job.cancel()
+
+    def _run(self, job, work, client):
+        if job.status == CANCELLED:
+            return
+        job.status, job.started_at, job.message = RUNNING, time.time(), "Started"
+        try:
+            with run_as(client) if client is not None else nullcontext():
+                job.result = work(job.report)
+            job.status, job.progress, job.message = DONE, 1.0, "Done"
+        except JobCancelled:
+            job.status, job.message = CANCELLED, "Cancelled"
+        except Exception as e:
+            job.status, job.error, job.message = FAILED, str(e), "Failed"
+        job.finished_at = time.time()
+
+    def _expire(self):
+        now = time.time()
+        for key in [k for k, j in self._jobs.items() if j.finished and now - j.finished_at > self.result_ttl]:
+            self._jobs.pop(key)
+        finished = [k for k, j in self._jobs.items() if j.finished]
+        for key in finished[:max(0, len(finished) - self.keep)]:
+            self._jobs.pop(key)
+
+    def status(self):
+        """One row per known job, for the sidebar"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        now = time.time()
+        return [{
+            "Job": j.label,
+            "Status": j.status,
+            "Progress": f"{j.progress:.0%}",
+            "Message": j.error or j.message,
+            "Seconds": round(((j.finished_at or now) - (j.started_at or now)), 1),
+        } for j in jobs]
+
+
+@st.cache_resource
+def get_job_runner():
+    """Get the process-wide job runner"""
+    workers = get_secret("JOB_WORKERS")
+    return JobRunner(workers=int(workers) if workers else DEFAULT_WORKERS)
+
+
+def render_job_progress(job, key, poll_seconds=1.0):
+    """
+    Show the progress of an unfinished job and rerun the page once it finishes.
+
+    Only this fragment reruns while the job works, so the rest of the page
+    stays usable and switching tabs does not restart the work.
+    """
+    @st.fragment(run_every=poll_seconds)
+    def poll():
+        if job.finished:
+            st.rerun()
+        st.progress(job.progress, text=f"{job.label}: {job.message}")
+        if st.button("Cancel", key=f"{key}_cancel"):
+            job.cancel()
+            st.rerun()
+
+    poll()
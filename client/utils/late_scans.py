@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timezone
+from client.utils.scan_log import epoch_us, local_time
+
+# Scans delivered this long after they happened count as ordinary network delay, not late
+DEFAULT_GRACE_SECONDS = 120
+# Rows ingested this close to the watermark are fetched again, for transactions that commit late
+DEFAULT_OVERLAP_SECONDS = 10
+
+
+def _iso(us):
+    return datetime.fromtimestamp(us / 1_000_000, tz=timezone.utc).isoformat()
+
+
+class LateScanDetector:
+    """
+    Finds scans that arrive after their date may already have been aggregated.
+
+    Readers replay scans buffered offline with their original created_at,
+    sometimes days later. The detector keeps an ingestion watermark, the
+    newest ingested_at it has seen. Each poll fetches the rows ingested since
+    then; those whose created_at lies before the previous poll (minus a grace
+    period for ordinary delivery delay), when caches may already have been
+    built, are late and are returned grouped by local date so the caller can
+    reconcile exactly those dates.
+
+    `fetch_since(iso)` returns rows (id, card_uid, lock, created_at,
+    ingested_at) with ingested_at at or after `iso`; `fetch_latest()` returns
+    the newest ingested_at, or None.
+    """
+
+    def __init__(self, fetch_since, fetch_latest, grace=DEFAULT_GRACE_SECONDS, overlap=DEFAULT_OVERLAP_SECONDS):
+        self._fetch_since = fetch_since
+        self._fetch_latest = fetch_latest
+        self.grace_us = int(grace * 1_000_000)
+        self.overlap_us = int(overlap * 1_000_000)
+        self.watermark = None
+        self.checked = None
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.late_total = 0
+        self.last_late = {}
+
+    def poll(self):
+        """{local date "YYYY-MM-DD": [late rows]} of the rows ingested since the last poll"""
+        with self._lock:
+            now = epoch_us(datetime.now(timezone.utc))
+            if self.watermark is None:
+                # Everything ingested so far is in whatever gets built from now on
+                latest = self._fetch_latest()
+                self.watermark = epoch_us(latest) if latest else now
+                self.checked = now
+                for row in self._fetch_since(_iso(self.watermark - self.overlap_us)):
+                    if row.get("ingested_at"):
+                        self._seen[row["id"]] = epoch_us(row["ingested_at"])
+                return {}
+
+            previous, self.checked = self.checked, now
+            late = {}
+            for row in self._fetch_since(_iso(self.watermark - self.overlap_us)):
+                if row["id"] in self._seen or not row.get("ingested_at") or not row.get("created_at"):
+                    continue
+                ingested = epoch_us(row["ingested_at"])
+                self._seen[row["id"]] = ingested
+                self.watermark = max(self.watermark, ingested)
+                created = epoch_us(row["created_at"])
+                if created < previous - self.grace_us:
+                    late.setdefault(local_time(created).strftime("%Y-%m-%d"), []).append(row)
+
+            # Only ids inside the overlap can be fetched again
+            self._seen = {i: t for i, t in self._seen.items() if t >= self.watermark - self.overlap_us}
+            self.late_total += sum(len(rows) for rows in late.values())
+            if late:
+                self.last_late = {day: len(rows) for day, rows in late.items()}
+            return late
+
+    def status(self):
+        with self._lock:
+            return {
+                "watermark": _iso(self.watermark) if self.watermark else None,
+                "late_total": self.late_total,
+                "last_late": dict(self.last_late),
+            }
@@ -0,0 +1,77 @@
+import numpy as np
+from client.utils.scan_log import epoch_us
+
+
+class ScanIndex:
+    """
+    Interval index over decoded card scans (see client.utils.scan_log).
+
+    Scan times are kept as a sorted int64 array, once for all gates and once
+    per gate, next to the dictionary codes of the card UIDs, so the scans
+    inside a window are found with two binary searches instead of a pass over
+    the day's logs.
+    """
+
+    def __init__(self, scans, uid_col="card_uid"):
+        if uid_col not in scans.column_names and "student_uid" in scans.column_names:
+            uid_col = "student_uid"
+        if not scans.num_rows or uid_col not in scans.column_names or "created_at" not in scans.column_names:
+            self._uids = np.array([], dtype=object)
+            self._all = (np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+            self._by_lock = {}
+            self._locks, self._lock_codes = np.array([None], dtype=object), np.array([], dtype=np.int64)
+            return
+
+        uids = scans[uid_col].combine_chunks()
+        self._uids = np.asarray(uids.dictionary.to_pylist(), dtype=object)
+        codes = uids.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+        times = scans["created_at"].fill_null(-1).to_numpy()
+        keep = (codes >= 0) & (times >= 0)
+
+        order = np.argsort(times, kind="stable")
+        order = order[keep[order]]
+        times, codes = times[order], codes[order]
+        self._all = (times, codes)
+
+        self._by_lock = {}
+        # Gate of each scan in time order; code -1 (the last entry) is an unknown gate
+        self._locks, self._lock_codes = np.array([None], dtype=object), np.full(len(times), -1, dtype=np.int64)
+        if "lock" in scans.column_names:
+            locks = scans["lock"].combine_chunks()
+            lock_codes = locks.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)[order]
+            self._locks = np.asarray(locks.dictionary.to_pylist() + [None], dtype=object)
+            self._lock_codes = lock_codes
+            for code, lock in enumerate(locks.dictionary.to_pylist()):
+                mask = lock_codes == code
+                self._by_lock[lock] = (times[mask], codes[mask])
+
+    def __len__(self):
+        return len(self._all[0])
+
+    def _slice(self, start, end, lock=None):
+        times, codes = self._all if not lock else self._by_lock.get(lock, (self._all[0][:0], self._all[1][:0]))
+        lo = np.searchsorted(times, epoch_us(start), side="left")
+        hi = np.searchsorted(times, epoch_us(end), side="right")
+        return times[lo:hi], codes[lo:hi]
+
+    def uids_between(self, start, end, lock=None):
+        """Card UIDs scanned within [start, end], optionally at one gate only"""
+        _, codes = self._slice(start, end, lock)
+        return set(self._uids[np.unique(codes)])
+
+    def first_scans_between(self, start, end, lock=None):
+        """First scan time (epoch microseconds) of every card within [start, end], optionally at one gate only"""
+        times, codes = self._slice(start, end, lock)
+        # Times are sorted, so the first occurrence of a code is its earliest scan
+        unique_codes, first = np.unique(codes, return_index=True)
+        return {self._uids[code]: int(times[i]) for code, i in zip(unique_codes, first)}
+
+    def first_gates_between(self, start, end, lock=None):
+        """Gate of the first scan of every card within [start, end], optionally at one gate only"""
+        if lock:
+            return {uid: lock for uid in self.first_scans_between(start, end, lock)}
+        times, codes = self._all
+        lo = np.searchsorted(times, epoch_us(start), side="left")
+        hi = np.searchsorted(times, epoch_us(end), side="right")
+        unique_codes, first = np.unique(codes[lo:hi], return_index=True)
+        return {self._uids[code]: self._locks[self._lock_codes[lo + i]] for code, i in zip(unique_codes, first)}
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Scans are stored in UTC and only converted to school time for display
+DISPLAY_TZ = "Africa/Johannesburg"
+
+# Card and gate identifiers repeat across many scans, so they are dictionary encoded
+DICTIONARY_COLUMNS = ("card_uid", "student_uid", "lock")
+BOOL_COLUMNS = ("status",)
+TIME_COLUMNS = ("created_at", "updated_at")
+
+
+def epoch_us(value):
+    """Epoch microseconds of an ISO timestamp or datetime, treating naive values as UTC"""
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1_000_000)
+
+
+def _epoch_column(values):
+    strings = pa.array([None if v is None else str(v) for v in values], pa.string())
+    try:
+        stamps = strings.cast(pa.timestamp("us", tz="UTC"))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Mixed or naive timestamps: pandas parses them, naive values count as UTC
+        stamps = pa.array(pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601").dt.as_unit("us"))
+    return stamps.cast(pa.int64())
+
+
+def decode_scans(rows):
+    """
+    Decode PostgREST scan rows (access_logs, unidentified_cards) into a compact Arrow table.
+
+    Timestamps become int64 epoch microseconds (UTC), card UIDs and gates are
+    dictionary encoded and status is boolean; other columns keep their
+    inferred Arrow type.
+    """
+    rows = rows or []
+    names = list(dict.fromkeys(key for row in rows[:1] for key in row))
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if name in TIME_COLUMNS:
+            columns[name] = _epoch_column(values)
+        elif name in DICTIONARY_COLUMNS:
+            columns[name] = pa.array(values, pa.string()).dictionary_encode()
+        elif name in BOOL_COLUMNS:
+            columns[name] = pa.array(values, pa.bool_())
+        else:
+            try:
+                columns[name] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                columns[name] = pa.array([None if v is None else str(v) for v in values], pa.string())
+    return pa.table(columns)
+
+
+def concat_scans(tables):
+    """Concatenate decoded scan tables into one with a single dictionary per column"""
+    tables = [t for t in tables if t.num_rows]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options="default").unify_dictionaries().combine_chunks()
+
+
+def to_display_frame(scans, tz=DISPLAY_TZ):
+    """Pandas frame of decoded scans with timestamps converted to school time"""
+    for name in TIME_COLUMNS:
+        if name in scans.column_names:
+            i = scans.column_names.index(name)
+            scans = scans.set_column(i, name, pc.cast(scans[name], pa.timestamp("us", tz="UTC")))
+    df = scans.to_pandas()
+    for name in TIME_COLUMNS:
+        if name in df.columns:
+            df[name] = df[name].dt.tz_convert(tz)
+    return df
+
+
+def local_time(us, tz=DISPLAY_TZ):
+    """School-time timestamp of an epoch-microsecond value"""
+    return pd.Timestamp(us, unit="us", tz="UTC").tz_convert(tz)
@@ -0,0 +1,110 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def parse_times(value):
+    """Parse a comma separated list of HH:MM times, e.g. "06:30,13:45" """
+    times = []
+    for part in (value or "").split(","):
+        part = part.strip()
+        if part:
+            times.append(datetime.strptime(part, "%H:%M").time())
+    return sorted(times)
+
+
+class Scheduler:
+    """
+    Small in-process job scheduler running on one daemon thread.
+
+    Each job runs every `interval` seconds and/or at fixed local times of day.
+    Jobs run one after another; a failing job is recorded and retried at its
+    next slot without stopping the others.
+    """
+
+    def __init__(self, tick=30.0):
+        self.tick = tick
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, fn, interval=None, at=(), run_now=True):
+        """Register a job; `interval` in seconds, `at` a list of datetime.time"""
+        with self._lock:
+            self._jobs[name] = {
+                "fn": fn,
+                "interval": interval,
+                "at": list(at),
+                "next_run": time.time() if run_now else self._next_run(interval, at, time.time()),
+                "last_run": None,
+                "last_seconds": None,
+                "last_error": None,
+                "runs": 0,
+            }
+        self._wake.set()
+
+    @staticmethod
+    def _next_run(interval, at, after):
+        candidates = []
+        if interval:
+            candidates.append(after + interval)
+        now = datetime.fromtimestamp(after)
+        for t in at:
+            slot = datetime.combine(now.date(), t)
+            if slot.timestamp() <= after:
+                slot += timedelta(days=1)
+            candidates.append(slot.timestamp())
+        return min(candidates) if candidates else None
+
+    def run_job(self, name):
+        """Run a job immediately and schedule its next run"""
+        job = self._jobs[name]
+        started = time.time()
+        try:
+            job["fn"]()
+            job["last_error"] = None
+        except Exception as e:
+            job["last_error"] = str(e)
+        job["last_run"] = started
+        job["last_seconds"] = time.time() - started
+        job["runs"] += 1
+        job["next_run"] = self._next_run(job["interval"], job["at"], time.time())
+
+    def start(self):
+        """Start the scheduler thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cache-warmup-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                due = [name for name, job in self._jobs.items() if job["next_run"] is not None and job["next_run"] <= now]
+            for name in due:
+                self.run_job(name)
+            with self._lock:
+                upcoming = [job["next_run"] for job in self._jobs.values() if job["next_run"] is not None]
+            wait = min([self.tick] + [max(0.0, t - time.time()) for t in upcoming])
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def status(self):
+        """One row per job: when it last ran, how long it took and when it runs next"""
+        def fmt(ts):
+            return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "-"
+
+        with self._lock:
+            return [
+                {
+                    "Job": name,
+                    "Last Run": fmt(job["last_run"]),
+                    "Took (ms)": int(job["last_seconds"] * 1000) if job["last_seconds"] is not None else "-",
+                    "Next Run": fmt(job["next_run"]),
+                    "Runs": job["runs"],
+                    "Error": job["last_error"] or "",
+                }
+                for name, job in self._jobs.items()
+            ]
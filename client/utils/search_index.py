@@ -0,0 +1,109 @@
+import heapq
+import re
+from bisect import bisect_left
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+# Score per matched query term: the full token beats a prefix, which beats a typo
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+# Terms shorter than this are only prefix-matched (a typo in 3 letters matches too much)
+FUZZY_MIN_LENGTH = 4
+
+
+def tokenize(value):
+    """Lowercase alphanumeric tokens of a value ("Van der Merwe" -> ["van", "der", "merwe"])"""
+    if value is None:
+        return []
+    return _TOKEN_RE.findall(str(value).lower())
+
+
+def _deletes(token):
+    """The token with each single character removed (edit distance 1 neighbourhood)"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class SearchIndex:
+    """
+    Prefix and typo-tolerant search over a list of records.
+
+    Built once from the records; each lookup is a handful of bisects into a
+    sorted token list plus a dictionary probe per query term, so search time
+    depends on the number of matches rather than the number of records. Every
+    query term must match a token of the record (as a prefix, or within one
+    typo); results are ranked by how well the terms matched.
+    """
+
+    def __init__(self, records, fields, id_field="id"):
+        self.records = {}
+        postings = {}
+        for record in records:
+            doc_id = record.get(id_field)
+            if doc_id is None:
+                continue
+            self.records[doc_id] = record
+            for field in fields:
+                for token in tokenize(record.get(field)):
+                    postings.setdefault(token, set()).add(doc_id)
+            # Card UIDs are also matched as typed, e.g. with separators
+            for field in fields:
+                value = record.get(field)
+                if value is not None and not str(value).isalpha():
+                    joined = "".join(tokenize(value))
+                    if joined:
+                        postings.setdefault(joined, set()).add(doc_id)
+
+        self._tokens = sorted(postings)
+        self._postings = [postings[t] for t in self._tokens]
+        self._deletes = {}
+        for i, token in enumerate(self._tokens):
+            if len(token) >= FUZZY_MIN_LENGTH:
+                for variant in _deletes(token) | {token}:
+                    self._deletes.setdefault(variant, []).append(i)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _term_scores(self, term, prefix_limit=2000):
+        """{doc_id: score} for one query term"""
+        scores = {}
+        start = bisect_left(self._tokens, term)
+        for i in range(start, min(start + prefix_limit, len(self._tokens))):
+            token = self._tokens[i]
+            if not token.startswith(term):
+                break
+            score = EXACT if token == term else PREFIX
+            for doc_id in self._postings[i]:
+                if scores.get(doc_id, 0) < score:
+                    scores[doc_id] = score
+
+        if len(term) >= FUZZY_MIN_LENGTH:
+            # Symmetric delete lookup: one typo (missing, extra or changed letter)
+            candidates = set()
+            for variant in _deletes(term) | {term}:
+                candidates.update(self._deletes.get(variant, ()))
+            for i in candidates:
+                for doc_id in self._postings[i]:
+                    scores.setdefault(doc_id, FUZZY)
+        return scores
+
+    def search(self, query, k=20, exclude=None):
+        """Top-k records matching every term of the query, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        per_term = sorted((self._term_scores(term) for term in set(terms)), key=len)
+        if not per_term[0]:
+            return []
+
+        # Intersect starting from the most selective term
+        total = dict(per_term[0])
+        for scores in per_term[1:]:
+            total = {doc_id: s + scores[doc_id] for doc_id, s in total.items() if doc_id in scores}
+            if not total:
+                return []
+
+        if exclude:
+            total = {doc_id: s for doc_id, s in total.items() if doc_id not in exclude}
+        best = heapq.nlargest(k, total.items(), key=lambda item: item[1])
+        return [self.records[doc_id] for doc_id, _ in best]
@@ -0,0 +1,180 @@
+import secrets
+import threading
+import time
+
+# Refresh access tokens this many seconds before they expire
+REFRESH_MARGIN = 300
+# Sessions not seen for this long are signed out
+DEFAULT_IDLE_TTL = 12 * 3600
+
+
+class TokenStore:
+    """
+    Per-user Supabase sessions, shared by all Streamlit sessions of the process.
+
+    Signing in stores the user's access and refresh tokens under an opaque
+    session id (sid). Each sid gets one PostgREST client bound to the user's
+    token; all of them share the HTTP connection pool of the main client, so
+    binding a user costs no extra connections and users never overwrite each
+    other's authorization. A background thread refreshes tokens shortly before
+    they expire and signs out sessions that have been idle too long. A browser
+    that reconnects with its sid is resumed without an auth round trip.
+
+    Work outside a user's session (warm-ups, jobs, queued writes) never picks
+    up another user's binding: it runs as the user who submitted it
+    (`user_client`) or as the dashboard's service account (`service_client`),
+    a session that is kept however long it is idle.
+    """
+
+    def __init__(self, auth_client, rest_url, headers, http_client, idle_ttl=DEFAULT_IDLE_TTL, tick=30.0):
+        self._auth = auth_client
+        # The auth client keeps the last session internally, so calls are serialized
+        self._auth_lock = threading.Lock()
+        self._rest_url = rest_url
+        self._headers = dict(headers)
+        self._http_client = http_client
+        self.idle_ttl = idle_ttl
+        self.tick = tick
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._service_lock = threading.Lock()
+        self._service_sid = None
+
+    def _bind(self, access_token):
+        from postgrest import SyncPostgrestClient
+        headers = {**self._headers, "Authorization": f"Bearer {access_token}"}
+        return SyncPostgrestClient(self._rest_url, headers=headers, http_client=self._http_client)
+
+    def sign_in(self, email, password, keep=False):
+        """Authenticate with Supabase and return (sid, user); a kept session is never signed out for being idle"""
+        with self._auth_lock:
+            response = self._auth.sign_in_with_password({"email": email, "password": password})
+        session = response.session
+        sid = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[sid] = {
+                "user": response.user,
+                "access_token": session.access_token,
+                "refresh_token": session.refresh_token,
+                "expires_at": session.expires_at or time.time() + (session.expires_in or 3600),
+                "last_seen": time.time(),
+                "client": self._bind(session.access_token),
+                "last_error": None,
+                "keep": keep,
+            }
+        return sid, response.user
+
+    def resume(self, sid):
+        """The user of a stored session, or None; refreshes the token first only if it already expired"""
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            entry["last_seen"] = time.time()
+        if entry["expires_at"] <= time.time() and not self._refresh(sid):
+            return None
+        return entry["user"]
+
+    def client(self, sid):
+        """PostgREST client bound to the session's user, or None for an unknown sid"""
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            entry["last_seen"] = time.time()
+            return entry["client"]
+
+    def user_client(self, user_id):
+        """Client of the user's most recently active live session, or None"""
+        with self._lock:
+            live = [
+                e for e in self._sessions.values()
+                if not e["keep"] and getattr(e["user"], "id", None) == user_id and e["expires_at"] > time.time()
+            ]
+            return max(live, key=lambda e: e["last_seen"])["client"] if live else None
+
+    def service_client(self, email, password):
+        """Client of the service account, signed in on first use and again whenever its session was lost"""
+        with self._service_lock:
+            with self._lock:
+                entry = self._sessions.get(self._service_sid) if self._service_sid else None
+            if entry is None:
+                self._service_sid, _ = self.sign_in(email, password, keep=True)
+                with self._lock:
+                    entry = self._sessions[self._service_sid]
+            return entry["client"]
+
+    def sign_out(self, sid):
+        """Revoke the session's tokens and forget it"""
+        with self._lock:
+            entry = self._sessions.pop(sid, None)
+        if entry is None:
+            return
+        try:
+            with self._auth_lock:
+                self._auth.admin.sign_out(entry["access_token"], "local")
+        except Exception:
+            # The session is dropped locally either way
+            pass
+
+    def _refresh(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        if entry is None:
+            return False
+        try:
+            with self._auth_lock:
+                session = self._auth.refresh_session(entry["refresh_token"]).session
+        except Exception as e:
+            entry["last_error"] = str(e)
+            if entry["expires_at"] <= time.time():
+                # The access token is unusable and cannot be renewed: the user signs in again
+                with self._lock:
+                    self._sessions.pop(sid, None)
+            return False
+        with self._lock:
+            entry["access_token"] = session.access_token
+            entry["refresh_token"] = session.refresh_token
+            entry["expires_at"] = session.expires_at or time.time() + (session.expires_in or 3600)
+            entry["last_error"] = None
+            # Update the bound client in place so sessions holding it pick up the new token
+            entry["client"].auth(session.access_token)
+        return True
+
+    def maintain(self):
+        """Refresh tokens that expire soon and sign out idle sessions"""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, e in self._sessions.items() if not e["keep"] and now - e["last_seen"] > self.idle_ttl]
+            due = [sid for sid, e in self._sessions.items() if sid not in idle and e["expires_at"] - now < REFRESH_MARGIN]
+        for sid in idle:
+            self.sign_out(sid)
+        for sid in due:
+            self._refresh(sid)
+
+    def start(self):
+        """Start the background refresh thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="session-token-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.maintain()
+            time.sleep(self.tick)
+
+    def stats(self):
+        """One row per stored session"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "User": getattr(e["user"], "email", None),
+                    "Expires In (s)": int(e["expires_at"] - now),
+                    "Idle (s)": int(now - e["last_seen"]),
+                    "Error": e["last_error"] or "",
+                }
+                for e in self._sessions.values()
+            ]
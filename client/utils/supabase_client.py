@@ -1,13 +1,30 @@
 import streamlit as st
+import contextvars
 import os
-from dotenv import load_dotenv
-from supabase import create_client
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from client.utils.cassette import REPLAY, Cassette
 
-# Load environment variables
-load_dotenv()
+_env_loaded = False
+
+# Client of work running outside a user's script run (jobs, queued writes), see run_as
+_background_client = contextvars.ContextVar("background_client", default=None)
+
+# PostgREST returns at most this many rows per request
+PAGE_SIZE = 1000
+
+def load_env():
+    """Load the .env file into the environment (once, on first use)"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 def get_secret(key_name):
     """Get secret from Streamlit secrets or environment variables"""
+    load_env()
     try:
         if key_name in st.secrets:
             return st.secrets[key_name]
@@ -25,8 +42,118 @@ def init_supabase():
         st.error("Supabase URL and Key not found. Please check your .env file.")
         st.stop()
     
+    # Imported here: the supabase package is slow to import and the login page does not need it
+    from supabase import create_client
     return create_client(url, key)
 
+@st.cache_resource
+def get_token_store():
+    """Initialize and cache the per-user session token store"""
+    from supabase_auth import SyncGoTrueClient
+    from client.utils.session_tokens import DEFAULT_IDLE_TTL, TokenStore
+
+    client = init_supabase()
+    key = get_secret("SUPABASE_KEY")
+    auth_client = SyncGoTrueClient(
+        url=f"{get_secret('SUPABASE_URL').rstrip('/')}/auth/v1",
+        headers={"apiKey": key, "Authorization": f"Bearer {key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    idle_hours = get_secret("SESSION_IDLE_HOURS")
+    return TokenStore(
+        auth_client,
+        rest_url=str(client.rest_url),
+        headers=client.options.headers,
+        http_client=client.postgrest.session,
+        idle_ttl=float(idle_hours) * 3600 if idle_hours else DEFAULT_IDLE_TTL,
+    ).start()
+
+@st.cache_resource
+def get_cassette():
+    """
+    The query cassette set by SUPABASE_CASSETTE, or None.
+
+    SUPABASE_CASSETTE_MODE=record captures every query and its response to the
+    file; replay (the default) answers them from it without a database, after
+    the recorded latency times SUPABASE_CASSETTE_LATENCY (default 1, 0 for none).
+    """
+    path = get_secret("SUPABASE_CASSETTE")
+    if not path:
+        return None
+    scale = get_secret("SUPABASE_CASSETTE_LATENCY")
+    return Cassette(
+        path,
+        mode=get_secret("SUPABASE_CASSETTE_MODE") or REPLAY,
+        latency_scale=float(scale) if scale else 1.0,
+    )
+
+def current_time(tz=None):
+    """
+    Like datetime.now(tz), but frozen at the recording's time when replaying a cassette.
+
+    Query filters derived from the clock use it, so a replay asks the same
+    queries the recording did.
+    """
+    cassette = get_cassette()
+    return datetime.fromtimestamp(cassette.now() if cassette is not None else time.time(), tz)
+
+def current_date():
+    """Like date.today(), but frozen at the recording's date when replaying a cassette"""
+    return current_time().date()
+
+@contextmanager
+def run_as(client):
+    """Make get_supabase() return `client` for work outside a script run, e.g. a job submitted by a user"""
+    token = _background_client.set(client)
+    try:
+        yield client
+    finally:
+        _background_client.reset(token)
+
+def get_service_client():
+    """Client of the dashboard's service account (SERVICE_EMAIL / SERVICE_PASSWORD), or None if none is configured"""
+    email = get_secret("SERVICE_EMAIL")
+    password = get_secret("SERVICE_PASSWORD")
+    if not email or not password:
+        return None
+    return get_token_store().service_client(email, password)
+
+def get_user_client(user_id):
+    """Client of a live session of the user, else the service account's, else None"""
+    client = get_token_store().user_client(user_id) if user_id else None
+    return client or get_service_client()
+
 def get_supabase():
-    """Get the Supabase client instance"""
-    return init_supabase()
+    """
+    Get the Supabase client instance.
+
+    In a script run it is bound to the signed-in user's session. Work outside
+    a script run uses the client it was started with (run_as), else the
+    service account; without either it raises rather than borrowing another
+    user's session.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == REPLAY:
+        return cassette.client()
+
+    if get_script_run_ctx() is not None:
+        sid = st.session_state.get("sid")
+        bound = get_token_store().client(sid) if sid else None
+        client = bound or init_supabase()
+    else:
+        client = _background_client.get() or get_service_client()
+        if client is None:
+            raise RuntimeError("Background work needs the service account: set SERVICE_EMAIL and SERVICE_PASSWORD")
+    return cassette.client(client) if cassette is not None else client
+
+def fetch_pages(build_query, page_size=PAGE_SIZE):
+    """All rows of a query, fetched page_size rows at a time (build_query returns a fresh builder)"""
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data", "write_queue.sqlite3")
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_edits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    attended INTEGER,
+    excuse INTEGER,
+    user_id TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    queued_at TEXT NOT NULL,
+    confirmed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS attendance_edits_status ON attendance_edits (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS attendance_edits_date ON attendance_edits (activity, target_date);
+"""
+
+
+def _to_db(value):
+    return None if value is None else int(bool(value))
+
+
+def _from_db(value):
+    return None if value is None else bool(value)
+
+
+class WriteQueue:
+    """
+    Durable write-behind queue for manual attendance edits.
+
+    Edits are appended to a local SQLite file and applied to the UI straight
+    away. A background worker flushes them in batches through `writer`
+    (called as writer(activity, target_date, {person_id: change}, user_id),
+    with the user who made the latest edit of each person), retries
+    failures with exponential backoff and marks successful edits confirmed;
+    `on_confirmed(activity, target_date, person_ids)` is then called, so
+    caches built from the old data are dropped only once the write landed.
+    Edits of one (activity, date, person) are always written together and in
+    the order they were made, so a retry of an older edit can never overwrite
+    a newer one. Because the queue outlives the Streamlit session, edits
+    survive reloads and restarts until they are confirmed.
+    """
+
+    def __init__(self, writer, path=DEFAULT_QUEUE_PATH, batch_size=50, interval=5.0, max_backoff=300.0, retention=timedelta(days=1),
+                 on_confirmed=None):
+        self.writer = writer
+        self.on_confirmed = on_confirmed
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        # Error of the last failed flush itself (not of a write), for the UI
+        self.last_error = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Queue files from before edits recorded who made them
+            if "user_id" not in {row["name"] for row in conn.execute("PRAGMA table_info(attendance_edits)")}:
+                conn.execute("ALTER TABLE attendance_edits ADD COLUMN user_id TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, activity, person_id, target_date, attended=None, excuse=None, user_id=None):
+        """Append an edit made by `user_id` and wake the worker; returns the edit id"""
+        with self._connect() as conn:
+            edit_id = conn.execute(
+                "INSERT INTO attendance_edits (activity, person_id, target_date, attended, excuse, user_id, queued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (activity, str(person_id), target_date.strftime("%Y-%m-%d"), _to_db(attended), _to_db(excuse),
+                 None if user_id is None else str(user_id), datetime.now().isoformat())
+            ).lastrowid
+        self._wake.set()
+        return edit_id
+
+    def edits_for(self, activity, target_date):
+        """All retained edits of an activity and date in the order they were made"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM attendance_edits WHERE activity = ? AND target_date = ? ORDER BY id",
+                (activity, target_date.strftime("%Y-%m-%d"))
+            ).fetchall()
+        edits = []
+        for row in rows:
+            edit = dict(row)
+            edit["attended"] = _from_db(edit["attended"])
+            edit["excuse"] = _from_db(edit["excuse"])
+            edits.append(edit)
+        return edits
+
+    def status_counts(self, activity=None, target_date=None):
+        """Number of edits per status, optionally for one activity and date"""
+        query = "SELECT status, COUNT(*) AS n FROM attendance_edits"
+        params = ()
+        if activity is not None and target_date is not None:
+            query += " WHERE activity = ? AND target_date = ?"
+            params = (activity, target_date.strftime("%Y-%m-%d"))
+        with self._connect() as conn:
+            rows = conn.execute(query + " GROUP BY status", params).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def flush(self):
+        """Send one batch of due edits; returns the number of edits confirmed"""
+        with self._flush_lock:
+            with self._connect() as conn:
+                due = conn.execute(
+                    "SELECT activity, target_date, person_id FROM attendance_edits "
+                    "WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (PENDING, time.time(), self.batch_size)
+                ).fetchall()
+                keys = {tuple(row) for row in due}
+                # Every pending edit of a due (activity, date, person), also older ones still backing off
+                rows = [
+                    row for activity, target_date in {key[:2] for key in keys}
+                    for row in conn.execute(
+                        "SELECT * FROM attendance_edits WHERE status = ? AND activity = ? AND target_date = ? ORDER BY id",
+                        (PENDING, activity, target_date)
+                    ).fetchall()
+                    if (row["activity"], row["target_date"], row["person_id"]) in keys
+                ]
+            if not rows:
+                return 0
+
+            # Coalesce per (activity, date, person) in the order made: later edits win field by field
+            people = {}
+            for row in sorted(rows, key=lambda row: row["id"]):
+                person = people.setdefault((row["activity"], row["target_date"], row["person_id"]),
+                                           {"ids": [], "change": {"attended": None, "excuse": None}})
+                person["ids"].append(row["id"])
+                person["user_id"] = row["user_id"]
+                for field in ("attended", "excuse"):
+                    if row[field] is not None:
+                        person["change"][field] = bool(row[field])
+
+            # One write per (activity, date, user), made as the user who last edited each person
+            groups = {}
+            for (activity, target_date, person_id), person in people.items():
+                group = groups.setdefault((activity, target_date, person["user_id"]), {"ids": [], "edits": {}})
+                group["ids"].extend(person["ids"])
+                group["edits"][person_id] = person["change"]
+
+            confirmed = 0
+            for (activity, target_date, user_id), group in groups.items():
+                ids = group["ids"]
+                marks = ",".join("?" * len(ids))
+                try:
+                    self.writer(activity, datetime.strptime(target_date, "%Y-%m-%d").date(), group["edits"], user_id)
+                except Exception as e:
+                    with self._connect() as conn:
+                        attempts = max(row["attempts"] for row in rows if row["id"] in ids) + 1
+                        backoff = min(self.max_backoff, self.interval * 2 ** attempts)
+                        conn.execute(
+                            f"UPDATE attendance_edits SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id IN ({marks})",
+                            (str(e), time.time() + backoff, *ids)
+                        )
+                    continue
+                with self._connect() as conn:
+                    conn.execute(
+                        f"UPDATE attendance_edits SET status = ?, last_error = NULL, confirmed_at = ? WHERE id IN ({marks})",
+                        (CONFIRMED, datetime.now().isoformat(), *ids)
+                    )
+                confirmed += len(ids)
+                if self.on_confirmed is not None:
+                    self.on_confirmed(activity, datetime.strptime(target_date, "%Y-%m-%d").date(), list(group["edits"]))
+            return confirmed
+
+    def prune(self):
+        """Forget confirmed edits older than the retention period"""
+        cutoff = (datetime.now() - self.retention).isoformat()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM attendance_edits WHERE status = ? AND confirmed_at < ?", (CONFIRMED, cutoff))
+
+    def wake(self):
+        """Ask the worker to flush now, ignoring any backoff"""
+        with self._connect() as conn:
+            conn.execute("UPDATE attendance_edits SET next_attempt_at = 0 WHERE status = ?", (PENDING,))
+        self._wake.set()
+
+    def start(self):
+        """Start the background flush worker (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="attendance-write-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                # Keep flushing while full batches come back
+                while self.flush() >= self.batch_size:
+                    pass
+                self.prune()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{datetime.now():%H:%M:%S} {e}"
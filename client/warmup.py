@@ -0,0 +1,247 @@
+import streamlit as st
+import time
+from datetime import date, datetime, timedelta
+from client.utils.supabase_client import get_supabase, get_secret
+from client.utils.cache import get_data_cache, get_shared_cache
+from client.utils.frame_store import get_frame_store
+from client.utils.job_runner import get_job_runner
+from client.utils.scheduler import Scheduler, parse_times
+from client.utils.scan_index import ScanIndex
+from client.utils.scan_log import decode_scans
+from client.tabs.activity_data import (
+    get_all_persons_df,
+    get_late_scan_detector,
+    get_person_index,
+    probe_period_changes,
+    probe_session_changes,
+    session_window,
+)
+from client.tabs.choir_data import ACTIVITY, get_choir_members, get_practice_dates
+from client.tabs.choir_attendance import SESSION_DATASET, apply_late_scans, build_session_frame
+from client.tabs.choir_yearly_report import YEARLY_DATASET, apply_late_attendance, build_yearly_report
+from client.tabs.gate_analytics import get_gate_traffic
+from client.tabs.live_monitor import poll_incidents
+from client.tabs.attendance_summary import get_attendance_cube, update_attendance_cube
+
+# Defaults: refresh every 30 minutes, plus before school opens and before afternoon activities
+DEFAULT_WARM_TIMES = "06:30,13:30"
+DEFAULT_WARM_INTERVAL_MINUTES = 30
+# How long before a practice starts its session data is prepared
+PRACTICE_LEAD = timedelta(minutes=10)
+# Unidentified scans are checked for incidents this often, whether or not the monitor is open
+DEFAULT_INCIDENT_POLL_SECONDS = 60
+# Newly ingested scans are checked this often for late offline replays
+DEFAULT_LATE_SCAN_POLL_SECONDS = 120
+# How long the reconciler keeps a patched frame loaded for sessions to pick up
+RECONCILED_LEASE_SECONDS = 1800
+
+# Leases the scheduler holds so pre-built frames stay in the store until a session uses them
+_warm_leases = {}
+# Leases on frames patched for late scans: {(dataset, period): (lease, taken_at)}
+_reconciled_leases = {}
+
+
+def _warm_frame(dataset, period, build, changed=None):
+    """
+    Keep a built frame for (dataset, period) in the store.
+
+    The current frame (loaded here, or by another replica) is reused; only
+    when changed(frame) finds its data outdated is it invalidated and built
+    again, so replicas warming at the same time do not replace each other's
+    frames.
+    """
+    store = get_frame_store()
+    lease = store.acquire(dataset, period, build)
+    if changed is not None and changed(lease.frame):
+        lease.release()
+        store.invalidate(dataset, period)
+        lease = store.acquire(dataset, period, build)
+    previous = _warm_leases.pop(dataset, None)
+    _warm_leases[dataset] = lease
+    if previous is not None:
+        previous.release()
+
+
+def _patch_frame(dataset, period, patch):
+    """
+    Publish patch(frame) as the new version of a loaded frame; returns the rows changed.
+
+    Frames that are not loaded are left alone: they are built from the
+    database, late scans included, when next used. A frame that cannot be
+    patched (patch returns None) is invalidated instead.
+    """
+    store = get_frame_store()
+    frame = store.peek(dataset, period)
+    if frame is None:
+        return 0
+    result = patch(frame)
+    if result is None:
+        store.invalidate(dataset, period)
+        return 0
+    patched, changed = result
+    if not changed:
+        return 0
+    store.invalidate(dataset, period)
+    lease = store.acquire(dataset, period, lambda: patched)
+    previous = _reconciled_leases.pop((dataset, period), None)
+    _reconciled_leases[(dataset, period)] = (lease, time.time())
+    if previous is not None:
+        previous[0].release()
+    return changed
+
+
+def reconcile_late_scans():
+    """Bring loaded session frames, yearly reports and gate traffic up to date with scans replayed late"""
+    for key, (lease, taken_at) in list(_reconciled_leases.items()):
+        if time.time() - taken_at > RECONCILED_LEASE_SECONDS:
+            _reconciled_leases.pop(key)
+            lease.release()
+
+    late = get_late_scan_detector().poll()
+    if not late:
+        return
+    get_gate_traffic.invalidate()
+
+    for day, rows in sorted(late.items()):
+        # Recomputed by the next summary update
+        get_attendance_cube().invalidate(day)
+        session_date = date.fromisoformat(day)
+        practice_dates_df = get_practice_dates(session_date.year)
+        if practice_dates_df.empty:
+            continue
+        sessions = practice_dates_df[practice_dates_df["date"].dt.date == session_date]
+        choir_df = get_choir_members(session_date.year)
+        if sessions.empty or choir_df.empty:
+            continue
+
+        # Every session of the day counts, as in compute_attendance: a card's earliest scan in any window
+        index = ScanIndex(decode_scans(rows))
+        card_scans = {}
+        for session in sessions.to_dict("records"):
+            for uid, scanned_at in index.first_scans_between(*session_window(session)).items():
+                card_scans[uid] = min(scanned_at, card_scans.get(uid, scanned_at))
+        first_scans = {}
+        for _, member in choir_df.iterrows():
+            uid = member.get("card_uid")
+            if uid in card_scans:
+                first_scans[member.get('id_y') or member.get('id') or member.get('person_id')] = card_scans[uid]
+        if not first_scans:
+            continue
+
+        _patch_frame(SESSION_DATASET, day, lambda frame: apply_late_scans(frame, first_scans))
+        _patch_frame(YEARLY_DATASET, session_date.year, lambda frame: apply_late_attendance(frame, choir_df, day, first_scans))
+
+
+def warm_client():
+    """Sign in the service account the scheduled jobs run as"""
+    get_supabase()
+
+
+def warm_persons():
+    """Load the persons directory ahead of expiry and rebuild its search index"""
+    get_all_persons_df.warm()
+    get_person_index()
+
+
+def warm_roster():
+    """Load the current year's choir roster ahead of expiry"""
+    get_choir_members.warm(date.today().year)
+
+
+def warm_today_session():
+    """Pre-build today's session attendance (scans and manual attendance so far)"""
+    today = date.today()
+    practice_dates_df = get_practice_dates(today.year)
+    if practice_dates_df.empty:
+        return
+    todays = practice_dates_df[practice_dates_df["date"].dt.date == today]
+    choir_df = get_choir_members(today.year)
+    if todays.empty or choir_df.empty:
+        return
+    session_row = todays.iloc[0].to_dict()
+    _warm_frame(
+        SESSION_DATASET, today.strftime("%Y-%m-%d"), lambda: build_session_frame(choir_df, session_row, today),
+        changed=lambda frame: frame.attrs.get("watermarks") != probe_session_changes(ACTIVITY, session_row),
+    )
+
+
+def warm_yearly_report():
+    """Pre-build the current year's attendance report"""
+    year = date.today().year
+    practice_dates_df = get_practice_dates(year)
+    choir_df = get_choir_members(year)
+    if practice_dates_df.empty or choir_df.empty:
+        return
+    start, end = date(year, 1, 1), date(year, 12, 31)
+
+    def build():
+        # Probed first, so changes made while the report is built are picked up by the next run
+        watermarks = probe_period_changes(ACTIVITY, start, end)
+        report = build_yearly_report(choir_df, practice_dates_df)
+        report.attrs["watermarks"] = watermarks
+        return report
+
+    _warm_frame(
+        YEARLY_DATASET, year, build,
+        changed=lambda frame: frame.attrs.get("watermarks") != probe_period_changes(ACTIVITY, start, end),
+    )
+
+
+def schedule_practice_warmups(scheduler):
+    """Schedule today's session warm-up shortly before each practice starts"""
+    today = date.today()
+    practice_dates_df = get_practice_dates(today.year)
+    if practice_dates_df.empty or "start_time" not in practice_dates_df.columns:
+        return
+    times = []
+    for session in practice_dates_df[practice_dates_df["date"].dt.date == today].to_dict("records"):
+        start, _, _ = session_window(session)
+        if start.time() != datetime.min.time():
+            times.append((start - PRACTICE_LEAD).time())
+    if times:
+        scheduler.add_job("session before practice", warm_today_session, at=times, run_now=False)
+
+
+@st.cache_resource
+def start_warmup():
+    """Start the cache warm-up scheduler once per server process"""
+    interval = float(get_secret("WARM_INTERVAL_MINUTES") or DEFAULT_WARM_INTERVAL_MINUTES) * 60
+    at = parse_times(get_secret("WARM_TIMES") or DEFAULT_WARM_TIMES)
+
+    scheduler = Scheduler()
+    scheduler.add_job("supabase client", warm_client, at=at)
+    scheduler.add_job("persons", warm_persons, interval=interval, at=at)
+    scheduler.add_job("choir roster", warm_roster, interval=interval, at=at)
+    scheduler.add_job("today's session", warm_today_session, interval=interval, at=at)
+    scheduler.add_job("yearly report", warm_yearly_report, interval=interval, at=at)
+    scheduler.add_job("attendance summary", update_attendance_cube, interval=interval, at=at)
+    scheduler.add_job("practice times", lambda: schedule_practice_warmups(scheduler), interval=interval, at=at)
+    scheduler.add_job("unidentified incidents", poll_incidents,
+                      interval=float(get_secret("INCIDENT_POLL_SECONDS") or DEFAULT_INCIDENT_POLL_SECONDS))
+    scheduler.add_job("late offline scans", reconcile_late_scans,
+                      interval=float(get_secret("LATE_SCAN_POLL_SECONDS") or DEFAULT_LATE_SCAN_POLL_SECONDS))
+    return scheduler.start()
+
+
+def render_cache_status():
+    """Show cache freshness and the warm-up schedule"""
+    scheduler = start_warmup()
+    rows = get_data_cache().freshness()
+    with st.expander(f"Cache: {len(rows)} entries"):
+        if rows:
+            st.dataframe(rows, width='stretch', hide_index=True)
+        st.dataframe(scheduler.status(), width='stretch', hide_index=True)
+        jobs = get_job_runner().status()
+        if jobs:
+            st.dataframe(jobs, width='stretch', hide_index=True)
+        shared = get_shared_cache()
+        if shared is not None:
+            status = shared.status()
+            st.caption(
+                f"Shared cache: {status['backend']}, {status['hits']} hits, {status['misses']} misses, {status['writes']} writes"
+                + ("" if status["available"] else f", unavailable ({status['last_error']})")
+            )
+        late = get_late_scan_detector().status()
+        if late["late_total"]:
+            days = ", ".join(f"{day} ({count})" for day, count in sorted(late["last_late"].items()))
+            st.caption(f"Late offline scans reconciled: {late['late_total']}, last for {days}")
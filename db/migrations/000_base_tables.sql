@@ -0,0 +1,65 @@
+-- Tables the dashboard and the gate readers use, with the columns the code
+-- reads and writes. Every statement is "if not exists", so on an existing
+-- Supabase project this only records the starting version; on a fresh local
+-- Postgres it creates the schema the later migrations build on.
+
+do $$
+begin
+    -- Supabase provides this role; a plain Postgres needs it for the grants in later migrations
+    if not exists (select from pg_roles where rolname = 'authenticated') then
+        create role authenticated nologin;
+    end if;
+end
+$$;
+
+create table if not exists public.persons (
+    id uuid default gen_random_uuid() primary key,
+    name text not null,
+    surname text not null,
+    card_uid text unique,
+    grade text,
+    created_at timestamptz default now()
+);
+
+create table if not exists public.access_logs (
+    id uuid default gen_random_uuid() primary key,
+    card_uid text not null,
+    lock text,
+    status boolean default true,
+    created_at timestamptz default now()
+);
+
+create table if not exists public.unidentified_cards (
+    id uuid default gen_random_uuid() primary key,
+    card_uid text not null,
+    lock text,
+    created_at timestamptz default now()
+);
+
+create table if not exists public.choir_register (
+    id uuid default gen_random_uuid() primary key,
+    "personId" uuid references public.persons(id) on delete cascade,
+    year integer not null,
+    removed boolean default false,
+    created_at timestamptz default now(),
+    updated_at timestamptz default now()
+);
+
+create table if not exists public.choir_practice_dates (
+    id uuid default gen_random_uuid() primary key,
+    date date not null,
+    start_time time,
+    end_time time,
+    lock text,
+    created_at timestamptz default now(),
+    updated_at timestamptz default now()
+);
+
+create table if not exists public.manual_choir_attendance (
+    id uuid default gen_random_uuid() primary key,
+    person_id uuid references public.persons(id) on delete cascade,
+    attended boolean default false,
+    excuse boolean default false,
+    created_at timestamptz default now(),
+    updated_at timestamptz default now()
+);
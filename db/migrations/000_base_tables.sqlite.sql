@@ -0,0 +1,54 @@
+-- SQLite stand-in for 000_base_tables.sql. Ids are random hex strings and
+-- timestamps ISO 8601 text in UTC, which sort like the Postgres values.
+
+create table if not exists persons (
+    id text primary key default (lower(hex(randomblob(16)))),
+    name text not null,
+    surname text not null,
+    card_uid text unique,
+    grade text,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create table if not exists access_logs (
+    id text primary key default (lower(hex(randomblob(16)))),
+    card_uid text not null,
+    lock text,
+    status integer default 1,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create table if not exists unidentified_cards (
+    id text primary key default (lower(hex(randomblob(16)))),
+    card_uid text not null,
+    lock text,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create table if not exists choir_register (
+    id text primary key default (lower(hex(randomblob(16)))),
+    personId text references persons(id) on delete cascade,
+    year integer not null,
+    removed integer default 0,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create table if not exists choir_practice_dates (
+    id text primary key default (lower(hex(randomblob(16)))),
+    date text not null,
+    start_time text,
+    end_time text,
+    lock text,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create table if not exists manual_choir_attendance (
+    id text primary key default (lower(hex(randomblob(16)))),
+    person_id text references persons(id) on delete cascade,
+    attended integer default 0,
+    excuse integer default 0,
+    created_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
@@ -0,0 +1,66 @@
+-- Gate traffic per time-of-day slot, aggregated in the database.
+--
+-- Returns one row per (local day, lock) holding the non-empty slots of that
+-- day and, per slot, the number of granted scans (access_logs) and
+-- unidentified card scans (unidentified_cards). Slot i covers minutes
+-- [i * bucket_minutes, (i + 1) * bucket_minutes) after local midnight.
+-- A term of data for a handful of gates is a few hundred rows, so the
+-- dashboard receives only the aggregated series instead of raw scans.
+
+create index if not exists access_logs_created_at_lock_idx
+    on public.access_logs (created_at, lock);
+
+create index if not exists unidentified_cards_created_at_lock_idx
+    on public.unidentified_cards (created_at, lock);
+
+create or replace function public.gate_traffic(
+    start_at timestamptz,
+    end_at timestamptz,
+    bucket_minutes integer default 5,
+    tz text default 'Africa/Johannesburg'
+)
+returns table (
+    day date,
+    lock text,
+    slots integer[],
+    granted integer[],
+    unidentified integer[]
+)
+language sql
+stable
+security invoker
+as $$
+    with scans as (
+        select a.created_at at time zone tz as local_ts, a.lock::text as lock, 1 as granted, 0 as unidentified
+        from public.access_logs a
+        where a.created_at >= start_at
+          and a.created_at < end_at
+          and a.status is not false
+        union all
+        select u.created_at at time zone tz, u.lock::text, 0, 1
+        from public.unidentified_cards u
+        where u.created_at >= start_at
+          and u.created_at < end_at
+    ),
+    buckets as (
+        select
+            local_ts::date as day,
+            lock,
+            (extract(hour from local_ts)::int * 60 + extract(minute from local_ts)::int) / bucket_minutes as slot,
+            sum(granted)::int as granted,
+            sum(unidentified)::int as unidentified
+        from scans
+        group by 1, 2, 3
+    )
+    select
+        day,
+        lock,
+        array_agg(slot order by slot),
+        array_agg(granted order by slot),
+        array_agg(unidentified order by slot)
+    from buckets
+    group by day, lock
+    order by day, lock;
+$$;
+
+grant execute on function public.gate_traffic(timestamptz, timestamptz, integer, text) to authenticated;
@@ -0,0 +1,32 @@
+-- Summarized incidents of unidentified cards, written by the dashboard.
+--
+-- One row per incident: an unknown card tried repeatedly at one gate, or at
+-- several gates, within the tracking window. The dashboard upserts the row
+-- while the incident is open (attempts, gates, last_seen) and marks it closed
+-- after a quiet window, so the raw unidentified_cards feed never has to be
+-- re-read to review what happened.
+
+create table if not exists public.unidentified_incidents (
+    id bigint generated by default as identity primary key,
+    card_uid text not null,
+    opened_at timestamptz not null,
+    last_seen timestamptz not null,
+    attempts integer not null,
+    locks text[] not null default '{}',
+    max_per_gate integer not null,
+    severity text not null check (severity in ('warning', 'critical')),
+    status text not null default 'open' check (status in ('open', 'closed')),
+    unique (card_uid, opened_at)
+);
+
+create index if not exists unidentified_incidents_last_seen_idx
+    on public.unidentified_incidents (last_seen desc);
+
+alter table public.unidentified_incidents enable row level security;
+
+create policy "authenticated manage incidents"
+    on public.unidentified_incidents
+    for all
+    to authenticated
+    using (true)
+    with check (true);
@@ -0,0 +1,17 @@
+-- SQLite stand-in for 002_unidentified_incidents.sql (no row level security).
+
+create table if not exists unidentified_incidents (
+    id integer primary key autoincrement,
+    card_uid text not null,
+    opened_at text not null,
+    last_seen text not null,
+    attempts integer not null,
+    locks text not null default '[]',
+    max_per_gate integer not null,
+    severity text not null check (severity in ('warning', 'critical')),
+    status text not null default 'open' check (status in ('open', 'closed')),
+    unique (card_uid, opened_at)
+);
+
+create index if not exists unidentified_incidents_last_seen_idx
+    on unidentified_incidents (last_seen desc);
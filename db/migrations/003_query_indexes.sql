@@ -0,0 +1,48 @@
+-- Indexes for the dashboard's query shapes, and unique keys for upserts.
+--
+--   access_logs        created_at range, optionally for one gate (session windows,
+--                      access history; the (created_at, lock) index is in 001)
+--                      and per card over time (person timelines)
+--   manual_choir_attendance  created_at range for a date, and person_id plus
+--                      created_at range when writing edits
+--   choir_register     by year, and by year and person when adding members
+--   choir_practice_dates     by date
+--
+-- The unique indexes on choir_register (year, "personId") and
+-- choir_practice_dates (date) let PostgREST upsert with on_conflict. Existing
+-- duplicates are removed first: the register keeps an active row over a
+-- removed one, the practice dates keep the first stored row.
+
+create index if not exists access_logs_lock_created_at_idx
+    on public.access_logs (lock, created_at);
+
+create index if not exists access_logs_card_uid_created_at_idx
+    on public.access_logs (card_uid, created_at);
+
+create index if not exists manual_choir_attendance_created_at_idx
+    on public.manual_choir_attendance (created_at);
+
+create index if not exists manual_choir_attendance_person_created_at_idx
+    on public.manual_choir_attendance (person_id, created_at);
+
+delete from public.choir_register r
+using public.choir_register keep
+where r.year = keep.year
+  and r."personId" = keep."personId"
+  and (coalesce(r.removed, false), r.ctid) > (coalesce(keep.removed, false), keep.ctid);
+
+create unique index if not exists choir_register_year_person_key
+    on public.choir_register (year, "personId");
+
+delete from public.choir_practice_dates d
+using public.choir_practice_dates keep
+where d.date = keep.date
+  and d.ctid > keep.ctid;
+
+create unique index if not exists choir_practice_dates_date_key
+    on public.choir_practice_dates (date);
+
+analyze public.access_logs;
+analyze public.manual_choir_attendance;
+analyze public.choir_register;
+analyze public.choir_practice_dates;
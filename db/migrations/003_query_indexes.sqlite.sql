@@ -0,0 +1,38 @@
+-- SQLite stand-in for 003_query_indexes.sql.
+
+create index if not exists access_logs_created_at_lock_idx
+    on access_logs (created_at, lock);
+
+create index if not exists access_logs_lock_created_at_idx
+    on access_logs (lock, created_at);
+
+create index if not exists access_logs_card_uid_created_at_idx
+    on access_logs (card_uid, created_at);
+
+create index if not exists manual_choir_attendance_created_at_idx
+    on manual_choir_attendance (created_at);
+
+create index if not exists manual_choir_attendance_person_created_at_idx
+    on manual_choir_attendance (person_id, created_at);
+
+delete from choir_register
+where rowid not in (
+    select rowid from (
+        select rowid, row_number() over (
+            partition by year, personId order by coalesce(removed, 0), rowid
+        ) as rn
+        from choir_register
+    )
+    where rn = 1
+);
+
+create unique index if not exists choir_register_year_person_key
+    on choir_register (year, personId);
+
+delete from choir_practice_dates
+where rowid not in (select min(rowid) from choir_practice_dates group by date);
+
+create unique index if not exists choir_practice_dates_date_key
+    on choir_practice_dates (date);
+
+analyze;
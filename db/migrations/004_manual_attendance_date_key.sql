@@ -0,0 +1,46 @@
+-- Key manual attendance by (person_id, practice_date).
+--
+-- Records used to carry their date only in created_at (the dashboard wrote
+-- the practice date with the current time of day), so every read was a
+-- created_at range scan and every write a select followed by an insert or
+-- update, which could race into duplicate rows. This adds the practice_date
+-- column, backfills it from created_at, keeps the most recently updated row
+-- of any duplicates and makes (person_id, practice_date) unique, so the
+-- dashboard reads by exact date and writes with a single upsert.
+
+alter table public.manual_choir_attendance
+    add column if not exists practice_date date;
+
+update public.manual_choir_attendance
+set practice_date = (created_at at time zone 'UTC')::date
+where practice_date is null;
+
+delete from public.manual_choir_attendance m
+using public.manual_choir_attendance keep
+where m.person_id = keep.person_id
+  and m.practice_date = keep.practice_date
+  and (coalesce(m.updated_at, m.created_at), m.ctid) < (coalesce(keep.updated_at, keep.created_at), keep.ctid);
+
+-- Dashboards that are not updated yet insert without practice_date
+create or replace function public.manual_attendance_practice_date()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.practice_date := coalesce(new.practice_date, (coalesce(new.created_at, now()) at time zone 'UTC')::date);
+    return new;
+end
+$$;
+
+drop trigger if exists manual_choir_attendance_practice_date on public.manual_choir_attendance;
+create trigger manual_choir_attendance_practice_date
+    before insert on public.manual_choir_attendance
+    for each row execute function public.manual_attendance_practice_date();
+
+alter table public.manual_choir_attendance
+    alter column practice_date set not null,
+    add constraint manual_choir_attendance_person_date_key unique (person_id, practice_date);
+
+-- Date (and date range) reads of a session or report
+create index if not exists manual_choir_attendance_practice_date_idx
+    on public.manual_choir_attendance (practice_date);
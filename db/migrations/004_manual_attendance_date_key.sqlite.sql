@@ -0,0 +1,25 @@
+-- SQLite stand-in for 004_manual_attendance_date_key.sql.
+
+alter table manual_choir_attendance add column practice_date text;
+
+update manual_choir_attendance
+set practice_date = substr(created_at, 1, 10)
+where practice_date is null;
+
+delete from manual_choir_attendance
+where rowid not in (
+    select rowid from (
+        select rowid, row_number() over (
+            partition by person_id, practice_date
+            order by coalesce(updated_at, created_at) desc, rowid desc
+        ) as rn
+        from manual_choir_attendance
+    )
+    where rn = 1
+);
+
+create unique index if not exists manual_choir_attendance_person_date_key
+    on manual_choir_attendance (person_id, practice_date);
+
+create index if not exists manual_choir_attendance_practice_date_idx
+    on manual_choir_attendance (practice_date);
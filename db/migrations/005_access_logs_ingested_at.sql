@@ -0,0 +1,31 @@
+-- When each scan reached the database.
+--
+-- Readers replay scans buffered offline with their original created_at,
+-- sometimes days later. ingested_at is set by the database on insert (a value
+-- sent by the reader is ignored), so the dashboard can fetch everything that
+-- arrived since its last look and spot scans that belong to dates it has
+-- already aggregated. Existing rows keep ingested_at null.
+
+alter table public.access_logs
+    add column if not exists ingested_at timestamptz;
+
+alter table public.access_logs
+    alter column ingested_at set default now();
+
+create or replace function public.access_logs_set_ingested_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.ingested_at := now();
+    return new;
+end
+$$;
+
+drop trigger if exists access_logs_ingested_at on public.access_logs;
+create trigger access_logs_ingested_at
+    before insert on public.access_logs
+    for each row execute function public.access_logs_set_ingested_at();
+
+create index if not exists access_logs_ingested_at_idx
+    on public.access_logs (ingested_at);
@@ -0,0 +1,15 @@
+-- SQLite stand-in for 005_access_logs_ingested_at.sql.
+
+alter table access_logs add column ingested_at text;
+
+create trigger if not exists access_logs_ingested_at
+    after insert on access_logs
+    for each row
+    begin
+        update access_logs
+        set ingested_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')
+        where rowid = new.rowid;
+    end;
+
+create index if not exists access_logs_ingested_at_idx
+    on access_logs (ingested_at);
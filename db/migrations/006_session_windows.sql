@@ -0,0 +1,24 @@
+-- Session time windows and gates on existing practice date tables.
+--
+-- The dashboard stores an optional start_time, end_time and gate (lock) with
+-- each session and stamps updated_at on every write, but 000 only creates
+-- these columns on a fresh database. Projects that already had their
+-- *_practice_dates tables get them here, for choir and every other activity
+-- table following the naming convention. Existing sessions keep null times
+-- and gate, which means the whole day at any gate.
+
+do $$
+declare
+    dates_table text;
+begin
+    for dates_table in
+        select table_name from information_schema.tables
+        where table_schema = 'public' and table_type = 'BASE TABLE' and table_name like '%\_practice\_dates'
+    loop
+        execute format('alter table public.%I add column if not exists start_time time', dates_table);
+        execute format('alter table public.%I add column if not exists end_time time', dates_table);
+        execute format('alter table public.%I add column if not exists lock text', dates_table);
+        execute format('alter table public.%I add column if not exists updated_at timestamptz default now()', dates_table);
+    end loop;
+end
+$$;
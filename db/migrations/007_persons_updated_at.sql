@@ -0,0 +1,9 @@
+-- persons.updated_at.
+--
+-- The dashboard stamps updated_at when it adds, edits or imports persons,
+-- but 000 created persons without that column, so those writes failed on
+-- existing projects. Existing persons get the time of the migration. The
+-- columns the dashboard writes on *_practice_dates come with 006.
+
+alter table public.persons
+    add column if not exists updated_at timestamptz default now();
@@ -0,0 +1,8 @@
+-- SQLite stand-in for 007_persons_updated_at.sql.
+--
+-- SQLite cannot add a column with a non-constant default to a table with
+-- rows, so existing persons are stamped separately.
+
+alter table persons add column updated_at text;
+
+update persons set updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') where updated_at is null;
@@ -0,0 +1,160 @@
+"""
+Headless batch report generation.
+
+Builds the yearly attendance reports (and optionally the access history) for
+many years and activities in one run, without the Streamlit UI, e.g. from a
+nightly cron job:
+
+    python report_cli.py --years 2025 2026 --formats csv html --out reports/
+
+All data is fetched up front in one bulk pass; the reports are then rendered to
+CSV/XLSX/HTML in parallel worker processes. An index.html lists the output so
+the directory can be served as static files.
+"""
+import argparse
+import html
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# Add the project root to sys.path so that absolute imports work from the root
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from client.tabs.activity_data import (
+    ACTIVITIES,
+    compute_attendance,
+    get_activity_members,
+    get_activity_sessions,
+    get_all_persons_df,
+    get_logs_for_date_range,
+)
+from client.tabs.choir_yearly_report import build_attendance_matrix
+from client.tabs.access_logs import build_access_history
+from client.utils.supabase_client import get_service_client
+
+FORMATS = ("csv", "xlsx", "html")
+
+
+def fetch_report_data(years, activities):
+    """Fetch everything needed for the yearly reports in one pass"""
+    persons_df = get_all_persons_df()
+
+    members = {}
+    sessions = {activity: [] for activity in activities}
+    for year in years:
+        for activity in activities:
+            members[(activity, year)] = get_activity_members(activity, year, persons_df=persons_df)
+            sessions_df = get_activity_sessions(activity, year)
+            if not sessions_df.empty:
+                sessions[activity].extend(sessions_df.to_dict("records"))
+
+    # One engine pass for all activities and years: each date's scans are fetched once
+    attendance = compute_attendance(sessions)
+    return persons_df, members, attendance
+
+
+def build_reports(years, activities, access_days=0):
+    """Return {report name: DataFrame} for every requested report"""
+    persons_df, members, attendance = fetch_report_data(years, activities)
+
+    reports = {}
+    for (activity, year), members_df in members.items():
+        if members_df.empty:
+            continue
+        attendance_map = {d: day for d, day in attendance.get(activity, {}).items() if d.startswith(str(year))}
+        reports[f"{activity}_{year}"] = build_attendance_matrix(members_df, attendance_map)
+
+    if access_days:
+        end = datetime.now()
+        logs = get_logs_for_date_range(end - timedelta(days=access_days), end)
+        if logs.num_rows:
+            persons_data = persons_df[["card_uid", "name", "surname"]].to_dict("records") if not persons_df.empty else []
+            history = build_access_history(logs, persons_data)
+            if "created_at" in history.columns:
+                # Spreadsheet writers cannot store timezone-aware timestamps
+                history["created_at"] = history["created_at"].dt.tz_localize(None)
+            reports[f"access_history_{access_days}d"] = history
+    return reports
+
+
+def render_report(name, df, out_dir, formats):
+    """Write one report in each format; runs in a worker process"""
+    written = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        elif fmt == "xlsx":
+            df.to_excel(path, index=False, sheet_name=name[:31])
+        elif fmt == "html":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"<html><head><meta charset='utf-8'><title>{html.escape(name)}</title></head><body>")
+                f.write(f"<h1>{html.escape(name)}</h1>")
+                f.write(df.to_html(index=False, border=0))
+                f.write("</body></html>")
+        written.append(path)
+    return written
+
+
+def write_index(out_dir, written):
+    """Write an index.html linking every generated file"""
+    links = "".join(
+        f"<li><a href='{html.escape(os.path.basename(p))}'>{html.escape(os.path.basename(p))}</a></li>"
+        for p in sorted(written)
+    )
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<html><head><meta charset='utf-8'><title>EduQure Reports</title></head><body>"
+                f"<h1>EduQure Reports</h1><p>Generated {datetime.now():%Y-%m-%d %H:%M}</p><ul>{links}</ul></body></html>")
+
+
+def parse_args(argv=None):
+    current_year = datetime.now().year
+    parser = argparse.ArgumentParser(description="Generate EduQure attendance reports without the dashboard.")
+    parser.add_argument("--years", type=int, nargs="+", default=[current_year], help="Report years (default: current year)")
+    parser.add_argument("--activities", nargs="+", default=sorted(ACTIVITIES), help="Activities to report on (default: all registered)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["csv", "html"], help="Output formats")
+    parser.add_argument("--out", default="reports", help="Output directory")
+    parser.add_argument("--access-days", type=int, default=0, help="Also export the access history of the last N days")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel rendering processes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if get_service_client() is None:
+        print("SERVICE_EMAIL / SERVICE_PASSWORD are not set: reports are fetched as the service account", file=sys.stderr)
+        return 2
+
+    if "xlsx" in args.formats:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            print("XLSX output needs openpyxl: pip install openpyxl", file=sys.stderr)
+            return 2
+
+    unknown = [a for a in args.activities if a not in ACTIVITIES]
+    if unknown:
+        print(f"Unknown activities: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.out, exist_ok=True)
+    reports = build_reports(args.years, args.activities, access_days=args.access_days)
+    if not reports:
+        print("No report data found.")
+        return 1
+
+    written = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(render_report, name, df, args.out, args.formats) for name, df in reports.items()]
+        for future in futures:
+            written.extend(future.result())
+    write_index(args.out, written)
+
+    print(f"Wrote {len(written)} files for {len(reports)} reports to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
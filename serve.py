@@ -0,0 +1,35 @@
+"""
+Run the dashboard with the cache warm-up started at process start.
+
+``streamlit run`` only imports the dashboard when the first page is rendered,
+so the warm-up scheduler (and its 06:30/13:30 runs) would wait for the first
+sign in. This launcher starts it first, running as the service account
+(SERVICE_EMAIL / SERVICE_PASSWORD), then serves the app in the same process;
+the pages find the running scheduler instead of starting another one.
+Arguments are passed on to ``streamlit run``:
+
+    python serve.py --server.port 8501
+"""
+import os
+import sys
+
+# Add the project root to sys.path so that absolute imports work from the root
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT)
+
+
+def main(argv=None):
+    from streamlit.web import cli
+    from client.utils.supabase_client import get_service_client
+    from client.warmup import start_warmup
+
+    if get_service_client() is None:
+        print("SERVICE_EMAIL / SERVICE_PASSWORD are not set: scheduled warm-ups will fail until they are", file=sys.stderr)
+    start_warmup()
+
+    sys.argv = ["streamlit", "run", os.path.join(ROOT, "streamlit_app.py"), *(sys.argv[1:] if argv is None else argv)]
+    return cli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
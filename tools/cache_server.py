@@ -0,0 +1,155 @@
+"""
+Stand-in for a Redis server, for the dashboard's shared cache.
+
+Speaks enough of the Redis protocol for ``client/utils/cache_backends.py``
+(PING, AUTH, SELECT, GET, SET with EX/PX, DEL, EXISTS, DBSIZE, FLUSHDB), with
+entries kept in memory. Start it and point the replicas at it:
+
+    python tools/cache_server.py --port 6390
+    CACHE_BACKEND=redis://127.0.0.1:6390/0 streamlit run streamlit_app.py --server.port 8501
+    CACHE_BACKEND=redis://127.0.0.1:6390/0 streamlit run streamlit_app.py --server.port 8502
+
+With ``--latency-ms`` every command is delayed, to see how the dashboard
+behaves with a cache further away; production deployments use a real
+Redis or Valkey server with the same setting.
+"""
+import argparse
+import socketserver
+import sys
+import threading
+import time
+
+
+class CacheServer:
+    """Threaded in-memory key-value server answering the Redis protocol subset the dashboard uses"""
+
+    def __init__(self, host="127.0.0.1", port=0, password=None, latency_ms=0.0):
+        self.password = password
+        self.latency_ms = latency_ms
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._dbs = {}
+        cache = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                session = {"db": 0, "authenticated": cache.password is None}
+                while True:
+                    try:
+                        args = cache.read_command(self.rfile)
+                    except (ConnectionError, ValueError):
+                        return
+                    if args is None:
+                        return
+                    self.wfile.write(cache.execute(session, args))
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.url = f"redis://{host}:{self.server.server_address[1]}/0"
+
+    @staticmethod
+    def read_command(reader):
+        """The arguments of the next command as bytes, or None at the end of the stream"""
+        line = reader.readline()
+        if not line:
+            return None
+        if line[:1] != b"*":
+            # Inline command, as typed into telnet
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = reader.readline()
+            if header[:1] != b"$":
+                raise ValueError("Expected a bulk string")
+            size = int(header[1:-2])
+            args.append(reader.read(size + 2)[:-2])
+        return args
+
+    def _db(self, session):
+        return self._dbs.setdefault(session["db"], {})
+
+    def _live(self, db, key):
+        item = db.get(key)
+        if item is not None and item[1] and item[1] <= time.time():
+            del db[key]
+            return None
+        return item
+
+    def execute(self, session, args):
+        """The encoded reply to one command"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if not args:
+            return b"-ERR empty command\r\n"
+        name = args[0].decode("utf-8", "replace").upper()
+        with self._lock:
+            self.commands += 1
+            if name == "PING":
+                return b"+PONG\r\n"
+            if name == "AUTH":
+                session["authenticated"] = self.password is None or args[-1].decode("utf-8") == self.password
+                return b"+OK\r\n" if session["authenticated"] else b"-WRONGPASS invalid password\r\n"
+            if not session["authenticated"]:
+                return b"-NOAUTH Authentication required.\r\n"
+            if name == "SELECT":
+                session["db"] = int(args[1])
+                return b"+OK\r\n"
+            db = self._db(session)
+            if name == "GET":
+                item = self._live(db, args[1])
+                return b"$-1\r\n" if item is None else b"$%d\r\n%s\r\n" % (len(item[0]), item[0])
+            if name == "SET":
+                expires = 0
+                options = [a.upper() for a in args[3:]]
+                for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                    if unit in options:
+                        expires = time.time() + int(args[3 + options.index(unit) + 1]) * scale
+                db[args[1]] = (args[2], expires)
+                return b"+OK\r\n"
+            if name == "DEL":
+                return b":%d\r\n" % sum(1 for key in args[1:] if db.pop(key, None) is not None)
+            if name == "EXISTS":
+                return b":%d\r\n" % sum(1 for key in args[1:] if self._live(db, key) is not None)
+            if name == "DBSIZE":
+                return b":%d\r\n" % len(db)
+            if name == "FLUSHDB":
+                db.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode("utf-8")
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an in-memory stand-in for the shared cache's Redis server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password", help="Require AUTH with this password")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every command")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = CacheServer(args.host, args.port, args.password, args.latency_ms).start()
+    print(f"Cache stand-in listening on {server.url}; press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"Answered {server.commands} commands")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
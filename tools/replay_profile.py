@@ -0,0 +1,171 @@
+"""
+Profile a dashboard tab offline against a recorded query cassette.
+
+Record a cassette by running the dashboard with the cassette variables set
+and opening the tabs to profile (every query and response is captured):
+
+    SUPABASE_CASSETTE=choir.ndjson.gz SUPABASE_CASSETTE_MODE=record streamlit run streamlit_app.py
+
+Then render a tab from it, with no database, as often as needed:
+
+    python tools/replay_profile.py --cassette choir.ndjson.gz --tab choir_attendance --save before.json
+    # ... optimise ...
+    python tools/replay_profile.py --cassette choir.ndjson.gz --tab choir_attendance --compare before.json
+
+After an untimed render for the imports, each run clears Streamlit's caches
+and renders the tab cold through AppTest, answering queries with their
+recorded latency times ``--latency`` (0 for none). The tool prints the
+median render time, the slowest functions of a profiled run, and a
+fingerprint of the rendered page: a hash of every element's serialized
+protobuf (dataframes by their Arrow content), so ``--compare`` shows whether
+an optimisation changed the output, and where.
+"""
+import argparse
+import cProfile
+import hashlib
+import io
+import json
+import os
+import pstats
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TABS = ("choir_attendance", "live_monitor", "access_logs", "gate_analytics", "attendance_summary", "choir_management")
+
+# Renders one tab as a signed-in user would see it
+TAB_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import streamlit as st
+st.session_state.authenticated = True
+from client.tabs import {tab}
+{tab}.render()
+"""
+
+
+def proto_digest(proto):
+    """sha1 of an element's protobuf; Arrow payloads count by content, their buffer padding is not stable"""
+    arrow = getattr(proto, "arrow_data", None)
+    if arrow is None or not arrow.data:
+        return hashlib.sha1(proto.SerializeToString()).hexdigest()
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(arrow.data).read_all()
+    rest = type(proto)()
+    rest.CopyFrom(proto)
+    rest.ClearField("arrow_data")
+    content = json.dumps([str(table.schema), table.to_pydict()], default=str, sort_keys=True)
+    return hashlib.sha1(rest.SerializeToString() + content.encode("utf-8")).hexdigest()
+
+
+def fingerprint(node, path="main"):
+    """[(path, element type, digest of its protobuf)] for the rendered tree, depth first"""
+    proto = getattr(node, "proto", None)
+    digest = proto_digest(proto) if proto is not None else ""
+    rows = [(path, type(node).__name__, digest)]
+    for key, child in getattr(node, "children", {}).items():
+        rows.extend(fingerprint(child, f"{path}/{key}"))
+    return rows
+
+
+def render(tab, timeout):
+    """(seconds, app) of one cold render"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    app = AppTest.from_string(TAB_SCRIPT.format(root=ROOT, tab=tab), default_timeout=timeout)
+    started = time.perf_counter()
+    app.run()
+    return time.perf_counter() - started, app
+
+
+def compare(before, after):
+    """Lines describing how two fingerprints differ"""
+    old = {path: (kind, digest) for path, kind, digest in before}
+    new = {path: (kind, digest) for path, kind, digest in after}
+    lines = []
+    for path in sorted(set(old) | set(new)):
+        if path not in new:
+            lines.append(f"  removed {path} ({old[path][0]})")
+        elif path not in old:
+            lines.append(f"  added   {path} ({new[path][0]})")
+        elif old[path] != new[path]:
+            lines.append(f"  changed {path} ({new[path][0]})")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render a dashboard tab from a query cassette and profile it.")
+    parser.add_argument("--cassette", required=True, help="Cassette recorded with SUPABASE_CASSETTE_MODE=record")
+    parser.add_argument("--tab", choices=TABS, required=True)
+    parser.add_argument("--runs", type=int, default=5, help="Cold renders; the median counts")
+    parser.add_argument("--latency", type=float, default=1.0, help="Scale of the recorded query latency (0 for none)")
+    parser.add_argument("--top", type=int, default=20, help="Functions listed from the profiled run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds a render may take")
+    parser.add_argument("--save", help="Write the fingerprint and timings to this file")
+    parser.add_argument("--compare", help="Fingerprint file of an earlier run to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.cassette):
+        print(f"No cassette at {args.cassette}")
+        return 2
+    # get_secret falls back to the environment
+    os.environ["SUPABASE_CASSETTE"] = os.path.abspath(args.cassette)
+    os.environ["SUPABASE_CASSETTE_MODE"] = "replay"
+    os.environ["SUPABASE_CASSETTE_LATENCY"] = str(args.latency)
+
+    # An untimed render first, so imports do not count
+    render(args.tab, args.timeout)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _, app = render(args.tab, args.timeout)
+    profiler.disable()
+    timings = [render(args.tab, args.timeout)[0] for _ in range(args.runs)]
+
+    errors = [str(e.value) for e in app.exception] + [e.value for e in app.error]
+    from client.utils.supabase_client import get_cassette
+    misses = get_cassette().misses
+    rows = fingerprint(app.main)
+    page = hashlib.sha1("".join(digest for _, _, digest in rows).encode()).hexdigest()
+
+    stats = io.StringIO()
+    pstats.Stats(profiler, stream=stats).sort_stats("cumulative").print_stats(args.top)
+    print("\n".join(line for line in stats.getvalue().splitlines() if line.strip()))
+    print(f"\n{args.tab}: median {statistics.median(timings) * 1000:.1f} ms over {len(timings)} cold renders "
+          f"(min {min(timings) * 1000:.1f}, max {max(timings) * 1000:.1f}), latency x{args.latency:g}")
+    print(f"Page fingerprint {page} ({len(rows)} elements)")
+    for message in errors:
+        print(f"  error on page: {message}")
+    if misses:
+        print(f"  {len(misses)} queries had no recording, e.g. {misses[0]}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            before = json.load(f)
+        differences = compare(before["elements"], rows)
+        if differences:
+            print(f"Output differs from {args.compare}:")
+            print("\n".join(differences))
+            status = 1
+        else:
+            before_ms = before["median_ms"]
+            print(f"Output identical to {args.compare}; median {before_ms:.1f} ms -> {statistics.median(timings) * 1000:.1f} ms")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"tab": args.tab, "fingerprint": page, "median_ms": statistics.median(timings) * 1000,
+                       "timings_ms": [t * 1000 for t in timings], "elements": rows}, f, indent=1)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
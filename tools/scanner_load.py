@@ -0,0 +1,489 @@
+"""
+Load generator for a fleet of gate readers.
+
+Each virtual reader behaves like ``firmware/rfidCard_scanner``: a tap is
+POSTed with the payload of ``network_manager.h:sendLogToSupabase`` (granted
+scans to ``access_logs``, denied ones to ``unidentified_cards``), a failed
+send is appended to the reader's offline queue as the NDJSON line of
+``offline_queue.h:saveToQueue``, and every queue interval the queue is
+replayed line by line. Taps follow an arrival curve, with optional duplicate
+taps, outages (readers offline, scans queued) and readers that come up with
+a full queue, so a whole fleet replaying at once can be reproduced.
+
+    python tools/scanner_load.py run --readers 30 --scans-per-reader 120 --duration 60
+    python tools/scanner_load.py run --readers 30 --outage 10:20 --queue-interval 15 --preload 200
+    python tools/scanner_load.py run --url https://yourproject.supabase.co --key ... --readers 5
+    python tools/scanner_load.py stub --port 54321 --database sqlite:///load.sqlite3
+
+Without ``--url`` the run starts the stand-in server in-process. The stand-in
+accepts the two insert endpoints, can add latency and errors, and with
+``--database`` stores the rows in a migrated SQLite file that the dashboard
+benchmarks can read while the load runs. The report lists throughput,
+latency percentiles and error rates, for live sends and queue replays.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.migrate import migrate  # noqa: E402
+
+# The readers' clock: network_manager.h formats local time with a fixed +02:00
+SAST = timezone(timedelta(hours=2))
+TABLES = ("access_logs", "unidentified_cards")
+LIVE = "live"
+REPLAY = "replay"
+
+# Share of a run's taps over time; each curve is a density over [0, 1)
+CURVES = {
+    "flat": lambda x: 1.0,
+    # Morning arrival: most learners within a few minutes of the bell
+    "morning": lambda x: 0.05 + math.exp(-((x - 0.35) ** 2) / (2 * 0.1 ** 2)),
+    "ramp": lambda x: x,
+    # Class changes: three short peaks
+    "waves": lambda x: 0.05 + sum(math.exp(-((x - c) ** 2) / (2 * 0.04 ** 2)) for c in (0.2, 0.5, 0.8)),
+}
+
+
+def card_uid(rng):
+    """A UID as the sketch prints it: "0x" and four lowercase, zero-padded hex bytes"""
+    return "0x" + "".join(f"{rng.getrandbits(8):02x}" for _ in range(4))
+
+
+def iso_time(ts):
+    """getISOTime(): whole seconds, local time, "+02:00" appended"""
+    return ts.astimezone(SAST).strftime("%Y-%m-%dT%H:%M:%S") + "+02:00"
+
+
+def log_payload(uid, lock, granted, timestamp):
+    """(table, body) exactly as sendLogToSupabase builds them"""
+    if granted:
+        payload = '{"card_uid":"' + uid + '", "lock":"' + lock + '", "status":true'
+    else:
+        payload = '{"card_uid":"' + uid + '", "lock":"' + lock + '"'
+    if timestamp:
+        payload += ', "created_at":"' + timestamp + '"'
+    return ("access_logs" if granted else "unidentified_cards"), payload + "}"
+
+
+def queue_line(uid, granted, timestamp):
+    """The NDJSON line saveToQueue appends (ArduinoJson's compact output; the lock is not stored)"""
+    doc = {"card_uid": uid, "status": granted}
+    if timestamp:
+        doc["created_at"] = timestamp
+    return json.dumps(doc, separators=(",", ":"))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def parse_outage(spec):
+    """"START:SECONDS[:READERS]" -> (start, end, readers or None); READERS is a count or a fraction"""
+    parts = spec.split(":")
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Outage {spec!r} is not START:SECONDS[:READERS]")
+    start, length = float(parts[0]), float(parts[1])
+    readers = float(parts[2]) if len(parts) == 3 else None
+    return start, start + length, readers
+
+
+def schedule_taps(rng, count, duration, curve, duplicate_rate, cards, unknown_cards, unknown_rate):
+    """[(offset seconds, uid, granted)] of one reader, sorted; duplicates follow their tap by 1-3 s"""
+    density = CURVES[curve]
+    peak = max(density(i / 1000) for i in range(1000))
+    taps = []
+    while len(taps) < count:
+        x = rng.random()
+        if rng.random() * peak > density(x):
+            continue
+        if rng.random() < unknown_rate:
+            uid, granted = rng.choice(unknown_cards), False
+        else:
+            uid, granted = rng.choice(cards), True
+        taps.append((x * duration, uid, granted))
+        if rng.random() < duplicate_rate:
+            taps.append((x * duration + rng.uniform(1, 3), uid, granted))
+    return sorted(taps)
+
+
+class Results:
+    """Thread-safe tally of requests and queue behaviour"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {LIVE: [], REPLAY: []}
+        self.errors = {LIVE: {}, REPLAY: {}}
+        self.offline = 0
+        self.queued = 0
+        self.queue_peak = 0
+        self.replay_lag = []
+        self.left_in_queues = 0
+
+    def request(self, kind, latency_ms, error=None, lag=None):
+        with self._lock:
+            if error is None:
+                self.latencies[kind].append(latency_ms)
+                if lag is not None:
+                    self.replay_lag.append(lag)
+            else:
+                self.errors[kind][error] = self.errors[kind].get(error, 0) + 1
+
+    def queue(self, size, offline=False):
+        with self._lock:
+            self.queued += 1
+            self.offline += offline
+            self.queue_peak = max(self.queue_peak, size)
+
+    def report(self, elapsed):
+        rows = []
+        for kind in (LIVE, REPLAY):
+            latencies = sorted(self.latencies[kind])
+            failed = sum(self.errors[kind].values())
+            total = len(latencies) + failed
+            rows.append({
+                "kind": kind,
+                "requests": total,
+                "ok": len(latencies),
+                "error_rate": failed / total if total else 0.0,
+                "per_second": len(latencies) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(latencies, 50),
+                "p90_ms": percentile(latencies, 90),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": latencies[-1] if latencies else float("nan"),
+                "errors": dict(self.errors[kind]),
+            })
+        lag = sorted(self.replay_lag)
+        return {
+            "elapsed_s": elapsed,
+            "requests": rows,
+            "queued": self.queued,
+            "queued_offline": self.offline,
+            "queue_peak": self.queue_peak,
+            "left_in_queues": self.left_in_queues,
+            "replay_lag_p50_s": percentile(lag, 50),
+            "replay_lag_p99_s": percentile(lag, 99),
+        }
+
+
+class Reader:
+    """One virtual gate reader running the sketch's loop against a base URL"""
+
+    def __init__(self, lock, base_url, key, taps, outages, results, scan_delay, queue_interval, timeout, preload=()):
+        self.lock = lock
+        self.base_url = base_url.rstrip("/")
+        self.key = key
+        self.taps = taps
+        self.outages = outages
+        self.results = results
+        self.scan_delay = scan_delay
+        self.queue_interval = queue_interval
+        self.timeout = timeout
+        # Queued lines with the monotonic time of their tap, for the replay lag
+        self.queue = [(line, None) for line in preload]
+
+    def online(self, offset):
+        return not any(start <= offset < end for start, end in self.outages)
+
+    def send(self, uid, granted, timestamp, kind, tapped=None):
+        """sendLogToSupabase: True on a 2xx answer"""
+        table, payload = log_payload(uid, self.lock, granted, timestamp)
+        request = urllib.request.Request(
+            f"{self.base_url}/rest/v1/{table}",
+            data=payload.encode("utf-8"),
+            method="POST",
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+        )
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            error = None
+        except urllib.error.HTTPError as e:
+            error = str(e.code)
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.monotonic()
+        lag = finished - tapped if tapped is not None else None
+        self.results.request(kind, (finished - started) * 1000, error, lag)
+        return error is None
+
+    def process_queue(self):
+        """processQueue: try every line once and keep those that fail"""
+        kept = []
+        for line, tapped in self.queue:
+            doc = json.loads(line)
+            if not self.send(doc["card_uid"], doc["status"], doc.get("created_at", ""), REPLAY, tapped):
+                kept.append((line, tapped))
+        self.queue = kept
+
+    def run(self, started, drain_until):
+        next_queue = self.queue_interval
+        taps = iter(self.taps)
+        tap = next(taps, None)
+        while tap is not None or (self.queue and time.monotonic() - started < drain_until):
+            now = time.monotonic() - started
+            if now >= next_queue:
+                next_queue = now + self.queue_interval
+                if self.online(now):
+                    self.process_queue()
+                continue
+            if tap is None or tap[0] > now:
+                wake = min(next_queue, tap[0] if tap is not None else next_queue)
+                time.sleep(max(0.0, min(wake - now, 0.25)))
+                continue
+
+            _, uid, granted = tap
+            timestamp = iso_time(datetime.now(timezone.utc))
+            tapped = time.monotonic()
+            online = self.online(now)
+            if not online or not self.send(uid, granted, timestamp, LIVE):
+                self.queue.append((queue_line(uid, granted, timestamp), tapped))
+                self.results.queue(len(self.queue), offline=not online)
+            # The sketch resets the reader for a second after every scan
+            time.sleep(self.scan_delay)
+            tap = next(taps, None)
+        with self.results._lock:
+            self.results.left_in_queues += len(self.queue)
+
+
+class StubServer:
+    """
+    Stand-in for the two PostgREST insert endpoints the readers use.
+
+    Answers 201 to a well-formed insert after `latency_ms` (jittered), fails
+    a share of requests with 503, and with a SQLite `database` stores the rows
+    the way Postgres would (created_at normalised to UTC).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, error_rate=0.0, database=None, seed=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.counts = {table: 0 for table in TABLES}
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._db = None
+        if database:
+            migrate(database, log=lambda message: None)
+            self._db = sqlite3.connect(database[len("sqlite:///"):], check_same_thread=False, isolation_level=None)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def handle(self, request):
+        table = request.path.split("?")[0].rsplit("/", 1)[-1]
+        body = request.rfile.read(int(request.headers.get("Content-Length") or 0))
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.latency_ms / 4)) / 1000
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        try:
+            row = json.loads(body)
+            valid = table in TABLES and isinstance(row, dict) and row.get("card_uid")
+        except ValueError:
+            valid = False
+        if not valid:
+            status = 400
+        elif fail:
+            status = 503
+        else:
+            self.store(table, row)
+            status = 201
+        if status != 201:
+            with self._lock:
+                self.rejected += 1
+        request.send_response(status)
+        request.send_header("Content-Length", "0")
+        request.end_headers()
+
+    def store(self, table, row):
+        created_at = row.get("created_at")
+        created_at = datetime.fromisoformat(created_at) if created_at else datetime.now(timezone.utc)
+        created_at = created_at.astimezone(timezone.utc).isoformat()
+        with self._lock:
+            self.counts[table] += 1
+            if self._db is None:
+                return
+            if table == "access_logs":
+                self._db.execute(
+                    "insert into access_logs (id, card_uid, lock, status, created_at) values (?, ?, ?, ?, ?)",
+                    (uuid.uuid4().hex, row["card_uid"], row.get("lock"), bool(row.get("status", True)), created_at),
+                )
+            else:
+                self._db.execute(
+                    "insert into unidentified_cards (id, card_uid, lock, created_at) values (?, ?, ?, ?)",
+                    (uuid.uuid4().hex, row["card_uid"], row.get("lock"), created_at),
+                )
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._db is not None:
+            self._db.close()
+
+
+def build_fleet(args, base_url, results, rng):
+    """Readers with their taps, outages and preloaded queues"""
+    cards = [card_uid(rng) for _ in range(args.cards)]
+    unknown_cards = [card_uid(rng) for _ in range(max(1, args.cards // 20))]
+    readers = []
+    for i in range(args.readers):
+        lock = f"{args.lock_prefix}-{i + 1}"
+        taps = schedule_taps(rng, args.scans_per_reader, args.duration, args.curve, args.duplicate_rate, cards, unknown_cards, args.unknown_rate)
+        outages = []
+        for start, end, share in args.outage:
+            affected = args.readers if share is None else (share * args.readers if share <= 1 else share)
+            if i < round(affected):
+                outages.append((start, end))
+        # A queue left from an outage before the run, with taps spread over the previous hour
+        stamp = datetime.now(timezone.utc) - timedelta(hours=1)
+        preload = []
+        for _ in range(args.preload):
+            stamp += timedelta(seconds=rng.uniform(1, 3600 / max(1, args.preload)))
+            granted = rng.random() >= args.unknown_rate
+            preload.append(queue_line(rng.choice(cards if granted else unknown_cards), granted, iso_time(stamp)))
+        readers.append(Reader(lock, base_url, args.key, taps, outages, results, args.scan_delay,
+                              args.queue_interval, args.timeout, preload))
+    return readers
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    stub = None
+    base_url = args.url
+    if not base_url:
+        stub = StubServer(latency_ms=args.stub_latency_ms, error_rate=args.stub_error_rate,
+                          database=args.database, seed=args.seed).start()
+        base_url = stub.url
+    results = Results()
+    readers = build_fleet(args, base_url, results, rng)
+    drain_until = max([args.duration] + [end for _, end, _ in args.outage]) + args.drain
+
+    print(f"{len(readers)} readers, {sum(len(r.taps) for r in readers):,} taps over {args.duration:g} s "
+          f"({args.curve}), {args.preload} queued lines each, target {base_url}")
+    started = time.monotonic()
+    threads = [threading.Thread(target=r.run, args=(started, drain_until), daemon=True) for r in readers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = results.report(time.monotonic() - started)
+    if stub is not None:
+        report["stub_rows"] = dict(stub.counts)
+        report["stub_rejected"] = stub.rejected
+        stub.stop()
+    return report
+
+
+def print_report(report):
+    print(f"\nElapsed {report['elapsed_s']:.1f} s")
+    print(f"{'kind':8} {'requests':>9} {'ok':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for row in report["requests"]:
+        print(f"{row['kind']:8} {row['requests']:9d} {row['ok']:8d} {row['error_rate']:7.1%} {row['per_second']:8.1f} "
+              f"{row['p50_ms']:8.1f} {row['p90_ms']:8.1f} {row['p99_ms']:8.1f} {row['max_ms']:8.1f}")
+        if row["errors"]:
+            print(f"{'':8} errors: {', '.join(f'{k} x{v}' for k, v in sorted(row['errors'].items()))}")
+    print(f"\nQueued {report['queued']:,} scans ({report['queued_offline']:,} while offline), "
+          f"largest queue {report['queue_peak']:,}, {report['left_in_queues']:,} still queued at the end")
+    print(f"Replayed scans reached the server {report['replay_lag_p50_s']:.1f} s (p50) / "
+          f"{report['replay_lag_p99_s']:.1f} s (p99) after the tap")
+    if "stub_rows" in report:
+        rows = ", ".join(f"{table} {count:,}" for table, count in report["stub_rows"].items())
+        print(f"Stand-in stored {rows}; rejected {report['stub_rejected']:,}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a fleet of gate readers against an ingest endpoint.")
+    parser.add_argument("command", choices=["run", "stub"], help="Run the fleet, or only serve the stand-in")
+    parser.add_argument("--url", help="Base URL of the ingest endpoint, like SUPABASE_URL (default: the in-process stand-in)")
+    parser.add_argument("--key", default=os.environ.get("SUPABASE_KEY", "load-test"), help="apikey / bearer token sent by the readers")
+    parser.add_argument("--readers", type=int, default=30)
+    parser.add_argument("--lock-prefix", default="lock", help="Readers are named PREFIX-1, PREFIX-2, ... like LOCK_ID")
+    parser.add_argument("--scans-per-reader", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds the taps are spread over")
+    parser.add_argument("--curve", choices=sorted(CURVES), default="morning", help="Arrival curve of the taps")
+    parser.add_argument("--cards", type=int, default=1500, help="Known cards in circulation")
+    parser.add_argument("--unknown-rate", type=float, default=0.02, help="Share of taps by unknown cards")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Share of taps repeated 1-3 s later")
+    parser.add_argument("--outage", type=parse_outage, action="append", default=[], metavar="START:SECONDS[:READERS]",
+                        help="Take readers offline (all, a count, or a fraction); repeatable")
+    parser.add_argument("--preload", type=int, default=0, help="Lines already in each reader's offline queue")
+    parser.add_argument("--scan-delay", type=float, default=1.0, help="Pause after each scan (the sketch waits 1 s)")
+    parser.add_argument("--queue-interval", type=float, default=60.0, help="Seconds between queue replays (QUEUE_INTERVAL)")
+    parser.add_argument("--drain", type=float, default=120.0, help="Seconds after the last tap or outage to keep replaying")
+    parser.add_argument("--timeout", type=float, default=5.0, help="HTTP timeout (HTTPClient's default is 5 s)")
+    parser.add_argument("--host", default="127.0.0.1", help="Stand-in address (stub command)")
+    parser.add_argument("--port", type=int, default=54321, help="Stand-in port (stub command)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Mean latency the stand-in adds")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Share of inserts the stand-in fails with 503")
+    parser.add_argument("--database", help="sqlite:/// file the stand-in stores rows in (migrated first)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+    if args.database and not args.database.startswith("sqlite:///"):
+        parser.error("--database must be a sqlite:/// URL")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "stub":
+        stub = StubServer(args.host, args.port, args.stub_latency_ms, args.stub_error_rate, args.database, args.seed).start()
+        print(f"Stand-in listening on {stub.url}; press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stub.stop()
+            print(f"Stored {stub.counts}")
+        return 0
+
+    try:
+        report = run(args)
+    except Exception as e:
+        print(f"Load run failed: {e}")
+        return 1
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Startup profile and budget check for the dashboard.
+
+Measures, each in a fresh interpreter:
+
+1. the import time of the dashboard module, with a per-module breakdown
+   (from ``python -X importtime``), and
+2. the first run of the login page (via Streamlit's AppTest), checking that it
+   renders without importing pandas, supabase or any tab module.
+
+Exits non-zero when a budget is exceeded, so it can run in CI or after a
+deploy:
+
+    python tools/startup_profile.py --top 15 --import-budget-ms 800
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the login page must not pull in
+LOGIN_FORBIDDEN = ("pandas", "numpy", "pyarrow", "supabase", "client.tabs", "client.warmup")
+
+LOGIN_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("streamlit_app.py", default_timeout=60).run()
+seconds = time.perf_counter() - started
+print(json.dumps({
+    "seconds": seconds,
+    "modules": sorted(sys.modules),
+    "buttons": [b.label for b in app.button],
+    "exceptions": [str(e.value) for e in app.exception],
+}))
+"""
+
+
+def run_python(args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def import_profile(module):
+    """{module: (self_us, cumulative_us)} for importing `module` in a fresh interpreter"""
+    result = run_python(["-X", "importtime", "-c", f"import {module}"])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def login_probe():
+    """Time and imported modules of the first login page run"""
+    result = run_python(["-c", LOGIN_PROBE])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile dashboard startup and check it against a budget.")
+    parser.add_argument("--module", default="client.secured_dashboard", help="Module whose import is profiled")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per check; the best one counts")
+    parser.add_argument("--import-budget-ms", type=float, default=800, help="Budget for importing the module")
+    parser.add_argument("--login-budget-ms", type=float, default=2500, help="Budget for the first login page run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    failures = []
+
+    profiles = [import_profile(args.module) for _ in range(max(1, args.runs))]
+    profile = min(profiles, key=lambda p: p.get(args.module, (0, 0))[1])
+    import_ms = profile.get(args.module, (0, 0))[1] / 1000
+    print(f"Import of {args.module}: {import_ms:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"{'self ms':>9} {'total ms':>9}  module")
+    for name, (self_us, cumulative_us) in sorted(profile.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import took {import_ms:.0f} ms")
+
+    probes = [login_probe() for _ in range(max(1, args.runs))]
+    probe = min(probes, key=lambda p: p["seconds"])
+    login_ms = probe["seconds"] * 1000
+    print(f"\nLogin page first run: {login_ms:.0f} ms (budget {args.login_budget_ms:.0f} ms)")
+    if login_ms > args.login_budget_ms:
+        failures.append(f"login page took {login_ms:.0f} ms")
+    if probe["exceptions"]:
+        failures.append(f"login page raised: {'; '.join(probe['exceptions'])}")
+    if "Log In" not in probe["buttons"]:
+        failures.append("login page did not render the Log In button")
+    loaded = sorted({m for m in probe["modules"] for f in LOGIN_FORBIDDEN if m == f or m.startswith(f + ".")})
+    if loaded:
+        failures.append(f"login page imported {', '.join(loaded[:10])}{' ...' if len(loaded) > 10 else ''}")
+
+    if failures:
+        print("\nStartup budget exceeded:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nStartup within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())